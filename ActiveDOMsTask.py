@@ -29,12 +29,13 @@ class ActiveDOMThread(CnCThread):
     KEY_TOTAL = "total_doms"
 
     def __init__(self, runset, dashlog, live_moni, lbm_start_time=None,
-                 send_details=False):
+                 send_details=False, snapshot_cache=None):
         self.__runset = runset
         self.__dashlog = dashlog
         self.__live_moni_client = live_moni
         self.__lbm_start_time = lbm_start_time
         self.__send_details = send_details
+        self.__snapshot_cache = snapshot_cache
 
         super(ActiveDOMThread, self).__init__("CnCServer:ActiveDOMThread",
                                               dashlog)
@@ -117,11 +118,26 @@ class ActiveDOMThread(CnCThread):
         # save the current time
         start_time = datetime.datetime.now()
 
-        # spawn a bunch of threads to fetch hub data
+        # use recent MonitorTask values where possible
         bean_keys = (self.KEY_ACT_TOT, self.KEY_LBM_OVER)
-        results = ComponentGroup.run_simple(OpGetMultiBeanFields, src_set,
-                                            ("stringhub", bean_keys),
-                                            self.__dashlog)
+        cached = {}
+        if self.__snapshot_cache is not None:
+            for comp in src_set:
+                attrs = self.__snapshot_cache.get_fields(comp, "stringhub",
+                                                         bean_keys)
+                if attrs is not None:
+                    cached[comp] = attrs
+
+        # spawn a bunch of threads to fetch the remaining hub data
+        fetch_set = [comp for comp in src_set if comp not in cached]
+        if len(fetch_set) == 0:  # pylint: disable=len-as-condition
+            results = {}
+        else:
+            results = ComponentGroup.run_simple(OpGetMultiBeanFields,
+                                                fetch_set,
+                                                ("stringhub", bean_keys),
+                                                self.__dashlog)
+        results.update(cached)
 
         # create dictionaries used to accumulate results
         totals = {
@@ -246,7 +262,8 @@ class ActiveDOMThread(CnCThread):
         "Create a new copy of this thread"
         thrd = ActiveDOMThread(self.__runset, self.__dashlog,
                                self.__live_moni_client, self.__lbm_start_time,
-                               send_details)
+                               send_details,
+                               snapshot_cache=self.__snapshot_cache)
         return thrd
 
     @classmethod
@@ -279,7 +296,8 @@ class ActiveDOMsTask(CnCSingleThreadTask):
                                               self.REPORT_PERIOD)
 
     def initialize_thread(self, runset, dashlog, live_moni):
-        return ActiveDOMThread(runset, dashlog, live_moni)
+        return ActiveDOMThread(runset, dashlog, live_moni,
+                               snapshot_cache=self.mbean_cache)
 
     @classproperty
     def name(cls):  # pylint: disable=no-self-argument
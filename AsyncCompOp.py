@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Asynchronous versions of the most common component operations from CompOp,
+which run on the shared ControlLoop instead of tying up a thread for each
+component.  This module requires Python 3.5 or later.
+"""
+
+import socket
+
+try:
+    import xmlrpclib as xclient
+except ImportError:
+    import xmlrpc.client as xclient
+
+from AsyncRPC import ControlLoop
+from DAQClient import BeanLoadException, BeanTimeoutException, unfix_value
+
+from exc_string import exc_string, set_exc_string_encoding
+set_exc_string_encoding("ascii")
+
+
+async def call_component(comp, method, *args):
+    """
+    Call a component's XML-RPC method, logging any errors and returning
+    None if the call fails
+    """
+    try:
+        return await getattr(comp.async_client.xmlrpc, method)(*args)
+    except Exception:  # pylint: disable=broad-except
+        comp.log_exception()
+        return None
+
+
+async def call_mbean(comp, what, method, *args):
+    """
+    Call a component's MBean method, converting errors to the same
+    exceptions raised by MBeanClient
+    """
+    try:
+        return await getattr(comp.mbean.async_client.mbean, method)(*args)
+    except socket.error as serr:
+        raise BeanTimeoutException("Cannot get %s MBean %s:"
+                                   " <socket error %s>" %
+                                   (comp.fullname, what, serr))
+    except (xclient.Fault, xclient.ProtocolError) as xerr:
+        raise BeanTimeoutException("Cannot get %s MBean %s: %s" %
+                                   (comp.fullname, what, xerr))
+    except Exception:  # pylint: disable=broad-except
+        raise BeanLoadException("Cannot load %s MBean %s: %s" %
+                                (comp.fullname, what, exc_string()))
+
+
+async def get_attributes(comp, bean, fld_list):
+    "Return a dictionary of MBean values"
+    attrs = await call_mbean(comp, "\"%s\" attributes" % (bean, ),
+                             "getAttributes", bean, fld_list)
+    return comp.mbean.check_attributes(bean, fld_list, attrs)
+
+
+async def get_connection_info(comp, _):
+    "Async version of OpGetConnectionInfo"
+    return await comp.async_client.xmlrpc.listConnectorStates()
+
+
+async def get_good_time(comp, data):
+    "Async version of OpGetGoodTime"
+    return await get_attributes(comp, "stringhub", data)
+
+
+async def get_multi_bean_fields(comp, data):
+    "Async version of OpGetMultiBeanFields"
+    return await get_attributes(comp, data[0], data[1])
+
+
+async def get_run_data(comp, data):
+    "Async version of OpGetRunData"
+    return unfix_value(await call_component(comp, "getRunData", data[0]))
+
+
+async def get_single_bean_field(comp, data):
+    "Async version of OpGetSingleBeanField"
+    val = await call_mbean(comp, "\"%s:%s\"" % (data[0], data[1]), "get",
+                           data[0], data[1])
+    return unfix_value(val)
+
+
+async def get_state(comp, _):
+    "Async version of OpGetState"
+    try:
+        state = await comp.async_client.xmlrpc.getState()
+    except (socket.error, xclient.Fault, xclient.ProtocolError):
+        state = None
+    except Exception:  # pylint: disable=broad-except
+        comp.log_exception()
+        state = None
+
+    return comp.check_state(state)
+
+
+async def start_run(comp, data):
+    "Async version of OpStartRun"
+    return await call_component(comp, "startRun", data[0], data[1])
+
+
+async def stop_run(comp, _):
+    "Async version of OpStopRun"
+    await call_component(comp, "stopRun")
+
+
+# map operation names to (coroutine function, uses MBean client) pairs
+ASYNC_OPERATIONS = {
+    "GetConnectionInfo": (get_connection_info, False),
+    "GetGoodTime": (get_good_time, True),
+    "GetMultiBeanFields": (get_multi_bean_fields, True),
+    "GetRunData": (get_run_data, False),
+    "GetSingleBeanField": (get_single_bean_field, True),
+    "GetState": (get_state, False),
+    "StartRun": (start_run, False),
+    "StopRun": (stop_run, False),
+}
+
+
+def can_run(operation, comp):
+    """
+    Return True if this operation has an asynchronous version and the
+    component has the necessary asyncio client
+    """
+    if operation.name not in ASYNC_OPERATIONS:
+        return False
+
+    if ASYNC_OPERATIONS[operation.name][1]:
+        client = getattr(getattr(comp, "mbean", None), "async_client", None)
+    else:
+        client = getattr(comp, "async_client", None)
+    return client is not None
+
+
+class AsyncOperationPool(object):
+    """
+    Stand-in for a WorkerPool which runs a ComponentTask's operation on the
+    shared control loop
+    """
+
+    def __init__(self, control_loop=None):
+        if control_loop is None:
+            control_loop = ControlLoop.instance()
+        self.__control = control_loop
+
+    @classmethod
+    async def __run(cls, task):
+        "Run the asynchronous version of the task's operation"
+        task.begin()
+        func = ASYNC_OPERATIONS[task.operation.name][0]
+        return await func(task.component, task.arguments)
+
+    def submit(self, task):
+        "Start the task's operation on the control loop"
+        future = self.__control.submit(self.__run(task))
+        future.add_done_callback(task.complete)
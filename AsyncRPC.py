@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+"""
+XML-RPC client built on asyncio, plus a shared event loop thread which lets
+CnCServer talk to every component in a runset without starting a thread
+for each call.  This module requires Python 3.5 or later.
+"""
+
+import asyncio
+import socket
+import threading
+
+import http.client as http_client
+import xmlrpc.client as xclient
+
+from DAQRPC import RPCClient
+
+
+class AsyncMethod(object):
+    """
+    Remote method proxy, so `client.xmlrpc.getState()` returns a coroutine
+    which calls "xmlrpc.getState" on the remote server
+    """
+
+    def __init__(self, client, name):
+        self.__client = client
+        self.__name = name
+
+    def __getattr__(self, name):
+        return AsyncMethod(self.__client, "%s.%s" % (self.__name, name))
+
+    def __call__(self, *args):
+        return self.__client.call(self.__name, *args)
+
+
+class AsyncRPCClient(object):
+    """
+    XML-RPC client which sends requests from an asyncio event loop.
+    Idle HTTP/1.1 connections are kept open and reused, at most
+    `max_active` requests are sent at once, and each call fails with
+    `socket.timeout` if no response arrives within `timeout` seconds.
+    Unlike RPCClient, an instance must only be used from a single event loop.
+    """
+
+    # maximum number of idle connections kept open
+    MAX_IDLE = 4
+
+    def __init__(self, host, port, timeout=RPCClient.TIMEOUT_SECS,
+                 max_active=1, max_idle=None):
+        if max_idle is None:
+            max_idle = self.MAX_IDLE
+
+        self.__host = host
+        self.__port = port
+        self.__timeout = timeout
+        self.__max_active = max_active
+        self.__max_idle = max(max_idle, max_active)
+
+        # created on first use so it belongs to the right event loop
+        self.__active = None
+        self.__idle = []
+
+        self.__num_opened = 0
+        self.__num_requests = 0
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return AsyncMethod(self, name)
+
+    def __str__(self):
+        return "AsyncRPCClient[%s:%s]" % (self.__host, self.__port)
+
+    async def __open(self):
+        "Return an idle connection or open a new one"
+        if len(self.__idle) > 0:  # pylint: disable=len-as-condition
+            return self.__idle.pop() + (True, )
+
+        self.__num_opened += 1
+        reader, writer = await asyncio.open_connection(self.__host,
+                                                       self.__port)
+        return reader, writer, False
+
+    @classmethod
+    async def __read_body(cls, reader, headers):
+        "Read the response body, returning the data and a 'will close' flag"
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                line = await reader.readline()
+                size = int(line.split(b";")[0].strip(), 16)
+                if size == 0:
+                    # skip any trailers
+                    while (await reader.readline()).strip():
+                        pass
+                    return body, False
+                body += await reader.readexactly(size)
+                await reader.readline()
+
+        if "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+            return body, False
+
+        # no length, so the server will close the connection when it's done
+        return await reader.read(), True
+
+    async def __request(self, handler, body):
+        "Send the request and return the unmarshalled response"
+        reader, writer, reused = await self.__open()
+
+        keep = False
+        try:
+            request = ("POST %s HTTP/1.1\r\n"
+                       "Host: %s:%s\r\n"
+                       "User-Agent: AsyncRPCClient\r\n"
+                       "Content-Type: text/xml\r\n"
+                       "Content-Length: %d\r\n\r\n" %
+                       (handler, self.__host, self.__port, len(body)))
+            writer.write(request.encode("ascii") + body)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise http_client.RemoteDisconnected("%s closed connection"
+                                                     " without response" %
+                                                     (self, ))
+            flds = status_line.decode("iso-8859-1").split(None, 2)
+            version = flds[0]
+            status = int(flds[1])
+            reason = flds[2].strip() if len(flds) > 2 else ""
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, val = line.decode("iso-8859-1").split(":", 1)
+                headers[key.strip().lower()] = val.strip()
+
+            data, will_close = await self.__read_body(reader, headers)
+
+            conn_hdr = headers.get("connection", "").lower()
+            if conn_hdr == "close" or \
+               (version == "HTTP/1.0" and conn_hdr != "keep-alive"):
+                will_close = True
+
+            keep = not will_close
+            if status != 200:
+                raise xclient.ProtocolError("%s:%s%s" %
+                                            (self.__host, self.__port,
+                                             handler), status, reason,
+                                            headers)
+
+            parser, unmarshaller = xclient.getparser()
+            parser.feed(data)
+            parser.close()
+            return unmarshaller.close()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if reused:
+                # server probably closed the idle connection; retry once
+                keep = False
+                return await self.__request(handler, body)
+            raise
+        finally:
+            if keep and len(self.__idle) < self.__max_idle:
+                self.__idle.append((reader, writer))
+            else:
+                writer.close()
+
+    async def call(self, method, *params):
+        "Call `method` on the remote server and return the result"
+        if self.__active is None:
+            self.__active = asyncio.Semaphore(self.__max_active)
+
+        body = xclient.dumps(params, method).encode("utf-8")
+        async with self.__active:
+            self.__num_requests += 1
+            try:
+                response = await asyncio.wait_for(self.__request("/RPC2",
+                                                                 body),
+                                                  self.__timeout)
+            except asyncio.TimeoutError:
+                raise socket.timeout("%s(%s) timed out after %s seconds" %
+                                     (method, self, self.__timeout))
+
+        if len(response) == 1:
+            response = response[0]
+        return response
+
+    def close(self):
+        "Close all idle connections"
+        idle = self.__idle
+        self.__idle = []
+        for _, writer in idle:
+            writer.close()
+
+    @property
+    def statistics(self):
+        "Return the number of requests sent and connections opened"
+        return {
+            "requests": self.__num_requests,
+            "connections": self.__num_opened,
+            "idle": len(self.__idle),
+        }
+
+
+class ControlLoop(object):
+    """
+    Event loop running on a single daemon thread which is shared by all
+    asynchronous component operations
+    """
+
+    __INSTANCE = None
+    __LOCK = threading.Lock()
+
+    def __init__(self, name="ControlLoop"):
+        self.__loop = asyncio.new_event_loop()
+
+        self.__thread = threading.Thread(target=self.__run, name=name)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __run(self):
+        "Run the event loop forever"
+        asyncio.set_event_loop(self.__loop)
+        self.__loop.run_forever()
+
+    @classmethod
+    def instance(cls):
+        "Return the shared control loop, starting it if necessary"
+        with cls.__LOCK:
+            if cls.__INSTANCE is None:
+                cls.__INSTANCE = ControlLoop()
+            return cls.__INSTANCE
+
+    @property
+    def loop(self):
+        "Return the asyncio event loop"
+        return self.__loop
+
+    def run(self, coro, timeout=None):
+        """
+        Run a coroutine on the control loop and wait for its result.
+        This must not be called from the control loop thread.
+        """
+        return self.submit(coro).result(timeout)
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the control loop, returning a
+        concurrent.futures.Future
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.__loop)
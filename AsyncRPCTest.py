@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+import socket
+import threading
+import time
+import unittest
+
+try:
+    from SocketServer import ThreadingMixIn
+except:  # ModuleNotFoundError only works under 2.7/3.0
+    from socketserver import ThreadingMixIn
+
+try:
+    import xmlrpclib as xclient
+except ImportError:
+    import xmlrpc.client as xclient
+
+from AsyncRPC import AsyncRPCClient, ControlLoop
+from CompOp import ComponentGroup, OpGetMultiBeanFields, OpGetState
+from DAQClient import DAQClient, DAQClientState
+from DAQRPC import KeepAliveRequestHandler, RPCServer
+
+from DAQMocks import MockCnCLogger, MockLogger
+
+
+class KeepAliveServer(ThreadingMixIn, RPCServer):
+    daemon_threads = True
+
+    def __init__(self):
+        RPCServer.__init__(self, 0, request_handler=KeepAliveRequestHandler)
+
+
+class AsyncDAQClient(DAQClient):
+    def __init__(self, name, num, port, mbean_port, appender):
+        self.__appender = appender
+
+        super(AsyncDAQClient, self).__init__(name, num, "localhost", port,
+                                             mbean_port, [], quiet=True)
+
+    def create_logger(self, quiet):
+        return MockCnCLogger(self.fullname, appender=self.__appender,
+                             quiet=quiet)
+
+
+class AsyncRPCTest(unittest.TestCase):
+    def setUp(self):
+        self.__servers = []
+
+    def tearDown(self):
+        for srvr in self.__servers:
+            srvr.server_close()
+
+    def __start_server(self, server):
+        self.__servers.append(server)
+
+        server.register_function(lambda val: val * 2, "double")
+        server.register_function(self.__fail, "fail")
+        server.register_function(lambda: "running", "xmlrpc.getState")
+        server.register_function(lambda bean, flds: {fld: "%sL" % len(fld)
+                                                     for fld in flds},
+                                 "mbean.getAttributes")
+        server.register_function(lambda secs: time.sleep(secs) or 0, "sleep")
+
+        thrd = threading.Thread(target=server.serve_forever)
+        thrd.daemon = True
+        thrd.start()
+
+        return server.server_address[1]
+
+    @classmethod
+    def __fail(cls):
+        raise ValueError("Failed")
+
+    def test_keep_alive(self):
+        port = self.__start_server(KeepAliveServer())
+
+        client = AsyncRPCClient("localhost", port, timeout=5)
+        control = ControlLoop.instance()
+        for val in range(5):
+            self.assertEqual(val * 2, control.run(client.double(val), 5))
+
+        self.assertEqual(5, client.statistics["requests"])
+        self.assertEqual(1, client.statistics["connections"])
+
+    def test_no_keep_alive(self):
+        port = self.__start_server(RPCServer(0))
+
+        client = AsyncRPCClient("localhost", port, timeout=5)
+        control = ControlLoop.instance()
+        for val in range(3):
+            self.assertEqual(val * 2, control.run(client.double(val), 5))
+
+        self.assertEqual(3, client.statistics["connections"])
+
+    def test_fault(self):
+        port = self.__start_server(KeepAliveServer())
+
+        client = AsyncRPCClient("localhost", port, timeout=5)
+        control = ControlLoop.instance()
+        self.assertRaises(xclient.Fault, control.run, client.fail(), 5)
+
+        # connection should still be usable after a fault
+        self.assertEqual(4, control.run(client.double(2), 5))
+        self.assertEqual(1, client.statistics["connections"])
+
+    def test_timeout(self):
+        port = self.__start_server(KeepAliveServer())
+
+        client = AsyncRPCClient("localhost", port, timeout=0.1)
+        control = ControlLoop.instance()
+        self.assertRaises(socket.timeout, control.run, client.sleep(1), 5)
+
+    def test_component_group(self):
+        port = self.__start_server(KeepAliveServer())
+
+        appender = MockLogger("comp")
+        comps = [AsyncDAQClient("stringHub", num, port, port, appender)
+                 for num in range(1, 6)]
+        for comp in comps:
+            self.assertTrue(comp.async_client is not None)
+
+        logger = MockLogger("group")
+        states = ComponentGroup.run_simple(OpGetState, comps, (), logger,
+                                           wait_secs=5)
+        for comp in comps:
+            self.assertEqual("running", states[comp])
+
+        attrs = ComponentGroup.run_simple(OpGetMultiBeanFields, comps,
+                                          ("stringhub", ["ab", "abc"]),
+                                          logger, wait_secs=5)
+        for comp in comps:
+            self.assertEqual({"ab": 2, "abc": 3}, attrs[comp])
+
+        logger.check_status(10)
+
+    def test_missing_component(self):
+        # find a port with nothing listening on it
+        sock = socket.socket()
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        appender = MockLogger("comp")
+        comp = AsyncDAQClient("stringHub", 1, port, port, appender)
+
+        logger = MockLogger("group")
+        states = ComponentGroup.run_simple(OpGetState, (comp, ), (), logger,
+                                           wait_secs=5)
+        self.assertEqual(DAQClientState.MISSING, states[comp])
+
+
+if __name__ == '__main__':
+    unittest.main()
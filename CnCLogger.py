@@ -9,7 +9,8 @@ from __future__ import print_function
 
 import sys
 
-from DAQLog import DAQLog, LiveSocketAppender, LogException, LogSocketAppender
+from DAQLog import AsyncAppender, DAQLog, LiveSocketAppender, LogException, \
+     LogSocketAppender
 from i3helper import Comparable
 
 
@@ -85,13 +86,17 @@ class CnCLogger(DAQLog):
         return '?LOG?'
 
     def __add_appenders(self):
+        # socket writes are done by a background thread so callers don't
+        # block on a slow log server
         if self.__log_info.log_host is not None:
-            self.add_appender(LogSocketAppender(self.__log_info.log_host,
-                                                self.__log_info.log_port))
+            apnd = LogSocketAppender(self.__log_info.log_host,
+                                     self.__log_info.log_port)
+            self.add_appender(AsyncAppender(apnd))
 
         if self.__log_info.live_host is not None:
-            self.add_appender(LiveSocketAppender(self.__log_info.live_host,
-                                                 self.__log_info.live_port))
+            apnd = LiveSocketAppender(self.__log_info.live_host,
+                                      self.__log_info.live_port)
+            self.add_appender(AsyncAppender(apnd))
         if not self.has_appender():
             raise LogException("Not logging to socket or I3Live")
 
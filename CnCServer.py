@@ -26,16 +26,20 @@ from CnCLogger import CnCLogger
 from CompOp import ComponentGroup, OpClose, OpGetConnectionInfo, OpGetState, \
     OpResetComponent
 from ComponentManager import ComponentManager
-from DAQClient import ComponentName, DAQClient, DAQClientState
+from DAQClient import ComponentName, DAQClient, DAQClientState, MBeanClient
 from DAQConfig import DAQConfigException, DAQConfigParser
 from DAQConst import DAQPort
 from DAQLive import DAQLive
 from DAQLog import LogSocketServer
-from DAQRPC import RPCClient, RPCServer
+from DAQRPC import KeepAliveRequestHandler, RPCClient, RPCServer
 from Daemon import Daemon
 from DumpThreads import DumpThreadsOnSignal
 from ListOpenFiles import ListOpenFiles
+from LivenessTracker import LivenessTracker
+from MoniBinary import format_names
+from MonitorTask import MonitorTask
 from Process import find_python_process
+from RPCCodec import codec_names
 from RunSet import RunSet
 from RunSetState import RunSetState
 from i3helper import reraise_excinfo
@@ -55,16 +59,25 @@ PDAQ_HOME = find_pdaq_trunk()
 class DAQPool(object):
     "Pool of DAQClients and RunSets"
 
+    # number of seconds between "Waiting for" messages while collecting
+    # runset components
+    COLLECT_MSG_SECS = 5
+
     def __init__(self):
         "Create an empty pool"
         self.__pool = {}
         self.__pool_lock = threading.RLock()
+        # notified when a component is added to the pool
+        self.__pool_changed = threading.Condition(self.__pool_lock)
 
         self.__sets = []
         self.__sets_lock = threading.RLock()
 
         self.__starting = False
 
+        # schedule of liveness checks for pooled components
+        self.__liveness = LivenessTracker()
+
         super(DAQPool, self).__init__()
 
     def __add_to_pool(self, comp):
@@ -76,6 +89,8 @@ class DAQPool(object):
                 return False
 
         self.__pool[comp.name].append(comp)
+        self.__liveness.add(comp)
+        self.__pool_changed.notify_all()
         return True
 
     def __add_known(self, needed, comp_list):
@@ -97,6 +112,7 @@ class DAQPool(object):
                     if comp.num == cobj.num and not comp.is_dying:
                         # grab the component from the pool
                         self.__pool[cobj.name].remove(comp)
+                        self.__liveness.remove(comp)
                         pool_len = len(self.__pool[cobj.name])
                         if pool_len == 0:
                             # delete component list if this was the only entry
@@ -146,22 +162,31 @@ class DAQPool(object):
         needed = self.__build_comp_name_list(required_list)
 
         dt_timeout = datetime.timedelta(seconds=timeout)
+        dt_msg = datetime.timedelta(seconds=self.COLLECT_MSG_SECS)
 
         tstart = datetime.datetime.now()
+        last_msg = None
         while self.__starting and \
           len(needed) > 0:  # pylint: disable=len-as-condition
 
             # add all known components, unknown components are left in 'needed'
             with self.__pool_lock:
                 needed = self.__add_known(needed, comp_list)
+                if len(needed) == 0:  # pylint: disable=len-as-condition
+                    break
 
-            if len(needed) > 0:  # pylint: disable=len-as-condition
-                if datetime.datetime.now() - tstart >= dt_timeout:
+                now = datetime.datetime.now()
+                if now - tstart >= dt_timeout:
                     break
 
-                logger.info("Waiting for %s" %
-                            (ComponentManager.format_component_list(needed)), )
-                time.sleep(5)
+                if last_msg is None or now - last_msg >= dt_msg:
+                    logger.info("Waiting for %s" %
+                                (ComponentManager.format_component_list(
+                                    needed), ))
+                    last_msg = now
+
+                # wake up as soon as another component registers
+                self.__pool_changed.wait(self.COLLECT_MSG_SECS)
 
         if not self.__starting:
             raise StartInterruptedException("Collect interrupted")
@@ -197,12 +222,14 @@ class DAQPool(object):
                                      " run configuration \"%s\"" % run_config)
 
         comp_list = []
+        collect_start = time.time()
         try:
             wait_list = self.__collect_components(name_list, comp_list, logger,
                                                   timeout)
         except:
             self.__return_components(comp_list, logger)
             raise
+        collect_secs = time.time() - collect_start
 
         if wait_list is not None:
             self.__return_components(comp_list, logger)
@@ -226,24 +253,29 @@ class DAQPool(object):
                 runset = None
 
         if runset is not None:
+            runset.set_build_time("collect", collect_secs)
+
             (release, revision) = self.release
             try:
                 if self.__starting:
-                    # figure out how components should be connected
+                    # figure out how components should be connected and
+                    # the order in which they should be started/stopped
+                    map_start = time.time()
                     conn_map = runset.build_connection_map()
-                if self.__starting:
-                    # connect components to each other
-                    runset.connect(conn_map)
-                if self.__starting:
-                    # set the order in which components should be configured
                     runset.set_order(conn_map, logger)
+                    runset.set_build_time("connection_map",
+                                          time.time() - map_start)
                 if self.__starting:
-                    # configure components
-                    runset.configure()
+                    # connect components to each other, configuring each
+                    #  component as soon as it's connected
+                    runset.connect_and_configure(conn_map)
                 if self.__starting:
                     # if this is a replay run, compute the offset for hit times
                     if run_config.update_hitspool_times:
+                        replay_start = time.time()
                         runset.init_replay_hubs()
+                        runset.set_build_time("replay",
+                                              time.time() - replay_start)
                 if not self.__starting:
                     # if the process was interrupted at any point,
                     #  throw an exception
@@ -256,8 +288,15 @@ class DAQPool(object):
                     self.restart_runset(runset, logger)
                 raise
 
+            times = runset.build_times
+            tstr = ", ".join("%s %.2fs" % (stage, times[stage])
+                             for stage in ("collect", "connection_map",
+                                           "connect", "configure", "replay")
+                             if stage in times)
+
             cstr = ComponentManager.format_component_list(runset.components)
-            logger.info("Built runset #%d: %s" % (runset.id, cstr))
+            logger.info("Built runset #%d: %s [%.2fs: %s]" %
+                        (runset.id, cstr, sum(times.values()), tstr))
 
         return runset
 
@@ -359,37 +398,87 @@ class DAQPool(object):
         finally:
             self.__starting = False
 
-    def monitor_clients(self, logger=None):
-        "check that all components in the pool are still alive"
+    def __check_clients(self, clients, logger):
+        """
+        Ping the clients, remove any dead clients from the pool and
+        reschedule the liveness checks for the rest
+        Return the number of clients which answered
+        """
         count = 0
 
+        # clients whose liveness checks have not been rescheduled yet
+        unchecked = set(clients)
+        try:
+            states = ComponentGroup.run_simple(OpGetState, clients, (),
+                                               logger)
+            for client in clients:
+                if client in states:
+                    state_str = str(states[client])
+                else:
+                    state_str = DAQClientState.MISSING
+
+                if state_str == DAQClientState.DEAD or \
+                   (state_str == DAQClientState.HANGING and client.is_dead):
+                    unchecked.discard(client)
+                    self.remove(client)
+                    try:
+                        client.close()
+                    except:  # pylint: disable=bare-except
+                        if logger is not None:
+                            logger.error("Could not close %s: %s" %
+                                         (client.fullname, exc_string()))
+                elif state_str in (DAQClientState.MISSING,
+                                   DAQClientState.HANGING):
+                    client.add_dead_count()
+                    self.__liveness.failed(client)
+                    unchecked.discard(client)
+                else:
+                    self.__liveness.succeeded(client)
+                    unchecked.discard(client)
+                    count += 1
+        finally:
+            # don't let an error drop components from the schedule
+            for client in unchecked:
+                self.__liveness.failed(client)
+
+        return count
+
+    def heartbeat(self, comp, now=None):
+        """
+        Note that a pooled component reported that it is alive.
+        Return False if the component is not in the pool.
+        """
+        if comp not in self.__liveness:
+            return False
+        self.__liveness.heartbeat(comp, now=now)
+        return True
+
+    def monitor_clients(self, logger=None):
+        "check that all components in the pool are still alive"
         clients = []
-        for pool_bin in list(self.__pool.values()):
-            for client in pool_bin:
-                clients.append(client)
-
-        states = ComponentGroup.run_simple(OpGetState, clients, (), logger)
-        for client in clients:
-            if client in states:
-                state_str = str(states[client])
-            else:
-                state_str = DAQClientState.MISSING
+        with self.__pool_lock:
+            for pool_bin in list(self.__pool.values()):
+                for client in pool_bin:
+                    clients.append(client)
 
-            if state_str == DAQClientState.DEAD or \
-               (state_str == DAQClientState.HANGING and client.is_dead):
-                self.remove(client)
-                try:
-                    client.close()
-                except:  # pylint: disable=bare-except
-                    if logger is not None:
-                        logger.error("Could not close %s: %s" %
-                                     (client.fullname, exc_string()))
-            elif state_str in (DAQClientState.MISSING, DAQClientState.HANGING):
-                client.add_dead_count()
-            else:
-                count += 1
+        return self.__check_clients(clients, logger)
 
-        return count
+    def monitor_due_clients(self, logger=None, now=None):
+        """
+        check the pooled components whose liveness checks are due
+        Return the number of components which were checked
+        """
+        clients = self.__liveness.due(now)
+        if len(clients) == 0:  # pylint: disable=len-as-condition
+            return 0
+
+        self.__check_clients(clients, logger)
+        return len(clients)
+
+    @property
+    def next_liveness_check(self):
+        "Return the time of the next liveness check (or None)"
+        return self.__liveness.next_deadline
 
     @property
     def num_components(self):
@@ -421,6 +510,7 @@ class DAQPool(object):
                 pool_len = len(self.__pool[comp.name])
                 if pool_len == 0:
                     del self.__pool[comp.name]
+            self.__liveness.remove(comp)
 
         return comp
 
@@ -521,11 +611,20 @@ class DAQPool(object):
     def stop_collecting(self):
         if self.__starting:
             self.__starting = False
+            with self.__pool_lock:
+                self.__pool_changed.notify_all()
 
 
 class ThreadedRPCServer(ThreadingMixIn, RPCServer):
     "The standard out-of-the-both threaded RPC server"
 
+    # don't wait for idle keep-alive connections when shutting down
+    daemon_threads = True
+
+    def __init__(self, portnum):
+        RPCServer.__init__(self, portnum,
+                           request_handler=KeepAliveRequestHandler)
+
 
 class Connector(object):
     "Component connector"
@@ -596,6 +695,9 @@ class CnCServer(DAQPool):
     # max time to wait for components to register
     REGISTRATION_TIMEOUT = 60
 
+    # maximum number of seconds between monitor_loop passes
+    MONITOR_SLEEP_SECS = 1.0
+
     def __init__(self, name="GenericServer", cluster_desc=None, copy_dir=None,
                  dash_dir=None, default_log_dir=None, run_config_dir=None,
                  daq_data_dir=None, jade_dir=None, log_host=None,
@@ -670,6 +772,7 @@ class CnCServer(DAQPool):
             self.__server.register_function(self.rpc_close_files)
             self.__server.register_function(self.rpc_component_connector_info)
             self.__server.register_function(self.rpc_component_count)
+            self.__server.register_function(self.rpc_component_heartbeat)
             self.__server.register_function(self.rpc_component_get_bean_field)
             self.__server.register_function(self.rpc_component_list)
             self.__server.register_function(self.rpc_component_list_beans)
@@ -696,6 +799,7 @@ class CnCServer(DAQPool):
             self.__server.register_function(self.rpc_runset_stop_run)
             self.__server.register_function(self.rpc_runset_subrun)
             self.__server.register_function(self.rpc_runset_switch_run)
+            self.__server.register_function(self.rpc_runset_timing)
             self.__server.register_function(self.rpc_version)
 
         DumpThreadsOnSignal(sys.stderr, logger=self.__log)
@@ -954,29 +1058,21 @@ class CnCServer(DAQPool):
 
     def monitor_loop(self):
         "Monitor components to ensure they're still alive"
-        new = True
-        check_clients = 0
         last_count = 0
         self.__monitoring = True
         while self.__monitoring:
-            # check clients every 5 seconds or so
+            # only ping the components whose liveness checks are due
             #
-            if check_clients == 5:
-                check_clients = 0
-                try:
-                    count = self.monitor_clients(self.__log)
-                except:  # pylint: disable=bare-except
-                    self.__log.error("Monitoring clients: " + exc_string())
-                    count = last_count
-
-                new = (last_count != count)
-                if new and not self.__quiet:
-                    print("%d bins, %d comps" %
-                          (self.num_unused, count), file=sys.stderr)
-
-                last_count = count
+            try:
+                self.monitor_due_clients(self.__log)
+            except:  # pylint: disable=bare-except
+                self.__log.error("Monitoring clients: " + exc_string())
 
-            check_clients += 1
+            count = self.num_components
+            if count != last_count and not self.__quiet:
+                print("%d bins, %d comps" %
+                      (self.num_unused, count), file=sys.stderr)
+            last_count = count
 
             problems = self.get_runsets_in_error_state()
             for runset in problems:
@@ -991,7 +1087,13 @@ class CnCServer(DAQPool):
                     self.__log.error("Failed to return %s: %s" %
                                      (runset, exc_string()))
 
-            time.sleep(1)
+            # sleep until the next liveness check is due, but still look
+            # for broken runsets at least once a second
+            delay = self.MONITOR_SLEEP_SECS
+            next_check = self.next_liveness_check
+            if next_check is not None:
+                delay = max(min(delay, next_check - time.time()), 0.0)
+            time.sleep(delay)
 
     @property
     def name(self):
@@ -1070,6 +1172,17 @@ class CnCServer(DAQPool):
 
         return comp.mbean.get(bean, field)
 
+    def rpc_component_heartbeat(self, comp_id):
+        """
+        Component reports that it is still alive, so CnCServer can skip
+        its next liveness check.  Returns False if the component is not in
+        the pool and should register again.
+        """
+        comp = self.__find_component_by_id(comp_id)
+        if comp is None:
+            return False
+        return self.heartbeat(comp)
+
     def rpc_component_list(self, include_runset_components=False):
         "return dictionary of component names -> IDs"
         id_dict = {}
@@ -1409,6 +1522,18 @@ class CnCServer(DAQPool):
 
         return "OK"
 
+    def rpc_runset_timing(self, rsid):
+        """
+        return the per-phase and per-component timing of the specified
+        runset's latest build, start, stop and switch
+        """
+        runset = self.find_runset(rsid)
+
+        if not runset:
+            raise CnCServerException('Could not find runset#%d' % rsid)
+
+        return runset.timing()
+
     def rpc_version(self):
         "return the CnCServer release/revision info"
         return self.__version_info
@@ -1572,6 +1697,13 @@ def main():
     parser.add_argument("-s", "--jade-dir", dest="jade_dir",
                         help=("Directory where JADE will pick up"
                               " logs/moni files"))
+    parser.add_argument("--moni-format", dest="moni_format",
+                        choices=format_names(), default=None,
+                        help="Format used to write .moni files")
+    parser.add_argument("--rpc-codec", dest="rpc_codec",
+                        choices=codec_names(), default=None,
+                        help=("Ask components to use this RPC encoding"
+                              " instead of XML-RPC if they support it"))
     parser.add_argument("-v", "--verbose", dest="quiet",
                         action="store_false", default=True,
                         help="Write catchall messages to console")
@@ -1639,6 +1771,13 @@ def main():
     if args.daemon:
         Daemon().daemonize()
 
+    if args.rpc_codec is not None:
+        DAQClient.RPC_CODEC = args.rpc_codec
+        MBeanClient.RPC_CODEC = args.rpc_codec
+
+    if args.moni_format is not None:
+        MonitorTask.MONI_FORMAT = args.moni_format
+
     if args.config_dir is not None:
         config_dir = args.config_dir
     else:
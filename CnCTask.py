@@ -72,6 +72,11 @@ class CnCTask(object):
         "Return this task's logger"
         return self.__logger
 
+    @property
+    def mbean_cache(self):
+        "Return the task manager's MBean snapshot cache (or None)"
+        return getattr(self.__task_mgr, "mbean_cache", None)
+
     def reset(self):
         "Reset everything at the end of the run"
         self.__timer = None
@@ -3,13 +3,21 @@
 "Safe" interface for various RPC calls
 """
 
+import threading
+
 from DAQClient import BeanTimeoutException
-from ThreadGroup import GThread, ThreadGroup
+from ThreadGroup import PooledTask, ThreadGroup, WorkerPool
 from decorators import classproperty
 
 from exc_string import exc_string, set_exc_string_encoding
 set_exc_string_encoding("ascii")
 
+try:
+    import AsyncCompOp
+except (ImportError, SyntaxError):
+    # asynchronous operations require Python 3.5+
+    AsyncCompOp = None
+
 
 class ComponentOperationException(Exception):
     "General ComponentOperation exception"
@@ -242,8 +250,8 @@ class ComponentResult(OperationResult):
         return self.__value
 
 
-class ComponentThread(GThread):
-    def __init__(self, operation, comp, args, logger):
+class ComponentTask(PooledTask):
+    def __init__(self, operation, comp, args, logger, pool, timeout=None):
         self.__operation = operation
         self.__comp = comp
         self.__args = args
@@ -251,15 +259,34 @@ class ComponentThread(GThread):
         self.__result = None
 
         name = "%s->%s" % (self.__comp, self.__operation.name)
-        super(ComponentThread, self).__init__(target=self.__execute, name=name)
+        super(ComponentTask, self).__init__(target=self.__execute, name=name,
+                                            timeout=timeout, pool=pool)
 
     def __execute(self):
         self.__result = self.__operation.execute(self.__comp, self.__args)
 
+    @property
+    def arguments(self):
+        return self.__args
+
+    def complete(self, future):
+        "Record the result of an operation which ran on the control loop"
+        error = None
+        try:
+            self.__result = future.result()
+        except Exception as exception:  # pylint: disable=broad-except
+            self.report_exception(exception)
+            error = exception
+        self.finish(error=error)
+
     @property
     def component(self):
         return self.__comp
 
+    @property
+    def operation(self):
+        return self.__operation
+
     def report_exception(self, exception):
         if isinstance(exception, BeanTimeoutException):
             self.__logger.error("%s(%s): %s" %
@@ -285,12 +312,59 @@ class ComponentGroup(ThreadGroup):
     "result for an erroneous thread"
     RESULT_ERROR = OperationResult("???")
 
-    def __init__(self, op):
-        "Create a runset thread group"
+    # number of seconds before a running operation is considered hung
+    DEFAULT_TIMEOUT = 10.0
+
+    # worker pool shared by all component groups
+    __POOL = None
+    __POOL_LOCK = threading.Lock()
+
+    # runs asynchronous operations on the shared control loop
+    __ASYNC_POOL = None
+
+    # set to False to run every operation on the worker pool
+    USE_ASYNC = True
+
+    def __init__(self, op, timeout=None):
+        """
+        Create a runset thread group
+        op - ComponentOperation run on each component
+        timeout - number of seconds before an operation is considered hung
+        """
         self.__op = op
+        if timeout is None:
+            self.__timeout = self.DEFAULT_TIMEOUT
+        else:
+            self.__timeout = timeout
 
         super(ComponentGroup, self).__init__(name=op.name)
 
+    @classmethod
+    def async_pool(cls):
+        "Return the pool which runs operations on the shared control loop"
+        with cls.__POOL_LOCK:
+            if cls.__ASYNC_POOL is None:
+                cls.__ASYNC_POOL = AsyncCompOp.AsyncOperationPool()
+            return cls.__ASYNC_POOL
+
+    @classmethod
+    def pool(cls):
+        "Return the worker pool shared by all component groups"
+        with cls.__POOL_LOCK:
+            if cls.__POOL is None:
+                cls.__POOL = WorkerPool(name="ComponentPool")
+            return cls.__POOL
+
+    @classmethod
+    def set_pool_size(cls, max_workers):
+        """
+        Replace the shared worker pool with one using at most `max_workers`
+        threads.  Operations queued on the old pool will still finish.
+        """
+        with cls.__POOL_LOCK:
+            cls.__POOL = WorkerPool(max_workers=max_workers,
+                                    name="ComponentPool")
+
     @classmethod
     def has_value(cls, result, full_result=False):
         if result == ComponentGroup.RESULT_HANGING or \
@@ -334,36 +408,47 @@ class ComponentGroup(ThreadGroup):
 
     @staticmethod
     def run_simple(operation, comps, args, logger, wait_secs=2, wait_reps=4,
-                   full_result=False, report_errors=False):
-        group = ComponentGroup(operation)
+                   full_result=False, report_errors=False, timings=None):
+        """
+        Run the operation on all components and return a dictionary mapping
+        each component to its result.  If `timings` is a dictionary, the
+        number of seconds each component took is added to it.
+        """
+        group = ComponentGroup(operation, timeout=wait_secs)
         for comp in comps:
             group.run_thread(comp, args, logger=logger)
         group.wait(wait_secs=wait_secs, reps=wait_reps)
+        if timings is not None:
+            timings.update(group.times())
         if report_errors:
             if group.report_errors(logger, operation.name):
                 return None
         return group.results(full_result=full_result, comp_key=True,
                              logger=logger)
 
-    def run_thread(self, comp, args, logger=None):
-        "Add a thread to the group"
-        thread = ComponentThread(self.__op, comp, args, logger)
-        self.add(thread, start_immediate=True)
+    def times(self):
+        """
+        Return a dictionary mapping each component to the number of seconds
+        its operation took.  Unfinished operations are not included.
+        """
+        times = {}
+        for thrd in self.threads:
+            elapsed = getattr(thrd, "elapsed", None)
+            if elapsed is not None:
+                times[thrd.component] = elapsed
+        return times
 
-    def wait(self, wait_secs=2, reps=4):
+    def run_thread(self, comp, args, logger=None):
         """
-        Wait for all the threads to finish
-        wait_secs - total number of seconds to wait
-        reps - number of times to loop before deciding threads are hung
-        NOTE:
-        if all threads are hung, max wait time is (#threads * wait_secs * reps)
+        Run the operation for this component on the shared control loop if
+        possible, otherwise queue it on the shared worker pool
         """
-        part_secs = float(wait_secs) / float(reps)
-        for _ in range(reps):
-            alive = False
-            for thrd in self.threads:
-                if thrd.is_alive():
-                    thrd.join(part_secs)
-                    alive |= thrd.is_alive()
-            if not alive:
-                break
+        if self.USE_ASYNC and AsyncCompOp is not None and \
+           AsyncCompOp.can_run(self.__op, comp):
+            pool = self.async_pool()
+        else:
+            pool = self.pool()
+
+        task = ComponentTask(self.__op, comp, args, logger, pool,
+                             timeout=self.__timeout)
+        self.add(task, start_immediate=True)
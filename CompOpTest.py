@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+import threading
+import time
+import unittest
+
+from CompOp import ComponentGroup, OpGetState
+from ThreadGroup import GThread, PooledTask, ThreadGroup, WorkerPool
+
+from DAQMocks import MockLogger
+
+
+class FakeComponent(object):
+    def __init__(self, name, num, state="idle", gate=None):
+        self.__name = name
+        self.__num = num
+        self.__state = state
+        self.__gate = gate
+
+    def __str__(self):
+        return self.fullname
+
+    @property
+    def fullname(self):
+        return "%s#%d" % (self.__name, self.__num)
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def state(self):
+        if self.__gate is not None:
+            self.__gate.wait()
+        return self.__state
+
+
+class SlowComponent(FakeComponent):
+    def __init__(self, name, num, delay, state="idle"):
+        self.__delay = delay
+        super(SlowComponent, self).__init__(name, num, state=state)
+
+    @property
+    def state(self):
+        time.sleep(self.__delay)
+        return super(SlowComponent, self).state
+
+
+class CompOpTest(unittest.TestCase):
+    def setUp(self):
+        ComponentGroup.set_pool_size(4)
+
+    def tearDown(self):
+        ComponentGroup.set_pool_size(WorkerPool.MAX_WORKERS)
+
+    def test_results(self):
+        comps = [FakeComponent("stringHub", num, state="ready")
+                 for num in range(10)]
+
+        logger = MockLogger("results")
+        states = ComponentGroup.run_simple(OpGetState, comps, (), logger)
+
+        self.assertEqual(len(comps), len(states))
+        for comp in comps:
+            self.assertEqual("ready", states[comp])
+
+        logger.check_status(10)
+
+    def test_reuse_threads(self):
+        comps = [FakeComponent("stringHub", num) for num in range(10)]
+
+        logger = MockLogger("reuse")
+        for _ in range(5):
+            ComponentGroup.run_simple(OpGetState, comps, (), logger)
+
+        pool = ComponentGroup.pool()
+        self.assertTrue(pool.num_created <= pool.max_workers,
+                        "Created %d threads for a %d-thread pool" %
+                        (pool.num_created, pool.max_workers))
+
+    def test_hanging(self):
+        gate = threading.Event()
+        hung = FakeComponent("stringHub", 1, gate=gate)
+        comps = [hung, ]
+        comps += [FakeComponent("stringHub", num, state="running")
+                  for num in range(2, 12)]
+
+        logger = MockLogger("hanging")
+        try:
+            states = ComponentGroup.run_simple(OpGetState, comps, (), logger,
+                                               wait_secs=0.2, wait_reps=2)
+            self.assertEqual(ComponentGroup.RESULT_HANGING, states[hung])
+            for comp in comps[1:]:
+                self.assertEqual("running", states[comp])
+
+            # pool should still have room after a worker is hung
+            states = ComponentGroup.run_simple(OpGetState, comps[1:], (),
+                                               logger)
+            for comp in comps[1:]:
+                self.assertEqual("running", states[comp])
+        finally:
+            gate.set()
+
+    def test_queued_task_not_expired(self):
+        gate = threading.Event()
+        pool = WorkerPool(max_workers=1)
+
+        blocker = PooledTask(target=gate.wait, name="blocker", pool=pool)
+        blocker.start()
+
+        queued = PooledTask(target=lambda: None, name="queued", timeout=0.1,
+                            pool=pool)
+        queued.start()
+        self.assertTrue(queued.is_alive())
+
+        # the deadline starts when the task runs, not when it is queued
+        time.sleep(0.2)
+        gate.set()
+        queued.join(5)
+        self.assertFalse(queued.is_alive())
+        self.assertFalse(queued.is_error)
+
+    def test_slow_tasks(self):
+        pool = WorkerPool(max_workers=2)
+
+        group = ThreadGroup(name="slow")
+        for num in range(6):
+            group.add(PooledTask(target=time.sleep, name="t%d" % num,
+                                 args=(0.3, ), timeout=0.4, pool=pool),
+                      start_immediate=True)
+
+        self.assertTrue(group.wait(wait_secs=10))
+        for task in group.threads:
+            self.assertFalse(task.is_error, "%s failed: %s" %
+                             (task.name, task.error))
+
+    def test_slow_components(self):
+        ComponentGroup.set_pool_size(2)
+
+        comps = [SlowComponent("stringHub", num, 0.3, state="running")
+                 for num in range(6)]
+
+        logger = MockLogger("slow")
+        states = ComponentGroup.run_simple(OpGetState, comps, (), logger,
+                                           wait_secs=0.4, report_errors=True)
+        self.assertIsNotNone(states)
+        for comp in comps:
+            self.assertEqual("running", states[comp])
+
+    def test_elapsed_excludes_queue(self):
+        pool = WorkerPool(max_workers=1)
+
+        group = ThreadGroup(name="elapsed")
+        for num in range(2):
+            group.add(PooledTask(target=time.sleep, name="t%d" % num,
+                                 args=(0.2, ), pool=pool),
+                      start_immediate=True)
+        self.assertTrue(group.wait(wait_secs=5))
+
+        first, second = list(group.threads)
+        for task in (first, second):
+            self.assertTrue(task.elapsed < 0.35,
+                            "%s took %.2fs" % (task.name, task.elapsed))
+        self.assertTrue(second.queue_wait >= 0.15,
+                        "%s only waited %.2fs" % (second.name,
+                                                  second.queue_wait))
+
+    def test_replace_overdue_worker(self):
+        gate = threading.Event()
+        pool = WorkerPool(max_workers=1)
+
+        hung = PooledTask(target=gate.wait, name="hung", timeout=0.1,
+                          pool=pool)
+        queued = PooledTask(target=lambda: None, name="queued", pool=pool)
+
+        group = ThreadGroup(name="overdue")
+        group.add(hung, start_immediate=True)
+        group.add(queued, start_immediate=True)
+
+        try:
+            # the group notices the hung worker and starts a replacement
+            self.assertFalse(group.wait(wait_secs=1))
+            self.assertTrue(queued.done)
+            self.assertFalse(queued.is_error)
+            self.assertTrue(hung.is_alive())
+        finally:
+            gate.set()
+
+    def test_wait_deadline(self):
+        gate = threading.Event()
+        comps = [FakeComponent("stringHub", num, gate=gate)
+                 for num in range(10)]
+
+        group = ComponentGroup(OpGetState)
+        for comp in comps:
+            group.run_thread(comp, ())
+
+        try:
+            start = time.time()
+            self.assertFalse(group.wait(wait_secs=0.3, reps=10))
+            elapsed = time.time() - start
+            self.assertTrue(elapsed < 1.0,
+                            "Waited %.2fs for 10 hung components" %
+                            (elapsed, ))
+            for result in group.results().values():
+                self.assertEqual(ComponentGroup.RESULT_HANGING, result)
+        finally:
+            gate.set()
+
+        self.assertTrue(group.wait(wait_secs=5))
+        for result in group.results().values():
+            self.assertEqual("idle", result)
+
+    def test_wait_threads(self):
+        gate = threading.Event()
+
+        group = ThreadGroup(name="wait")
+        for _ in range(5):
+            group.add(GThread(target=gate.wait), start_immediate=True)
+
+        self.assertFalse(group.wait(wait_secs=0.1))
+
+        gate.set()
+        start = time.time()
+        self.assertTrue(group.wait(wait_secs=10))
+        self.assertTrue(time.time() - start < 5.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,6 +17,12 @@ from scmversion import get_scmversion_str
 from exc_string import exc_string, set_exc_string_encoding
 set_exc_string_encoding("ascii")
 
+try:
+    from AsyncRPC import AsyncRPCClient
+except (ImportError, SyntaxError):
+    # asyncio client requires Python 3.5+
+    AsyncRPCClient = None
+
 
 def unfix_value(obj):
     """
@@ -47,6 +53,16 @@ def unfix_value(obj):
     return obj
 
 
+def unfix_result(client, obj):
+    """
+    Return `obj` after undoing any string-encoded numbers, unless `client`
+    negotiated a codec which sends longs as numbers
+    """
+    if isinstance(client, RPCClient) and client.native_longs:
+        return obj
+    return unfix_value(obj)
+
+
 class BeanException(Exception):
     "Base MBean exception"
 
@@ -66,16 +82,24 @@ class BeanTimeoutException(BeanException):
 class MBeanClient(object):
     "MBean client interface"
 
+    # name of the RPCCodec encoding requested from the MBean server
+    # (None uses XML-RPC)
+    RPC_CODEC = None
+
     def __init__(self, comp_name, host, port):
         "Python interface to Java MBeanAgent"
         self.__comp_name = comp_name
         self.__client = self.create_client(host, port)
+        self.__async_client = self.create_async_client(host, port)
         self.__bean_list = []
         self.__bean_fields = {}
 
         self.__bean_lock = threading.Lock()
         self.__loaded_info = False
 
+        # set to False if the remote server doesn't support multicalls
+        self.__multicall_ok = True
+
     def __str__(self):
         return "MBeanClient(%s)" % (self.__comp_name, )
 
@@ -100,10 +124,20 @@ class MBeanClient(object):
                                     (self.__comp_name, exc_string()))
 
         failed = []
-        for bean in self.__bean_list:
+        try:
+            results = self.__multicall([("mbean.listGetters", (bean, ))
+                                        for bean in self.__bean_list])
+        except:  # pylint: disable=bare-except
+            # fall back to fetching each bean's getters separately
+            results = None
+        for idx, bean in enumerate(self.__bean_list):
             try:
-                self.__bean_fields[bean] = \
-                  self.__client.mbean.listGetters(bean)
+                if results is not None:
+                    self.__bean_fields[bean] = \
+                      self.multicall_value(results[idx])
+                else:
+                    self.__bean_fields[bean] = \
+                      self.__client.mbean.listGetters(bean)
             except:  # pylint: disable=bare-except
                 # don't let a single failure abort remaining fetches,
                 failed.append(bean)
@@ -118,6 +152,40 @@ class MBeanClient(object):
 
         self.__loaded_info = True
 
+    def __multicall(self, calls):
+        """
+        Send a list of (method, params) pairs in a single 'system.multicall'
+        request and return the list of raw results, or None if the server
+        doesn't support multicalls (or there is only one call)
+        """
+        if not self.__multicall_ok or len(calls) < 2:
+            return None
+
+        reqlist = [{"methodName": method, "params": list(params)}
+                   for method, params in calls]
+        try:
+            results = self.__client.system.multicall(reqlist)
+        except (xclient.Fault, AttributeError):
+            # server doesn't support multicalls, don't bother trying again
+            self.__multicall_ok = False
+            return None
+
+        if not isinstance(results, (list, tuple)) or \
+           len(results) != len(calls):
+            raise BeanException("%s multicall returned %s, not a %d-entry"
+                                " list" % (self.__comp_name, results,
+                                           len(calls)))
+
+        return results
+
+    @classmethod
+    def multicall_value(cls, result):
+        "Return the value from a single multicall result, or raise a Fault"
+        if isinstance(result, dict):
+            raise xclient.Fault(result.get("faultCode", 0),
+                                result.get("faultString", str(result)))
+        return result[0]
+
     def __lock_and_load(self):
         "load bean info from the remote client if it hasn't yet been loaded"
 
@@ -126,9 +194,36 @@ class MBeanClient(object):
                 if not self.__loaded_info:
                     self.__load_bean_info()
 
-    def create_client(self, host, port):  # pylint: disable=no-self-use
+    @property
+    def async_client(self):
+        "Return the asyncio MBean client (or None)"
+        return self.__async_client
+
+    def check_attributes(self, bean, fld_list, attrs):
+        "Validate and return the result of an MBean getAttributes() call"
+        if not isinstance(attrs, dict):
+            raise BeanException("%s getAttributes(%s, %s) should return dict,"
+                                " not %s (%s)" % (self.__comp_name, bean,
+                                                  fld_list, type(attrs),
+                                                  attrs))
+
+        if len(attrs) > 0:  # pylint: disable=len-as-condition
+            for key, val in attrs.items():
+                attrs[key] = unfix_value(val)
+        return attrs
+
+    def create_async_client(self, host, port):
+        """
+        Create an asyncio MBean client, or return None if asynchronous calls
+        are not supported (or the RPC client has been replaced by a mock)
+        """
+        if AsyncRPCClient is None or not isinstance(self.__client, RPCClient):
+            return None
+        return AsyncRPCClient(host, port)
+
+    def create_client(self, host, port):
         "create an MBean RPC client"
-        return RPCClient(host, port)
+        return RPCClient(host, port, codec=self.RPC_CODEC)
 
     def get(self, bean, fld):
         "get the value for a single MBean field"
@@ -147,7 +242,7 @@ class MBeanClient(object):
                                     (self.__comp_name, bean, fld,
                                      exc_string()))
 
-        return unfix_value(val)
+        return unfix_result(self.__client, val)
 
     def get_attributes(self, bean, fld_list):
         "get the values for a list of MBean fields"
@@ -168,16 +263,53 @@ class MBeanClient(object):
                                     (self.__comp_name, bean, fld_list,
                                      exc_string()))
 
-        if not isinstance(attrs, dict):
-            raise BeanException("%s getAttributes(%s, %s) should return dict,"
-                                " not %s (%s)" % (self.__comp_name, bean,
-                                                  fld_list, type(attrs),
-                                                  attrs))
+        return self.check_attributes(bean, fld_list, attrs)
 
-        if len(attrs) > 0:  # pylint: disable=len-as-condition
-            for key, val in attrs.items():
-                attrs[key] = unfix_value(val)
-        return attrs
+    def get_multiple(self, bean_fields):
+        """
+        Fetch values for many MBeans in a single round trip.
+        `bean_fields` is a dictionary mapping bean names to lists of fields.
+        Returns a dictionary mapping each bean name either to a dictionary
+        of field values or, if that bean's request failed, to the
+        BeanException which describes the failure.
+        Falls back to one getAttributes() call per bean if the remote
+        server doesn't support 'system.multicall'.
+        """
+        beans = list(bean_fields.keys())
+
+        try:
+            with self.__bean_lock:
+                results = self.__multicall([("mbean.getAttributes",
+                                             (bean, list(bean_fields[bean])))
+                                            for bean in beans])
+        except socket.error as serr:
+            raise BeanTimeoutException("Cannot get %s MBean attributes:"
+                                       " <socket error %s>" %
+                                       (self.__comp_name, serr))
+        except xclient.ProtocolError as xerr:
+            raise BeanTimeoutException("Cannot get %s MBean attributes:"
+                                       " %s" % (self.__comp_name, xerr))
+
+        values = {}
+        for idx, bean in enumerate(beans):
+            fld_list = bean_fields[bean]
+            try:
+                if results is None:
+                    values[bean] = self.get_attributes(bean, fld_list)
+                    continue
+
+                try:
+                    attrs = self.multicall_value(results[idx])
+                except xclient.Fault as fault:
+                    raise BeanTimeoutException("Cannot get %s MBean \"%s\":"
+                                               " attributes %s" %
+                                               (self.__comp_name, bean,
+                                                fault))
+                values[bean] = self.check_attributes(bean, fld_list, attrs)
+            except BeanException as bex:
+                values[bean] = bex
+
+        return values
 
     def get_bean_names(self):
         "return a list of MBean names associated with this component"
@@ -220,7 +352,7 @@ class MBeanClient(object):
 
         if len(attrs) > 0:  # pylint: disable=len-as-condition
             for key, val in attrs.items():
-                attrs[key] = unfix_value(val)
+                attrs[key] = unfix_result(self.__client, val)
         return attrs
 
     def reload(self):
@@ -342,6 +474,10 @@ class DAQClient(ComponentName):
     #
     ID = UniqueID()
 
+    # name of the RPCCodec encoding requested from the component
+    # (None uses XML-RPC)
+    RPC_CODEC = None
+
     def __init__(self, name, num, host, port, mbean_port, connectors,
                  quiet=False):
         """
@@ -369,6 +505,7 @@ class DAQClient(ComponentName):
         self.__log = self.create_logger(quiet=quiet)
 
         self.__client = self.create_client(host, port)
+        self.__async_client = self.create_async_client(host, port)
 
         try:
             self.__mbean_client = self.create_mbean_client()
@@ -411,6 +548,25 @@ class DAQClient(ComponentName):
         "Increment the 'dead' count"
         self.__dead_count += 1
 
+    @property
+    def async_client(self):
+        "Return the asyncio RPC client for this component (or None)"
+        return self.__async_client
+
+    def check_state(self, state):
+        """
+        Update the 'dead' count using the result of a getState() call and
+        return the component's state
+        """
+        if state is not None:
+            self.__dead_count = 0
+        elif not self.is_dead:
+            state = DAQClientState.MISSING
+        else:
+            state = DAQClientState.DEAD
+
+        return state
+
     def close(self):
         "Close the logger"
         self.__log.close()
@@ -449,10 +605,20 @@ class DAQClient(ComponentName):
         "Return the list of this component's connector descriptions"
         return self.__connectors[:]
 
+    def create_async_client(self, host, port):
+        """
+        Create an asyncio RPC client for this component, or return None if
+        asynchronous calls are not supported (or the RPC client has been
+        replaced by a mock)
+        """
+        if AsyncRPCClient is None or not isinstance(self.__client, RPCClient):
+            return None
+        return AsyncRPCClient(host, port)
+
     @classmethod
     def create_client(cls, host, port):
         "Create an RPC client for this component"
-        return RPCClient(host, port)
+        return RPCClient(host, port, codec=cls.RPC_CODEC)
 
     def create_logger(self, quiet):
         "Create a logger for this component"
@@ -473,7 +639,8 @@ class DAQClient(ComponentName):
     def get_replay_start_time(self):
         "Get the earliest time for a replay hub"
         try:
-            return unfix_value(self.__client.xmlrpc.getReplayStartTime())
+            return unfix_result(self.__client,
+                                self.__client.xmlrpc.getReplayStartTime())
         except:  # pylint: disable=bare-except
             self.__log.error(exc_string())
             return None
@@ -481,7 +648,8 @@ class DAQClient(ComponentName):
     def get_run_data(self, run_num):
         "Get the run data for the specified run"
         try:
-            return unfix_value(self.__client.xmlrpc.getRunData(run_num))
+            return unfix_result(self.__client,
+                                self.__client.xmlrpc.getRunData(run_num))
         except:  # pylint: disable=bare-except
             self.__log.error(exc_string())
             return None
@@ -532,6 +700,10 @@ class DAQClient(ComponentName):
 
         return True
 
+    def log_exception(self):
+        "Log the exception currently being handled"
+        self.__log.error(exc_string())
+
     def list_connector_states(self):
         "List of state of all this component's input/output handlers"
         return self.__client.xmlrpc.listConnectorStates()
@@ -659,14 +831,7 @@ class DAQClient(ComponentName):
             self.__log.error(exc_string())
             state = None
 
-        if state is not None:
-            self.__dead_count = 0
-        elif not self.is_dead:
-            state = DAQClientState.MISSING
-        else:
-            state = DAQClientState.DEAD
-
-        return state
+        return self.check_state(state)
 
     def stop_run(self):
         "Stop component processing DAQ data"
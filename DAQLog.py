@@ -11,13 +11,16 @@ Logging objects used by CnCServer
 
 from __future__ import print_function
 
+import collections
 import datetime
 import errno
 import os
 import select
 import socket
+import struct
 import sys
 import threading
+import time
 
 from DAQConst import DAQPort
 from LiveImports import LIVE_IMPORT, MoniClient, Prio, SERVICE_NAME
@@ -32,12 +35,33 @@ class LogException(Exception):
 class LogSocketServer(object):
     """
     Log requests from a remote object to a file.
-    Works nonblocking in a separate thread to guarantee concurrency
+    Works nonblocking in a separate thread to guarantee concurrency.
+
+    Waiting datagrams are read in batches of up to MAX_BATCH messages,
+    each batch is written with a single call, and the file is flushed
+    at most once every FLUSH_SECS seconds.
     """
 
     NEXT_PORT = DAQPort.EPHEMERAL_BASE
     NEXT_LOCK = threading.Lock()
 
+    # maximum size of a single log message
+    RECV_BYTES = 8192
+    # maximum number of datagrams read before writing them to the file
+    MAX_BATCH = 256
+    # maximum number of seconds between flushes of the log file
+    FLUSH_SECS = 1.0
+    # number of seconds to wait in select() before checking for a stop
+    SELECT_SECS = 0.5
+    # size of the socket receive buffer requested from the kernel
+    RCVBUF_BYTES = 4 * 1024 * 1024
+
+    # socket option which reports the number of datagrams dropped by the
+    # kernel (not exported by the 'socket' module on all Python versions)
+    SO_RXQ_OVFL = getattr(socket, "SO_RXQ_OVFL",
+                          40 if sys.platform.startswith("linux") else None)
+    OVFL_COUNT = struct.Struct("I")
+
     def __init__(self, port, cname, logpath, quiet=False):
         "Logpath should be fully qualified in case I'm a Daemon"
         if not os.path.isabs(logpath):
@@ -52,6 +76,13 @@ class LogSocketServer(object):
         self.__outfile = None
         self.__serving = False
 
+        # number of datagrams read from the socket
+        self.__received = 0
+        # number of datagrams which were read but not written
+        self.__discarded = 0
+        # number of datagrams dropped by the kernel
+        self.__overflowed = 0
+
     def __main(self):
         """
         Create listening, non-blocking UDP socket, read from it,
@@ -64,6 +95,11 @@ class LogSocketServer(object):
             # initialize POSIX socket
             sock.setblocking(0)
             sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                self.RCVBUF_BYTES)
+            except socket.error:
+                pass  # keep the default buffer size
 
         if self.__port is not None:
             try:
@@ -103,6 +139,29 @@ class LogSocketServer(object):
                     pass  # ignore errors on close
                 self.__outfile = None
 
+    def __enable_overflow_count(self, sock):
+        """
+        Ask the kernel to report the number of dropped datagrams.
+        Return the size of the ancillary buffer needed by recvmsg(),
+        or 0 if the count is not available
+        """
+        if self.SO_RXQ_OVFL is None or not hasattr(sock, "recvmsg"):
+            return 0
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, self.SO_RXQ_OVFL, 1)
+        except socket.error:
+            return 0
+        return socket.CMSG_SPACE(self.OVFL_COUNT.size)
+
+    def __flush(self):
+        "Flush the current output file"
+        outfile = self.__outfile
+        if outfile is not None:
+            try:
+                outfile.flush()
+            except ValueError:
+                pass  # file was closed by set_output()
+
     @classmethod
     def __open_path(cls, path):
         if path is None:
@@ -110,42 +169,113 @@ class LogSocketServer(object):
         return open(path, "a")
 
     def __posix_loop(self, sock):
+        ancsize = self.__enable_overflow_count(sock)
+
         prd = [sock]
         pwr = []
         per = [sock]
+        next_flush = None
         while self.__thread is not None:
-            srd, _, sre = select.select(prd, pwr, per, 0.5)
+            timeout = self.SELECT_SECS
+            if next_flush is not None:
+                timeout = max(0.0, min(timeout, next_flush - time.time()))
+
+            srd, _, sre = select.select(prd, pwr, per, timeout)
             if len(sre) != 0:  # pylint: disable=len-as-condition
                 if self.__outfile is not None:
                     print("Error on select was detected.", file=self.__outfile)
-            if len(srd) == 0:  # pylint: disable=len-as-condition
-                continue
-            while True:  # Slurp up waiting packets, return to select if EAGAIN
-                try:
-                    data = sock.recv(8192, socket.MSG_DONTWAIT)
-                    self.__write_data(data)
-                except socket.error as sockerr:
-                    if sockerr.errno == errno.EWOULDBLOCK:
-                        break  # Go back to select so we don't busy-wait
-                    raise
+            if len(srd) != 0:  # pylint: disable=len-as-condition
+                batch = self.__read_batch(sock, ancsize)
+                if len(batch) > 0:  # pylint: disable=len-as-condition
+                    self.__write_batch(batch)
+                    if next_flush is None:
+                        next_flush = time.time() + self.FLUSH_SECS
+
+            if next_flush is not None and time.time() >= next_flush:
+                self.__flush()
+                next_flush = None
+
+    def __read_batch(self, sock, ancsize):
+        """
+        Read up to MAX_BATCH waiting datagrams without blocking.
+        If 'ancsize' is non-zero, also track the kernel's count of
+        dropped datagrams.
+        """
+        batch = []
+        while len(batch) < self.MAX_BATCH:
+            try:
+                if ancsize == 0:
+                    data = sock.recv(self.RECV_BYTES, socket.MSG_DONTWAIT)
+                else:
+                    data, ancdata, _, _ = \
+                      sock.recvmsg(self.RECV_BYTES, ancsize,
+                                   socket.MSG_DONTWAIT)
+                    for level, ctype, cdata in ancdata:
+                        if level == socket.SOL_SOCKET and \
+                           ctype == self.SO_RXQ_OVFL and \
+                           len(cdata) >= self.OVFL_COUNT.size:
+                            self.__overflowed, = \
+                              self.OVFL_COUNT.unpack(
+                                  cdata[:self.OVFL_COUNT.size])
+            except socket.error as sockerr:
+                if sockerr.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break  # Go back to select so we don't busy-wait
+                raise
+            batch.append(data)
+
+        self.__received += len(batch)
+        return batch
 
     def __win_loop(self, sock):
         """
         Windows version of listener - no select().
         """
         while self.__thread is not None:
-            data = sock.recv(8192)
-            self.__write_data(data)
+            data = sock.recv(self.RECV_BYTES)
+            self.__received += 1
+            self.__write_batch([data, ])
+            self.__flush()
+
+    def __write_batch(self, batch):
+        "Write a list of datagrams to the output file with a single write"
+        lines = []
+        for data in batch:
+            try:
+                lines.append("%s %s\n" % (self.__cname, data.decode("utf-8")))
+            except UnicodeDecodeError:
+                self.__discarded += 1
 
-    def __write_data(self, data):
         if self.__outfile is None:
+            self.__discarded += len(lines)
+            return
+        if len(lines) == 0:  # pylint: disable=len-as-condition
             return
 
-        outstr = "%s %s" % (self.__cname, data.decode("utf-8"))
+        outstr = "".join(lines)
         if not self.__quiet:
-            print("%s" % outstr)
-        print(outstr, file=self.__outfile)
-        self.__outfile.flush()
+            sys.stdout.write(outstr)
+
+        for _ in range(2):
+            outfile = self.__outfile
+            if outfile is None:
+                break
+            try:
+                outfile.write(outstr)
+                return
+            except ValueError:
+                # set_output() closed the old file, try the new one
+                continue
+
+        self.__discarded += len(lines)
+
+    @property
+    def dropped(self):
+        """
+        Return the number of log messages which were lost, either because
+        the socket's receive buffer overflowed or because they could not
+        be written
+        """
+        return self.__overflowed + self.__discarded
 
     @property
     def is_serving(self):
@@ -166,6 +296,11 @@ class LogSocketServer(object):
         "Return the socket port number used by this object"
         return self.__port
 
+    @property
+    def received(self):
+        "Return the number of log messages read from the socket"
+        return self.__received
+
     def start_serving(self):
         "Creates listener thread, prepares file for output, and returns"
         if self.__thread is not None:
@@ -224,6 +359,176 @@ class BaseAppender(object):
         raise NotImplementedError()
 
 
+class AsyncLogDrain(object):
+    "Single thread which writes the queued messages for all AsyncAppenders"
+    def __init__(self):
+        self.__cond = threading.Condition()
+        self.__ready = collections.deque()
+        self.__thread = None
+
+    def __run(self):
+        "Write queued messages until the program exits"
+        while True:
+            with self.__cond:
+                # pylint: disable=len-as-condition
+                while len(self.__ready) == 0:
+                    self.__cond.wait()
+                apnd = self.__ready.popleft()
+
+            if apnd.drain():
+                # more messages arrived, put this appender at the back
+                self.schedule(apnd)
+
+    def schedule(self, apnd):
+        "Add an appender which has queued messages"
+        with self.__cond:
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run,
+                                                 name="AsyncLogDrain")
+                self.__thread.daemon = True
+                self.__thread.start()
+
+            self.__ready.append(apnd)
+            self.__cond.notify()
+
+
+class AsyncAppender(BaseAppender):
+    """
+    Queue log messages for another appender so the caller never waits on
+    a slow log sink.  Messages for all AsyncAppenders are written by a
+    single AsyncLogDrain thread.
+
+    If more than `max_queued` messages are waiting, either the oldest
+    queued message (if `drop_oldest` is True) or the new message is
+    dropped and counted.  If the wrapped appender fails, the error is
+    raised by the next write() so callers like CnCLogger can reset their
+    appenders.  close() writes all queued messages (waiting up to
+    CLOSE_SECS seconds) before closing the wrapped appender.
+    """
+
+    # thread shared by all asynchronous appenders
+    DRAIN = AsyncLogDrain()
+    # default maximum number of queued messages
+    MAX_QUEUED = 1000
+    # maximum number of seconds close() waits for queued messages
+    CLOSE_SECS = 5.0
+
+    def __init__(self, appender, max_queued=None, drop_oldest=True):
+        super(AsyncAppender, self).__init__(appender.name)
+
+        self.__appender = appender
+        if max_queued is None:
+            max_queued = self.MAX_QUEUED
+        self.__max_queued = max_queued
+        self.__drop_oldest = drop_oldest
+
+        self.__cond = threading.Condition()
+        self.__queue = collections.deque()
+        self.__scheduled = False
+        self.__closed = False
+        self.__error = None
+
+        self.__dropped = 0
+        self.__failed = 0
+
+    @property
+    def appender(self):
+        "Return the wrapped appender"
+        return self.__appender
+
+    def close(self):
+        "Write all queued messages, then close the wrapped appender"
+        self.flush(self.CLOSE_SECS)
+        with self.__cond:
+            if self.__closed:
+                return
+            self.__closed = True
+        self.__appender.close()
+
+    def drain(self):
+        """
+        Write all queued messages to the wrapped appender (called by
+        AsyncLogDrain).  Return True if more messages have been queued.
+        """
+        with self.__cond:
+            msgs = list(self.__queue)
+            self.__queue.clear()
+
+        for msg, mtime, level in msgs:
+            try:
+                self.__appender.write(msg, mtime=mtime, level=level)
+            except Exception as exc:  # pylint: disable=broad-except
+                with self.__cond:
+                    self.__failed += 1
+                    if self.__error is None:
+                        self.__error = exc
+
+        with self.__cond:
+            if len(self.__queue) > 0:  # pylint: disable=len-as-condition
+                return True
+            self.__scheduled = False
+            self.__cond.notify_all()
+            return False
+
+    @property
+    def dropped(self):
+        "Number of messages dropped because the queue was full"
+        return self.__dropped
+
+    @property
+    def failed(self):
+        "Number of messages which could not be written"
+        return self.__failed
+
+    def flush(self, timeout=None):
+        """
+        Wait until all queued messages have been written.
+        Return False if the timeout expired first.
+        """
+        with self.__cond:
+            if timeout is not None:
+                end_time = datetime.datetime.now() + \
+                  datetime.timedelta(seconds=timeout)
+            while self.__scheduled:
+                if timeout is None:
+                    self.__cond.wait()
+                else:
+                    secs = (end_time -
+                            datetime.datetime.now()).total_seconds()
+                    if secs <= 0.0:
+                        return False
+                    self.__cond.wait(secs)
+            return True
+
+    def write(self, msg, mtime=None, level=None):
+        "Queue the log message"
+        if mtime is None:
+            mtime = datetime.datetime.now()
+
+        with self.__cond:
+            if self.__closed:
+                raise LogException('Appender %s has been closed' %
+                                   (self.name, ))
+            if self.__error is not None:
+                error = self.__error
+                self.__error = None
+                raise LogException("Appender %s failed: %s" %
+                                   (self.name, error))
+
+            if len(self.__queue) >= self.__max_queued:
+                self.__dropped += 1
+                if not self.__drop_oldest:
+                    return
+                self.__queue.popleft()
+            self.__queue.append((msg, mtime, level))
+
+            if self.__scheduled:
+                return
+            self.__scheduled = True
+
+        self.DRAIN.schedule(self)
+
+
 class BaseFileAppender(BaseAppender):
     "Write log messages to a file handle"
     def __init__(self, name, fdesc):
@@ -346,6 +651,13 @@ class DAQLog(object):
         "Log a fatal message"
         self._logmsg(DAQLog.FATAL, msg)
 
+    def flush(self, timeout=None):
+        "Wait until all queued messages have been written"
+        for apnd in self.__appender_list:
+            flush = getattr(apnd, "flush", None)
+            if flush is not None:
+                flush(timeout)
+
     def has_appender(self):
         "Does this logger have at least one appender?"
         return len(self.__appender_list) > 0
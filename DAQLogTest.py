@@ -3,13 +3,50 @@
 import datetime
 import os
 import tempfile
+import threading
 import time
 import unittest
-from DAQLog import LogSocketServer
+from DAQLog import AsyncAppender, BaseAppender, DAQLog, FileAppender, \
+     LogException, LogSocketServer
 
 from DAQMocks import SocketWriter
 
 
+class BlockingAppender(BaseAppender):
+    "Appender which waits until it is released, then records each message"
+    def __init__(self, fail=False):
+        super(BlockingAppender, self).__init__("blocking")
+        self.__release = threading.Event()
+        self.__started = threading.Event()
+        self.__fail = fail
+        self.__msgs = []
+        self.__closed = False
+
+    def close(self):
+        self.__closed = True
+
+    @property
+    def is_closed(self):
+        return self.__closed
+
+    @property
+    def messages(self):
+        return self.__msgs[:]
+
+    def release(self):
+        self.__release.set()
+
+    def wait_for_write(self, timeout):
+        return self.__started.wait(timeout)
+
+    def write(self, msg, mtime=None, level=None):
+        self.__started.set()
+        self.__release.wait()
+        if self.__fail:
+            raise Exception("Cannot write \"%s\"" % (msg, ))
+        self.__msgs.append(msg)
+
+
 class TestDAQLog(unittest.TestCase):
     "Test DAQLog class"
     DIR_PATH = None
@@ -111,6 +148,118 @@ class TestDAQLog(unittest.TestCase):
 
         self.__check_log(log_path, ('%s - - [%s] %s' % (cname, now, msg), ))
 
+    def test_log_socket_server_batch(self):
+        "Test LogSocketServer with a burst of messages"
+        cname = 'burst'
+        log_path = os.path.join(TestDAQLog.DIR_PATH, cname + '.log')
+
+        self.__sock_log = LogSocketServer(None, cname, log_path, True)
+        self.__sock_log.start_serving()
+        for _ in range(5):
+            if self.__sock_log.is_serving:
+                break
+            time.sleep(0.1)
+        self.assertTrue(self.__sock_log.is_serving,
+                        'Log server was not started')
+
+        now = datetime.datetime.now()
+        msgs = ['Burst #%d' % (idx, ) for idx in range(200)]
+
+        client = SocketWriter('localhost', self.__sock_log.port)
+        for msg in msgs:
+            client.write_ts(msg, now)
+        # undecodable messages are counted but not written
+        client.socket.send(b"\xff\xfe")
+        client.close()
+
+        expected = ['%s - - [%s] %s' % (cname, now, msg) for msg in msgs]
+
+        # the file is flushed after FLUSH_SECS, even if no more data arrives
+        lines = []
+        for _ in range(50):
+            lines = self.__read_log(log_path)
+            if len(lines) >= len(expected):
+                break
+            time.sleep(0.1)
+        self.assertEqual(expected, lines)
+
+        self.__sock_log.stop_serving()
+
+        self.assertEqual(len(msgs) + 1, self.__sock_log.received)
+        self.assertEqual(1, self.__sock_log.dropped)
+        self.__check_log(log_path, expected)
+
+    def test_async_file(self):
+        "Test AsyncAppender writing to a file"
+        log_path = os.path.join(TestDAQLog.DIR_PATH, 'async.log')
+
+        log = DAQLog("async", appender=AsyncAppender(FileAppender("apnd",
+                                                                  log_path)))
+        msgs = ["Message #%d" % (idx, ) for idx in range(10)]
+        for msg in msgs:
+            log.error(msg)
+
+        # close() should write everything which has been queued
+        log.close()
+
+        lines = self.__read_log(log_path)
+        self.assertEqual(len(msgs), len(lines))
+        for msg, line in zip(msgs, lines):
+            self.assertTrue(line.startswith("apnd ["), "Bad line " + line)
+            self.assertTrue(line.endswith("] " + msg), "Bad line " + line)
+
+    def test_async_slow(self):
+        "Test that AsyncAppender doesn't block on a slow appender"
+        slow = BlockingAppender()
+        apnd = AsyncAppender(slow, max_queued=5)
+
+        # the first message is handed to the blocked appender
+        apnd.write("first")
+        self.assertTrue(slow.wait_for_write(5.0), "First message not written")
+
+        start = time.time()
+        for idx in range(10):
+            apnd.write("msg%d" % idx)
+        self.assertTrue(time.time() - start < 1.0,
+                        "Writes were blocked by the slow appender")
+
+        # only the newest messages are kept
+        self.assertEqual(5, apnd.dropped)
+
+        slow.release()
+        apnd.close()
+
+        self.assertTrue(slow.is_closed, "Wrapped appender was not closed")
+        self.assertEqual(["first", "msg5", "msg6", "msg7", "msg8", "msg9"],
+                         slow.messages)
+
+        try:
+            apnd.write("closed")
+            self.fail("Write to closed appender should fail")
+        except LogException:
+            pass
+
+    def test_async_error(self):
+        "Test that AsyncAppender reports errors from the wrapped appender"
+        bad = BlockingAppender(fail=True)
+        bad.release()
+
+        apnd = AsyncAppender(bad)
+        apnd.write("oops")
+        self.assertTrue(apnd.flush(timeout=5.0))
+        self.assertEqual(1, apnd.failed)
+
+        try:
+            apnd.write("next")
+            self.fail("Expected the previous error to be raised")
+        except LogException as exc:
+            self.assertTrue(str(exc).find("oops") > 0,
+                            "Unexpected exception " + str(exc))
+
+        # the error is only reported once
+        apnd.write("last")
+        apnd.close()
+
 
 if __name__ == '__main__':
     unittest.main()
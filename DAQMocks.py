@@ -1493,6 +1493,16 @@ class MockMBeanClient(object):
                 raise rtn_map[fld]
         return rtn_map
 
+    def get_multiple(self, bean_fields):
+        rtn_map = {}
+        for bean_name, field_list in bean_fields.items():
+            try:
+                rtn_map[bean_name] = self.get_attributes(bean_name,
+                                                         field_list)
+            except Exception as exc:  # pylint: disable=broad-except
+                rtn_map[bean_name] = exc
+        return rtn_map
+
     def get_bean_fields(self, bean_name):
         return list(self.__bean_data[bean_name].keys())
 
@@ -2,9 +2,12 @@
 
 import shutil
 import tempfile
+import time
 import unittest
 from locate_pdaq import set_pdaq_config_dir
+import CnCServer
 from CnCServer import DAQPool
+from CompOp import ComponentGroup
 from DAQClient import DAQClientState
 from DAQLog import LogSocketServer
 from RunOption import RunOption
@@ -883,6 +886,66 @@ class TestDAQPool(unittest.TestCase):
         for comp in comp_list:
             self.assertEqual(comp.monitor_count, 2)
 
+    def test_monitor_due_clients(self):
+        mgr = MyDAQPool()
+
+        comp_list = []
+        for name in ('fooHub', 'bar', 'baz'):
+            comp = MockComponent(name, 0)
+            comp.set_monitor_state("idle")
+            comp_list.append(comp)
+            mgr.add(comp)
+
+        # nothing is due right after the components were added
+        self.assertEqual(mgr.monitor_due_clients(), 0)
+        for comp in comp_list:
+            self.assertEqual(comp.monitor_count, 0)
+
+        # a heartbeat postpones that component's check
+        self.assertTrue(mgr.heartbeat(comp_list[0], now=time.time() + 3.0))
+
+        now = mgr.next_liveness_check
+        self.assertEqual(mgr.monitor_due_clients(now=now + 1.0), 2)
+        self.assertEqual(comp_list[0].monitor_count, 0)
+        for comp in comp_list[1:]:
+            self.assertEqual(comp.monitor_count, 1)
+
+        # dead components are dropped from the pool and the schedule
+        comp_list[1].set_monitor_state(DAQClientState.DEAD)
+        self.assertEqual(mgr.monitor_due_clients(now=now + 1000.0), 3)
+        self.assertEqual(mgr.num_components, 2)
+        self.assertFalse(mgr.heartbeat(comp_list[1]))
+
+    def test_monitor_due_clients_error(self):
+        mgr = MyDAQPool()
+
+        comp_list = []
+        for name in ('fooHub', 'bar'):
+            comp = MockComponent(name, 0)
+            comp.set_monitor_state("idle")
+            comp_list.append(comp)
+            mgr.add(comp)
+
+        class BrokenGroup(ComponentGroup):
+            @staticmethod
+            def run_simple(*args, **kwargs):
+                raise Exception("Cannot run %s" % (args[0].name, ))
+
+        now = mgr.next_liveness_check + 1000.0
+
+        orig_group = CnCServer.ComponentGroup
+        CnCServer.ComponentGroup = BrokenGroup
+        try:
+            self.assertRaises(Exception, mgr.monitor_due_clients, now=now)
+        finally:
+            CnCServer.ComponentGroup = orig_group
+
+        # the failed components are still scheduled for another check
+        self.assertIsNotNone(mgr.next_liveness_check)
+        self.assertEqual(mgr.monitor_due_clients(now=now + 1000.0), 2)
+        for comp in comp_list:
+            self.assertEqual(comp.monitor_count, 1)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -10,11 +10,13 @@ RPCServer and RPCClient classes which use Python's XML-RPC code internally
 from __future__ import print_function
 
 try:
-    from DocXMLRPCServer import DocXMLRPCServer
-    from xmlrpclib import ServerProxy, Transport
+    from DocXMLRPCServer import DocXMLRPCRequestHandler, DocXMLRPCServer
+    from xmlrpclib import Fault, ProtocolError, ServerProxy, Transport
+    import httplib as http_client
 except:  # ModuleNotFoundError only works under 2.7/3.0
-    from xmlrpc.server import DocXMLRPCServer
-    from xmlrpc.client import ServerProxy, Transport
+    from xmlrpc.server import DocXMLRPCRequestHandler, DocXMLRPCServer
+    from xmlrpc.client import Fault, ProtocolError, ServerProxy, Transport
+    import http.client as http_client
 import errno
 import math
 import select
@@ -24,6 +26,8 @@ import threading
 import time
 import traceback
 
+from RPCCodec import codec_names, find_codec, request_codec
+
 
 class LockedTransport(Transport):
     "XML-RPC transport layer which only allows one active request at a time"
@@ -44,46 +48,285 @@ class LockedTransport(Transport):
                                                                verbose=verbose)
 
 
+class PooledTransport(Transport):
+    """
+    XML-RPC transport which keeps HTTP/1.1 connections open between
+    requests so they can be reused.  At most `max_active` requests are
+    sent at once (the default of 1 serializes requests like
+    LockedTransport) and every connection uses this transport's timeout
+    rather than the process-wide socket default.
+    """
+
+    # maximum number of idle connections kept open
+    MAX_IDLE = 4
+
+    def __init__(self, timeout=None, max_active=1, max_idle=None):
+        Transport.__init__(self)
+
+        if max_idle is None:
+            max_idle = self.MAX_IDLE
+
+        self.__timeout = timeout
+        self.__active = threading.BoundedSemaphore(max_active)
+        self.__max_idle = max(max_idle, max_active)
+
+        self.__lock = threading.Lock()
+        self.__idle = []
+        self.__local = threading.local()
+
+        self.__num_opened = 0
+        self.__num_requests = 0
+
+    def __checkin(self, host, conn):
+        "Return a connection to the idle list (or close it if it's full)"
+        with self.__lock:
+            if len(self.__idle) < self.__max_idle:
+                self.__idle.append((host, conn))
+                return
+        conn.close()
+
+    def __checkout(self, host):
+        "Return an idle connection to this host, or open a new one"
+        with self.__lock:
+            self.__num_requests += 1
+            for idx in range(len(self.__idle) - 1, -1, -1):
+                if self.__idle[idx][0] == host:
+                    return self.__idle.pop(idx)[1]
+            self.__num_opened += 1
+
+        chost, self._extra_headers, _ = self.get_host_info(host)
+        return http_client.HTTPConnection(chost, timeout=self.__timeout)
+
+    def close(self):
+        "Close all idle connections"
+        with self.__lock:
+            idle = self.__idle
+            self.__idle = []
+        for _, conn in idle:
+            conn.close()
+
+    def make_connection(self, host):
+        "Return the connection checked out by the current thread"
+        return self.__local.connection
+
+    def __send(self, host, handler, request_body, verbose, parse):
+        """
+        Send a request over a pooled connection and return the response
+        decoded by parse(response)
+        """
+        with self.__active:
+            conn = self.__checkout(host)
+            self.__local.connection = conn
+
+            resp = None
+            try:
+                self.send_request(host, handler, request_body, verbose)
+                resp = conn.getresponse()
+                if resp.status == 200:
+                    self.verbose = verbose
+                    return parse(resp)
+
+                # discard any response data and raise exception
+                if resp.getheader("content-length", ""):
+                    resp.read()
+                raise ProtocolError(host + handler, resp.status,
+                                    resp.reason, dict(resp.getheaders()))
+            except (Fault, ProtocolError):
+                raise
+            except Exception:
+                # connection is in an unknown state, don't reuse it
+                resp = None
+                raise
+            finally:
+                self.__local.connection = None
+                if resp is not None and resp.isclosed() and \
+                   not resp.will_close:
+                    self.__checkin(host, conn)
+                else:
+                    conn.close()
+
+    def codec_request(self, host, handler, request_body, codec):
+        """
+        Send a request which was encoded with an RPCCodec, retrying once
+        (like Transport.request()) if a cached connection has gone cold
+        """
+        for attempt in (0, 1):
+            try:
+                return self.__send(host, handler, request_body, False,
+                                   lambda resp:
+                                   codec.loads_response(resp.read()))
+            except http_client.RemoteDisconnected:
+                if attempt:
+                    raise
+            except OSError as exc:
+                if attempt or exc.errno not in (errno.ECONNRESET,
+                                                errno.ECONNABORTED,
+                                                errno.EPIPE):
+                    raise
+
+    def single_request(self, host, handler, request_body, verbose=False):
+        "Send a request over a pooled connection"
+        return self.__send(host, handler, request_body, verbose,
+                           self.parse_response)
+
+    @property
+    def statistics(self):
+        "Return the number of requests sent and connections opened"
+        with self.__lock:
+            return {
+                "requests": self.__num_requests,
+                "connections": self.__num_opened,
+                "idle": len(self.__idle),
+            }
+
+
+class CodecMethod(object):
+    """
+    Remote method proxy used by RPCClient when an alternate codec
+    was requested
+    """
+
+    def __init__(self, send, name):
+        self.__send = send
+        self.__name = name
+
+    def __getattr__(self, name):
+        return CodecMethod(self.__send, "%s.%s" % (self.__name, name))
+
+    def __call__(self, *args):
+        return self.__send(self.__name, args)
+
+
 class RPCClient(ServerProxy):
-    """Generic class for accessing methods on remote objects
-    WARNING: instantiating RPCClient sets socket default timeout duration!"""
+    """
+    Generic class for accessing methods on remote objects.
+    Under Python 3, HTTP connections are kept open and reused, and the
+    timeout only applies to this client's connections.  Up to `max_active`
+    requests can be sent concurrently.
+    If `codec` names one of the RPCCodec encodings, the client asks the
+    server whether it supports that encoding before the first request and
+    uses it if possible, otherwise requests are sent as XML-RPC.
+    WARNING: under Python 2, instantiating RPCClient sets the socket default
+    timeout duration!
+    """
 
     # number of seconds before RPC call is aborted
     TIMEOUT_SECS = 120
 
     def __init__(self, servername, portnum, verbose=False,
-                 timeout=TIMEOUT_SECS):
+                 timeout=TIMEOUT_SECS, max_active=1, codec=None):
+
+        # set these first since __getattr__() uses them
+        self.__codec_name = codec
+        self.__codec = None
+        self.__codec_lock = threading.Lock()
 
         self.servername = servername
         self.portnum = portnum
 
         host_port = "%s:%s" % (self.servername, self.portnum)
 
-        # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
-        # !!!!!! Warning - this is ugly !!!!!!!
-        # !!!! but no other way in XMLRPC? !!!!
-        # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
-        socket.setdefaulttimeout(timeout)
-
-        # hack to only allow one active request at a time
-        if sys.version_info < (2, 7):
-            transport = None
+        if sys.version_info >= (3, 0):
+            transport = PooledTransport(timeout=timeout,
+                                        max_active=max_active)
         else:
-            transport = LockedTransport()
+            # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
+            # !!!!!! Warning - this is ugly !!!!!!!
+            # !!!! but no other way in XMLRPC? !!!!
+            # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
+            socket.setdefaulttimeout(timeout)
+
+            # hack to only allow one active request at a time
+            if sys.version_info < (2, 7):
+                transport = None
+            else:
+                transport = LockedTransport()
+
+            # alternate codecs require PooledTransport
+            self.__codec_name = None
+
+        self.__host_port = host_port
+        self.__transport = transport
 
         ServerProxy.__init__(self, "http://" + host_port, transport=transport,
                              verbose=verbose)
 
+    def __getattr__(self, name):
+        if (self.__codec_name is None and self.__codec is None) or \
+           name.startswith("__"):
+            return ServerProxy.__getattr__(self, name)
+        return CodecMethod(self.__send, name)
+
+    def __negotiate(self):
+        "Ask the server which codecs it supports"
+        with self.__codec_lock:
+            if self.__codec_name is None:
+                return self.__codec
+
+            try:
+                names = ServerProxy.__getattr__(self, "system").listCodecs()
+            except (Fault, ProtocolError):
+                # server doesn't support alternate codecs
+                names = []
+
+            if self.__codec_name in names:
+                self.__codec = find_codec(self.__codec_name)
+
+            # don't negotiate again
+            self.__codec_name = None
+            return self.__codec
+
+    def __send(self, method, params):
+        "Send a request using the negotiated codec"
+        codec = self.__negotiate()
+        if codec is None:
+            return ServerProxy.__getattr__(self, method)(*params)
+
+        return self.__transport.codec_request(self.__host_port, "/RPC2",
+                                              codec.dumps_request(method,
+                                                                  params),
+                                              codec)
+
     @classmethod
     def client_statistics(cls):
         return {}
 
+    @property
+    def codec(self):
+        "Return the codec used for requests, or None if using XML-RPC"
+        return self.__codec
+
+    @property
+    def native_longs(self):
+        "Return True if long values are received as numbers, not strings"
+        return self.__codec is not None and self.__codec.NATIVE_LONGS
+
+    def transport_statistics(self):
+        "Return connection statistics for this client's transport"
+        if not isinstance(self.__transport, PooledTransport):
+            return {}
+        return self.__transport.statistics
+
+
+class KeepAliveRequestHandler(DocXMLRPCRequestHandler):
+    """
+    Request handler which keeps HTTP/1.1 connections open between requests.
+    Only use this with a threaded server, since each open connection ties
+    up a handler.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    # close idle connections after this many seconds
+    timeout = 60
+
 
 class RPCServer(DocXMLRPCServer):
     "Generic class for serving methods to remote objects"
     # also inherited: register_function
     def __init__(self, portnum, servername="localhost",
-                 documentation="DAQ Server", timeout=1):
+                 documentation="DAQ Server", timeout=1,
+                 request_handler=DocXMLRPCRequestHandler):
         self.servername = servername
         self.portnum = portnum
 
@@ -95,7 +338,9 @@ class RPCServer(DocXMLRPCServer):
         self.__sock_count = 0
         self.__registered = False
 
-        DocXMLRPCServer.__init__(self, ('', portnum), logRequests=False)
+        DocXMLRPCServer.__init__(self, ('', portnum),
+                                 requestHandler=request_handler,
+                                 logRequests=False)
         # note that this has to be AFTER the init above as it can be
         # set to false in the __init__
         self.allow_reuse_address = True
@@ -105,6 +350,8 @@ class RPCServer(DocXMLRPCServer):
         self.__is_shut_down = threading.Event()
         self.__running = False
 
+        self.register_function(codec_names, "system.listCodecs")
+
     def _dispatch(self, method, params):
         if method not in self.funcs:
             raise Exception("method \"%s\" is not supported" % (method, ))
@@ -123,6 +370,26 @@ class RPCServer(DocXMLRPCServer):
                     self.__times[method] = RPCStats(method)
                 self.__times[method].add(time.time() - start, success)
 
+    def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        "Handle requests which use an alternate codec"
+        codec = request_codec(data)
+        if codec is None:
+            return DocXMLRPCServer._marshaled_dispatch(self, data,
+                                                       dispatch_method, path)
+
+        try:
+            method, params = codec.loads_request(data)
+            if dispatch_method is not None:
+                rtnval = dispatch_method(method, params)
+            else:
+                rtnval = self._dispatch(method, params)
+            return codec.dumps_response(rtnval)
+        except Fault as fault:
+            return codec.dumps_fault(fault.faultCode, fault.faultString)
+        except:  # pylint: disable=bare-except
+            exc_type, exc_value = sys.exc_info()[:2]
+            return codec.dumps_fault(1, "%s:%s" % (exc_type, exc_value))
+
     @classmethod
     def client_statistics(cls):
         return {}
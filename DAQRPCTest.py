@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+import threading
+import time
+import unittest
+
+try:
+    from SocketServer import ThreadingMixIn
+except:  # ModuleNotFoundError only works under 2.7/3.0
+    from socketserver import ThreadingMixIn
+
+try:
+    from xmlrpclib import Fault
+except:  # ModuleNotFoundError only works under 2.7/3.0
+    from xmlrpc.client import Fault
+
+from DAQRPC import KeepAliveRequestHandler, RPCClient, RPCServer
+from RPCCodec import JSONCodec, XMLRPCCodec
+
+
+class KeepAliveServer(ThreadingMixIn, RPCServer):
+    daemon_threads = True
+
+    def __init__(self):
+        RPCServer.__init__(self, 0, request_handler=KeepAliveRequestHandler)
+
+
+class ShortKeepAliveHandler(KeepAliveRequestHandler):
+    # close idle connections quickly
+    timeout = 0.5
+
+
+class ShortKeepAliveServer(ThreadingMixIn, RPCServer):
+    daemon_threads = True
+
+    def __init__(self):
+        RPCServer.__init__(self, 0, request_handler=ShortKeepAliveHandler)
+
+
+class DAQRPCTest(unittest.TestCase):
+    def setUp(self):
+        self.__server = None
+
+    def tearDown(self):
+        if self.__server is not None:
+            self.__server.server_close()
+
+    def __start_server(self, server):
+        self.__server = server
+        server.register_function(lambda val: val * 2, "double")
+
+        thrd = threading.Thread(target=server.serve_forever)
+        thrd.setDaemon(True)
+        thrd.start()
+
+        return server.server_address[1]
+
+    def test_keep_alive(self):
+        port = self.__start_server(KeepAliveServer())
+
+        client = RPCClient("localhost", port, timeout=5)
+        for val in range(10):
+            self.assertEqual(val * 2, client.double(val))
+
+        stats = client.transport_statistics()
+        self.assertEqual(10, stats["requests"])
+        self.assertEqual(1, stats["connections"])
+
+    def test_no_keep_alive(self):
+        port = self.__start_server(RPCServer(0))
+
+        client = RPCClient("localhost", port, timeout=5)
+        for val in range(3):
+            self.assertEqual(val * 2, client.double(val))
+
+        stats = client.transport_statistics()
+        self.assertEqual(3, stats["requests"])
+        self.assertEqual(3, stats["connections"])
+        self.assertEqual(0, stats["idle"])
+
+    def test_concurrent(self):
+        port = self.__start_server(KeepAliveServer())
+
+        client = RPCClient("localhost", port, timeout=5, max_active=4)
+
+        errors = []
+
+        def call_double(base):
+            try:
+                for val in range(base, base + 10):
+                    if client.double(val) != val * 2:
+                        errors.append("Bad result for %d" % (val, ))
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(str(exc))
+
+        thrds = [threading.Thread(target=call_double, args=(base, ))
+                 for base in range(0, 40, 10)]
+        for thrd in thrds:
+            thrd.start()
+        for thrd in thrds:
+            thrd.join(10)
+
+        self.assertEqual([], errors)
+        self.assertTrue(client.transport_statistics()["connections"] <= 4)
+
+    def test_json_codec(self):
+        port = self.__start_server(KeepAliveServer())
+        self.__server.register_function(lambda: {"big": 1 << 40}, "bigDict")
+
+        client = RPCClient("localhost", port, timeout=5, codec="json")
+        self.assertEqual(6, client.double(3))
+        self.assertEqual("json", str(client.codec))
+        self.assertTrue(client.native_longs)
+
+        # longs are returned as numbers rather than raising OverflowError
+        self.assertEqual({"big": 1 << 40}, client.bigDict())
+
+        self.assertRaises(Fault, client.unknownMethod)
+
+        # negotiation and both calls share the connection
+        stats = client.transport_statistics()
+        self.assertEqual(1, stats["connections"])
+
+    def test_codec_stale_connection(self):
+        port = self.__start_server(ShortKeepAliveServer())
+
+        for codec in (None, "json"):
+            client = RPCClient("localhost", port, timeout=5, codec=codec)
+            self.assertEqual(2, client.double(1))
+
+            # let the server close the idle connection
+            time.sleep(ShortKeepAliveHandler.timeout * 3)
+
+            self.assertEqual(4, client.double(2))
+            self.assertEqual(2, client.transport_statistics()["connections"])
+
+    def test_codec_fallback(self):
+        port = self.__start_server(KeepAliveServer())
+
+        # pretend this is a server which only speaks XML-RPC
+        del self.__server.funcs["system.listCodecs"]
+
+        client = RPCClient("localhost", port, timeout=5, codec="json")
+        self.assertEqual(8, client.double(4))
+        self.assertTrue(client.codec is None)
+        self.assertFalse(client.native_longs)
+
+    def test_codec_round_trip(self):
+        for codec in (JSONCodec(), XMLRPCCodec()):
+            data = codec.dumps_request("mbean.get", ("sender", "Field"))
+            self.assertEqual(("mbean.get", ("sender", "Field")),
+                             codec.loads_request(data))
+
+            rsp = {"a": [1, 2], "b": "str"}
+            self.assertEqual(rsp, codec.loads_response(
+                codec.dumps_response(rsp)))
+
+            fault = codec.dumps_fault(1, "oops")
+            self.assertRaises(Fault, codec.loads_response, fault)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -840,6 +840,7 @@ class FakeClient(object):
                                        'mbean.getAttributes')
         self.__mbean.register_function(self.__list_mbean_getters,
                                        'mbean.listGetters')
+        self.__mbean.register_multicall_functions()
 
         handler = UnknownMethodHandler(self.fullname, "Beans")
         self.__mbean.register_instance(handler)
@@ -746,9 +746,11 @@ class RealComponent(Comparable):
 
         bean_keys = sorted(self.__mbean_data.keys())
         for bean in bean_keys:
-            for fld in self.__mbean_data[bean]:
-                name = '%s-%d*%s+%s' % (self.__name, self.__num, bean, fld)
+            # all of a bean's fields are sent in a single message
+            name = '%s-%d*%s' % (self.__name, self.__num, bean)
 
+            attrs = {}
+            for fld in self.__mbean_data[bean]:
                 val = None
                 if not use_mbean_data and bean == "backEnd":
                     if fld == "EventData":
@@ -764,12 +766,9 @@ class RealComponent(Comparable):
                 if val is None:
                     val = self.__mbean_data[bean][fld].value
 
-                if bean == "backEnd" and fld == "EventData":
-                    fldtype = "json"
-                else:
-                    fldtype = None
+                attrs[fld] = val
 
-                live_log.add_expected_live_moni(name, val, fldtype)
+            live_log.add_expected_live_moni(name, attrs, "json")
 
     def close(self):
         self.__cmd.server_close()
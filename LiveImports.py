@@ -4,6 +4,8 @@ Utility classes which provide a uniform interface to I3Live's API
 They also provide stubs for developing/debugging without having Live installed
 """
 
+import collections
+
 # assume that the imports will succeed
 LIVE_IMPORT = True
 
@@ -21,8 +23,12 @@ except ImportError:
         LIVE_IMPORT = False
 
         class MoniClient(object):
+            # number of batches remembered by this stand-in
+            MAX_BATCHES = 100
+
             def __init__(self, service, host, port, logger=None):
-                pass
+                self.__batches = collections.deque(maxlen=self.MAX_BATCHES)
+                self.__num_sent = 0
 
             def __str__(self):
                 """
@@ -31,12 +37,27 @@ except ImportError:
                 """
                 return "BOGUS"
 
+            @property
+            def batches(self):
+                "Return the most recent batches of messages"
+                return list(self.__batches)
+
             def close(self):
                 pass
 
+            @property
+            def num_sent(self):
+                "Return the total number of messages"
+                return self.__num_sent
+
             def sendMoni(self, name, data,  # pylint: disable=invalid-name
                          prio=None, time=None):
-                pass
+                self.sendMoniBatch(((name, data, prio, time), ))
+
+            def sendMoniBatch(self, msgs):  # pylint: disable=invalid-name
+                "Record a list of (name, data, prio, time) messages"
+                self.__batches.append(list(msgs))
+                self.__num_sent += len(msgs)
 
 # attempt to import MoniPort
 try:
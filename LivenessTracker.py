@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""
+Schedule of liveness checks for the components in the DAQPool.  Each
+component has its own deadline, kept in a heap, so CnCServer only pings the
+components whose deadline has passed instead of pinging the whole pool
+every few seconds.
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+class LivenessTracker(object):
+    """
+    Track when each component should next be checked.
+
+    Components are never left unchecked for more than MAX_INTERVAL
+    seconds (the old pool-wide polling period), so a component which dies
+    is noticed at least as quickly as before.  A component which fails a
+    check is checked again after MIN_INTERVAL seconds, backing off to
+    MAX_INTERVAL once it answers again, and a heartbeat from a component
+    postpones its next check.  Each deadline is moved earlier by a random
+    amount so the checks for a large pool are spread out without ever
+    exceeding MAX_INTERVAL.
+    """
+
+    # seconds between checks for a component which just failed a check
+    MIN_INTERVAL = 1.0
+    # seconds before the first check of a newly added component
+    BASE_INTERVAL = 5.0
+    # maximum number of seconds between checks
+    MAX_INTERVAL = 5.0
+    # multiply the interval by this after each successful check
+    BACKOFF = 2.0
+    # maximum fraction by which each interval is randomly shortened
+    JITTER = 0.1
+
+    def __init__(self, rand=None):
+        if rand is None:
+            rand = random.Random()
+        self.__rand = rand
+
+        self.__lock = threading.Lock()
+        self.__heap = []
+        # map each component to its current (sequence number, interval)
+        self.__entries = {}
+        self.__sequence = itertools.count()
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries)
+
+    def __contains__(self, comp):
+        with self.__lock:
+            return comp in self.__entries
+
+    def __schedule(self, comp, interval, now):
+        """
+        Set the next deadline for this component
+        Note that self.__lock is acquired before calling this method
+        """
+        seq = next(self.__sequence)
+        jitter = 1.0 - self.__rand.uniform(0.0, self.JITTER)
+        self.__entries[comp] = (seq, interval)
+        heapq.heappush(self.__heap, (now + interval * jitter, seq, comp))
+
+    def __reschedule(self, comp, interval, now):
+        "Reschedule a component if it is still being tracked"
+        if now is None:
+            now = time.time()
+        with self.__lock:
+            if comp in self.__entries:
+                self.__schedule(comp, interval, now)
+
+    def __valid_top(self):
+        """
+        Discard stale heap entries and return the earliest valid entry
+        (or None if the heap is empty)
+        Note that self.__lock is acquired before calling this method
+        """
+        while len(self.__heap) > 0:  # pylint: disable=len-as-condition
+            _, seq, comp = self.__heap[0]
+            entry = self.__entries.get(comp)
+            if entry is not None and entry[0] == seq:
+                return self.__heap[0]
+            heapq.heappop(self.__heap)
+        return None
+
+    def add(self, comp, now=None):
+        "Start tracking a component"
+        if now is None:
+            now = time.time()
+        with self.__lock:
+            self.__schedule(comp, self.BASE_INTERVAL, now)
+
+    def due(self, now=None):
+        """
+        Return the list of components whose checks are due.  Each component
+        stays in the tracker but has no deadline until the caller reports
+        the result with succeeded() or failed().
+        """
+        if now is None:
+            now = time.time()
+
+        due_list = []
+        with self.__lock:
+            while True:
+                top = self.__valid_top()
+                if top is None or top[0] > now:
+                    break
+                heapq.heappop(self.__heap)
+                comp = top[2]
+                # invalidate the sequence number so this entry has no deadline
+                self.__entries[comp] = (None, self.__entries[comp][1])
+                due_list.append(comp)
+        return due_list
+
+    def failed(self, comp, now=None):
+        "Component failed a check, so check it again soon"
+        self.__reschedule(comp, self.MIN_INTERVAL, now)
+
+    def heartbeat(self, comp, now=None):
+        "Component reported that it is alive, so postpone its next check"
+        self.succeeded(comp, now=now)
+
+    def interval(self, comp):
+        "Return the current check interval for a component (or None)"
+        with self.__lock:
+            entry = self.__entries.get(comp)
+        if entry is None:
+            return None
+        return entry[1]
+
+    @property
+    def next_deadline(self):
+        "Return the time of the next due check, or None if nothing is due"
+        with self.__lock:
+            top = self.__valid_top()
+        if top is None:
+            return None
+        return top[0]
+
+    def remove(self, comp):
+        "Stop tracking a component"
+        with self.__lock:
+            if comp in self.__entries:
+                del self.__entries[comp]
+
+    def succeeded(self, comp, now=None):
+        """
+        Component passed a check, so wait longer before the next one (up
+        to MAX_INTERVAL seconds)
+        """
+        with self.__lock:
+            entry = self.__entries.get(comp)
+        if entry is None:
+            return
+        interval = min(entry[1] * self.BACKOFF, self.MAX_INTERVAL)
+        self.__reschedule(comp, interval, now)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+import random
+import unittest
+
+from LivenessTracker import LivenessTracker
+
+
+class LivenessTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.__tracker = LivenessTracker(rand=random.Random(1))
+
+    def test_empty(self):
+        self.assertEqual(0, len(self.__tracker))
+        self.assertTrue(self.__tracker.next_deadline is None)
+        self.assertEqual([], self.__tracker.due(now=1000.0))
+
+    def test_due(self):
+        tracker = self.__tracker
+
+        tracker.add("a", now=0.0)
+        tracker.add("b", now=10.0)
+
+        max_jitter = 1.0 + LivenessTracker.JITTER
+        min_jitter = 1.0 - LivenessTracker.JITTER
+
+        self.assertTrue(LivenessTracker.BASE_INTERVAL * min_jitter <=
+                        tracker.next_deadline <=
+                        LivenessTracker.BASE_INTERVAL * max_jitter)
+
+        self.assertEqual([], tracker.due(now=1.0))
+        self.assertEqual(["a"], tracker.due(now=9.0))
+
+        # "a" has no deadline until its result is reported
+        self.assertEqual([], tracker.due(now=9.0))
+        self.assertTrue("a" in tracker)
+        self.assertEqual(["b"], tracker.due(now=100.0))
+
+    def test_backoff(self):
+        tracker = self.__tracker
+
+        tracker.add("a", now=0.0)
+
+        interval = LivenessTracker.BASE_INTERVAL
+        now = 0.0
+        for _ in range(10):
+            now += 100.0
+            self.assertEqual(["a"], tracker.due(now=now))
+            tracker.succeeded("a", now=now)
+
+            interval = min(interval * LivenessTracker.BACKOFF,
+                           LivenessTracker.MAX_INTERVAL)
+            self.assertEqual(interval, tracker.interval("a"))
+
+        # a failure means the component is checked again quickly
+        now += 100.0
+        self.assertEqual(["a"], tracker.due(now=now))
+        tracker.failed("a", now=now)
+        self.assertEqual(LivenessTracker.MIN_INTERVAL, tracker.interval("a"))
+        self.assertEqual(["a"], tracker.due(now=now + 2.0))
+
+        # once it answers again, the interval backs off to the maximum
+        interval = LivenessTracker.MIN_INTERVAL
+        for _ in range(10):
+            now += 100.0
+            tracker.succeeded("a", now=now)
+            interval = min(interval * LivenessTracker.BACKOFF,
+                           LivenessTracker.MAX_INTERVAL)
+            self.assertEqual(interval, tracker.interval("a"))
+            self.assertEqual(["a"], tracker.due(now=now + 100.0))
+
+    def test_max_detection_time(self):
+        # a component which dies just after answering a check must be
+        # checked again within the old 5 second polling period
+        max_secs = 5.0
+
+        for seed in range(20):
+            tracker = LivenessTracker(rand=random.Random(seed))
+            tracker.add("a", now=0.0)
+            self.assertTrue(tracker.next_deadline <= max_secs)
+
+            now = 0.0
+            for _ in range(20):
+                now = tracker.next_deadline
+                self.assertEqual(["a"], tracker.due(now=now))
+                tracker.succeeded("a", now=now)
+                self.assertTrue(tracker.next_deadline - now <= max_secs,
+                                "Next check is %.2fs away" %
+                                (tracker.next_deadline - now, ))
+
+            tracker.heartbeat("a", now=now)
+            self.assertTrue(tracker.next_deadline - now <= max_secs)
+
+    def test_heartbeat(self):
+        tracker = self.__tracker
+
+        tracker.add("a", now=0.0)
+        tracker.heartbeat("a", now=4.0)
+
+        # heartbeat pushed the first check past its original deadline
+        self.assertEqual([], tracker.due(now=8.0))
+        self.assertTrue(tracker.next_deadline > 8.0)
+
+    def test_remove(self):
+        tracker = self.__tracker
+
+        tracker.add("a", now=0.0)
+        tracker.add("b", now=0.0)
+        tracker.remove("a")
+        self.assertEqual(1, len(tracker))
+
+        self.assertEqual(["b"], tracker.due(now=100.0))
+
+        # late results for removed components are ignored
+        tracker.succeeded("a", now=100.0)
+        tracker.failed("a", now=100.0)
+        self.assertFalse("a" in tracker)
+        self.assertTrue(tracker.next_deadline is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
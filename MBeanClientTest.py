@@ -1,7 +1,10 @@
 #!/usr/bin/env python
 
+import threading
 import unittest
-from DAQClient import BeanLoadException, MBeanClient
+
+from DAQClient import BeanException, BeanLoadException, MBeanClient
+from DAQRPC import RPCServer
 
 from exc_string import exc_string, set_exc_string_encoding
 set_exc_string_encoding("ascii")
@@ -69,7 +72,83 @@ class MostlyMBeanClient(MBeanClient):
         return MockRPCClient(host, port, self.__agent)
 
 
+class CountingMBeanServer(RPCServer):
+    "MBean server which counts the number of requests"
+
+    def __init__(self, mbean_dict, multicall=True):
+        self.__mbean_dict = mbean_dict
+        self.num_requests = 0
+
+        RPCServer.__init__(self, 0)
+
+        self.register_function(self.__get_attributes, "mbean.getAttributes")
+        self.register_function(lambda: list(self.__mbean_dict.keys()),
+                               "mbean.listMBeans")
+        self.register_function(lambda bean:
+                               list(self.__mbean_dict[bean].keys()),
+                               "mbean.listGetters")
+        if multicall:
+            self.register_multicall_functions()
+
+    def __get_attributes(self, bean, fld_list):
+        return dict((fld, self.__mbean_dict[bean][fld]) for fld in fld_list)
+
+    def get_request(self):
+        self.num_requests += 1
+        return RPCServer.get_request(self)
+
+
 class TestMBeanClient(unittest.TestCase):
+    MBEANS = {
+        "beanA": {"fldA": 1, "fldB": "2L"},
+        "beanB": {"fldC": "abc"},
+        "beanC": {"fldD": 4},
+    }
+
+    def setUp(self):
+        self.__server = None
+
+    def tearDown(self):
+        if self.__server is not None:
+            self.__server.server_close()
+
+    def __start_server(self, multicall):
+        self.__server = CountingMBeanServer(self.MBEANS, multicall=multicall)
+
+        thrd = threading.Thread(target=self.__server.serve_forever)
+        thrd.daemon = True
+        thrd.start()
+
+        return self.__server.server_address[1]
+
+    def __check_multiple(self, multicall):
+        port = self.__start_server(multicall)
+        client = MBeanClient("foo", "localhost", port)
+
+        values = client.get_multiple({"beanA": ["fldA", "fldB"],
+                                      "beanB": ["fldC"],
+                                      "beanX": ["fldX"]})
+
+        self.assertEqual({"fldA": 1, "fldB": 2}, values["beanA"])
+        self.assertEqual({"fldC": "abc"}, values["beanB"])
+        self.assertTrue(isinstance(values["beanX"], BeanException),
+                        "Expected exception for beanX, not %s" %
+                        (values["beanX"], ))
+
+        self.assertEqual(["fldD"], client.get_bean_fields("beanC"))
+
+        return self.__server.num_requests
+
+    def test_get_multiple(self):
+        # one multicall for the values, plus listMBeans and a multicall
+        # for all the getters
+        self.assertEqual(3, self.__check_multiple(True))
+
+    def test_get_multiple_fallback(self):
+        # one failed multicall, one request for each bean, plus listMBeans
+        # and a listGetters request for each bean
+        self.assertEqual(8, self.__check_multiple(False))
+
     def test_fail_and_recover(self):
         agent = MockMBeanAgent()
 
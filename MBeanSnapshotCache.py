@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""
+Cache of each component's full MBean dictionary which is shared by all the
+TaskManager tasks, so each component's MBean server is queried once per
+monitoring period instead of once per task
+"""
+
+import threading
+import time
+
+
+class MBeanSnapshot(object):
+    "All of a component's MBean values, fetched at the same time"
+
+    def __init__(self, values, fetch_time):
+        self.__values = values
+        self.__fetch_time = fetch_time
+        self.__failures = 0
+
+    def __str__(self):
+        return "MBeanSnapshot[%d beans, age %.1fs, %d failures]" % \
+            (len(self.__values), self.age, self.__failures)
+
+    @property
+    def age(self):
+        "Return the number of seconds since these values were fetched"
+        return time.time() - self.__fetch_time
+
+    def add_failure(self):
+        "Note that an attempt to refresh these values failed"
+        self.__failures += 1
+
+    @property
+    def failures(self):
+        "Return the number of failed refreshes since this snapshot was taken"
+        return self.__failures
+
+    def fields(self, bean, fld_list):
+        """
+        Return a dictionary containing the requested fields, or None if the
+        bean or any of the fields is not in this snapshot
+        """
+        if bean not in self.__values:
+            return None
+
+        bean_dict = self.__values[bean]
+        if not isinstance(bean_dict, dict):
+            return None
+
+        attrs = {}
+        for fld in fld_list:
+            if fld not in bean_dict:
+                return None
+            attrs[fld] = bean_dict[fld]
+        return attrs
+
+    @property
+    def fetch_time(self):
+        "Return the time (in seconds since the epoch) of the fetch"
+        return self.__fetch_time
+
+    @property
+    def values(self):
+        "Return the dictionary of MBean dictionaries"
+        return self.__values
+
+
+class MBeanSnapshotCache(object):
+    """
+    Per-component MBean snapshots.  MonitorTask calls `refresh()` once per
+    monitoring period to fetch each component's full MBean dictionary, and
+    the other tasks use `get_fields()` to read values from a snapshot which
+    is younger than the TTL, falling back to their own requests if there
+    isn't one.
+    """
+
+    # default number of seconds before a snapshot is considered stale
+    DEFAULT_TTL = 60.0
+
+    def __init__(self, ttl=None):
+        if ttl is None:
+            ttl = self.DEFAULT_TTL
+        self.__ttl = ttl
+
+        self.__snapshots = {}
+        self.__fetch_locks = {}
+        self.__lock = threading.Lock()
+
+        self.__num_fetches = 0
+        self.__num_hits = 0
+        self.__num_misses = 0
+
+    def __fetch_lock(self, comp):
+        "Return the lock which serializes refreshes for this component"
+        with self.__lock:
+            if comp not in self.__fetch_locks:
+                self.__fetch_locks[comp] = threading.Lock()
+            return self.__fetch_locks[comp]
+
+    def __fresh_snapshot(self, comp, newer_than=None):
+        "Return the component's snapshot if it's recent enough, else None"
+        with self.__lock:
+            snap = self.__snapshots.get(comp)
+        if snap is None or snap.failures > 0 or snap.age > self.__ttl:
+            return None
+        if newer_than is not None and snap.fetch_time <= newer_than:
+            return None
+        return snap
+
+    def clear(self):
+        "Forget all snapshots"
+        with self.__lock:
+            self.__snapshots.clear()
+
+    def fresh_snapshot(self, comp, newer_than=None):
+        """
+        Return the component's snapshot if it is younger than the TTL,
+        otherwise return None.  If `newer_than` is specified, snapshots
+        fetched at or before that time are ignored.
+        """
+        snap = self.__fresh_snapshot(comp, newer_than=newer_than)
+        with self.__lock:
+            if snap is None:
+                self.__num_misses += 1
+            else:
+                self.__num_hits += 1
+        return snap
+
+    def get_fields(self, comp, bean, fld_list, newer_than=None):
+        """
+        Return a dictionary of the requested fields from the component's
+        snapshot, or None if there is no fresh snapshot containing all the
+        fields
+        """
+        snap = self.__fresh_snapshot(comp, newer_than=newer_than)
+        attrs = None if snap is None else snap.fields(bean, fld_list)
+        with self.__lock:
+            if attrs is None:
+                self.__num_misses += 1
+            else:
+                self.__num_hits += 1
+        return attrs
+
+    def is_stale(self, comp):
+        """
+        Return True if there's no snapshot for this component, if it's
+        older than the TTL, or if the most recent refresh failed
+        """
+        return self.__fresh_snapshot(comp) is None
+
+    def refresh(self, comp, mbean_client):
+        """
+        Fetch the component's MBean dictionary with `mbean_client`, save it
+        as the component's current snapshot, and return it.  Exceptions
+        raised by the client are passed along to the caller.
+        """
+        with self.__fetch_lock(comp):
+            with self.__lock:
+                self.__num_fetches += 1
+            fetch_time = time.time()
+            try:
+                values = mbean_client.get_dictionary()
+            except:  # pylint: disable=bare-except
+                with self.__lock:
+                    if comp in self.__snapshots:
+                        self.__snapshots[comp].add_failure()
+                raise
+
+            if isinstance(values, dict):
+                with self.__lock:
+                    self.__snapshots[comp] = MBeanSnapshot(values, fetch_time)
+
+            return values
+
+    def snapshot(self, comp):
+        "Return the most recent snapshot for this component (or None)"
+        with self.__lock:
+            return self.__snapshots.get(comp)
+
+    @property
+    def statistics(self):
+        "Return the number of fetches, cache hits, and cache misses"
+        with self.__lock:
+            return {
+                "fetches": self.__num_fetches,
+                "hits": self.__num_hits,
+                "misses": self.__num_misses,
+                "snapshots": len(self.__snapshots),
+            }
+
+    @property
+    def ttl(self):
+        "Return the number of seconds before a snapshot becomes stale"
+        return self.__ttl
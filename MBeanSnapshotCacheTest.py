@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+import time
+import unittest
+
+from DAQClient import BeanTimeoutException
+from MBeanSnapshotCache import MBeanSnapshotCache
+from WatchdogTask import WatchData
+
+from DAQMocks import MockComponent
+
+
+class FailingMBeanClient(object):
+    def get_dictionary(self):  # pylint: disable=no-self-use
+        raise BeanTimeoutException("Forced failure")
+
+
+class CountingMBeanClient(object):
+    "Wrap a mock MBean client and count the requests"
+
+    def __init__(self, client):
+        self.__client = client
+        self.__counts = {}
+
+    def __getattr__(self, name):
+        func = getattr(self.__client, name)
+
+        def counter(*args):
+            self.__counts[name] = self.__counts.get(name, 0) + 1
+            return func(*args)
+        return counter
+
+    def count(self, name):
+        return self.__counts.get(name, 0)
+
+
+class MBeanSnapshotCacheTest(unittest.TestCase):
+    @classmethod
+    def __create_component(cls):
+        comp = MockComponent("stringHub", 1)
+        comp.mbean.add_mock_data("stringhub", "NumberOfActiveChannels", 60)
+        comp.mbean.add_mock_data("stringhub", "TotalLBMOverflows", 0)
+        comp.mbean.add_mock_data("sender", "NumHitsReceived", 10)
+        return comp
+
+    def test_refresh(self):
+        comp = self.__create_component()
+        cache = MBeanSnapshotCache(ttl=10)
+
+        self.assertTrue(cache.is_stale(comp))
+        self.assertIsNone(cache.get_fields(comp, "sender",
+                                           ("NumHitsReceived", )))
+
+        values = cache.refresh(comp, comp.mbean)
+        self.assertEqual(10, values["sender"]["NumHitsReceived"])
+        self.assertFalse(cache.is_stale(comp))
+
+        self.assertEqual({"NumHitsReceived": 10},
+                         cache.get_fields(comp, "sender",
+                                          ("NumHitsReceived", )))
+        self.assertIsNone(cache.get_fields(comp, "sender", ("Bogus", )))
+        self.assertIsNone(cache.get_fields(comp, "bogus", ("Bogus", )))
+
+        stats = cache.statistics
+        self.assertEqual(1, stats["fetches"])
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(3, stats["misses"])
+
+    def test_ttl(self):
+        comp = self.__create_component()
+        cache = MBeanSnapshotCache(ttl=0.1)
+
+        cache.refresh(comp, comp.mbean)
+        self.assertIsNotNone(cache.fresh_snapshot(comp))
+
+        time.sleep(0.2)
+        self.assertTrue(cache.is_stale(comp))
+        self.assertIsNone(cache.fresh_snapshot(comp))
+
+        # stale snapshot is still available
+        self.assertTrue(cache.snapshot(comp).age >= 0.1)
+
+    def test_failure(self):
+        comp = self.__create_component()
+        cache = MBeanSnapshotCache(ttl=10)
+
+        cache.refresh(comp, comp.mbean)
+        self.assertRaises(BeanTimeoutException, cache.refresh, comp,
+                          FailingMBeanClient())
+
+        self.assertTrue(cache.is_stale(comp))
+        self.assertEqual(1, cache.snapshot(comp).failures)
+
+        cache.refresh(comp, comp.mbean)
+        self.assertFalse(cache.is_stale(comp))
+
+    def test_newer_than(self):
+        comp = self.__create_component()
+        cache = MBeanSnapshotCache(ttl=10)
+
+        cache.refresh(comp, comp.mbean)
+        snap = cache.fresh_snapshot(comp)
+        self.assertIsNone(cache.fresh_snapshot(comp,
+                                               newer_than=snap.fetch_time))
+
+    def test_watch_data(self):
+        comp = self.__create_component()
+        client = CountingMBeanClient(comp.mbean)
+        cache = MBeanSnapshotCache(ttl=10)
+
+        other = MockComponent("inIceTrigger", 0)
+
+        wdata = WatchData(comp, client, None, snapshot_cache=cache)
+        wdata.add_output_value(other, "sender", "NumHitsReceived")
+        wdata.add_threshold_value("stringhub", "TotalLBMOverflows", 10,
+                                  less_than=False)
+
+        # no snapshot, so values are fetched directly
+        self.assertTrue(wdata.check([], [], []))
+        self.assertEqual(1, client.count("get_multiple"))
+
+        # the new snapshot is used instead of the MBean client
+        comp.mbean.set_data("sender", "NumHitsReceived", 20)
+        cache.refresh(comp, comp.mbean)
+        self.assertTrue(wdata.check([], [], []))
+        self.assertEqual(1, client.count("get_multiple"))
+
+        # snapshot has already been used, so fetch values directly
+        comp.mbean.set_data("sender", "NumHitsReceived", 30)
+        self.assertTrue(wdata.check([], [], []))
+        self.assertEqual(2, client.count("get_multiple"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""
+Compact binary version of the pDAQ .moni file format.
+
+A binary .moni file starts with a short header (MAGIC, a version byte and
+the name of the encoding) followed by one record per bean.  Each record
+is a 4-byte big-endian length followed by the encoded list
+[date_string, bean_name, [[field, value], ...]], so values are stored in
+their native types instead of being written with str() and re-parsed
+with ast.literal_eval().
+
+moni_stream() recognizes binary files automatically.  Running this module
+converts text .moni files to the binary format.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import struct
+import sys
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# first bytes of every binary .moni file
+MAGIC = b"pDAQmoni"
+# current version of the binary format
+VERSION = 1
+# name of the standard text format
+TEXT_FORMAT = "text"
+
+# record length prefix
+LENGTH = struct.Struct(">I")
+
+
+class MoniBinaryException(Exception):
+    "Problem with a binary .moni file"
+
+
+class MoniEncoder(object):
+    "Base class for binary .moni record encodings"
+
+    # name stored in the file header
+    NAME = None
+
+    def __str__(self):
+        return self.NAME
+
+    def dumps(self, obj):
+        "Encode a record"
+        raise NotImplementedError()
+
+    def loads(self, data):
+        "Decode a record"
+        raise NotImplementedError()
+
+
+class JSONEncoder(MoniEncoder):
+    "JSON encoding"
+
+    NAME = "json"
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(",", ":"),
+                          default=str).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data.decode("utf-8"))
+
+
+class MsgpackEncoder(MoniEncoder):
+    "MessagePack encoding (requires the 'msgpack' package)"
+
+    NAME = "msgpack"
+
+    def dumps(self, obj):
+        return msgpack.packb(obj, use_bin_type=True, default=str)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+# binary encodings, in order of preference
+_ENCODERS = [JSONEncoder()]
+if msgpack is not None:
+    _ENCODERS.insert(0, MsgpackEncoder())
+
+
+def encode_record(encoder, now, bean_name, attrs):
+    "Return the length-prefixed binary record for one bean"
+    data = encoder.dumps([str(now), bean_name,
+                          [[key, attrs[key]] for key in attrs]])
+    return LENGTH.pack(len(data)) + data
+
+
+def file_header(encoder):
+    "Return the header for a binary file using this encoding"
+    name = encoder.NAME.encode("ascii")
+    return MAGIC + struct.pack("BB", VERSION, len(name)) + name
+
+
+def find_encoder(name):
+    "Return the encoder with this name, or None if it isn't supported"
+    for encoder in _ENCODERS:
+        if encoder.NAME == name:
+            return encoder
+    return None
+
+
+def format_names():
+    "Return the names of all supported .moni file formats"
+    return [TEXT_FORMAT, ] + [encoder.NAME for encoder in _ENCODERS]
+
+
+def is_binary(filename):
+    "Return True if this is a binary .moni file"
+    with open(filename, "rb") as fin:
+        return fin.read(len(MAGIC)) == MAGIC
+
+
+def __read_header(fin):
+    "Read the file header and return the file's encoder"
+    hdr = fin.read(len(MAGIC) + 2)
+    if len(hdr) < len(MAGIC) + 2 or not hdr.startswith(MAGIC):
+        raise MoniBinaryException("Bad binary .moni header")
+
+    version, name_len = struct.unpack("BB", hdr[len(MAGIC):])
+    if version != VERSION:
+        raise MoniBinaryException("Unknown binary .moni version %d" %
+                                  (version, ))
+
+    name = fin.read(name_len).decode("ascii")
+    encoder = find_encoder(name)
+    if encoder is None:
+        raise MoniBinaryException("Unsupported .moni encoding \"%s\"" %
+                                  (name, ))
+    return encoder
+
+
+def read_records(filename):
+    """
+    Read a binary .moni file and return a stream of tuples containing
+    (date_string, bean_name, [(field, value), ...]).
+    A partial record at the end of the file is ignored.
+    """
+    with open(filename, "rb") as fin:
+        encoder = __read_header(fin)
+
+        while True:
+            prefix = fin.read(LENGTH.size)
+            if len(prefix) < LENGTH.size:
+                break
+
+            length, = LENGTH.unpack(prefix)
+            data = fin.read(length)
+            if len(data) < length:
+                break
+
+            datestr, bean_name, pairs = encoder.loads(data)
+            yield datestr, bean_name, pairs
+
+
+def convert(filename, out_name, encoder):
+    """
+    Convert a text .moni file to a binary .moni file.
+    Return the number of records written
+    """
+    # avoid a circular import
+    from moni_stream import moni_stream
+
+    num_recs = 0
+    with open(out_name, "wb") as out:
+        out.write(file_header(encoder))
+
+        cur_key = None
+        attrs = {}
+        for datestr, bean_name, field, value in moni_stream(filename):
+            if cur_key != (datestr, bean_name):
+                if cur_key is not None:
+                    out.write(encode_record(encoder, cur_key[0], cur_key[1],
+                                            attrs))
+                    num_recs += 1
+                cur_key = (datestr, bean_name)
+                attrs = {}
+            attrs[field] = value
+
+        if cur_key is not None:
+            out.write(encode_record(encoder, cur_key[0], cur_key[1], attrs))
+            num_recs += 1
+
+    return num_recs
+
+
+def main():
+    "Main program"
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--format", dest="format",
+                        choices=[enc.NAME for enc in _ENCODERS],
+                        default=_ENCODERS[0].NAME,
+                        help="Binary encoding to use")
+    parser.add_argument("-o", "--output-directory", dest="out_dir",
+                        help=("Write converted files to this directory"
+                              " instead of replacing the original files"))
+    parser.add_argument(dest="files", nargs="+",
+                        help="Text .moni files to convert")
+    args = parser.parse_args()
+
+    encoder = find_encoder(args.format)
+
+    for fname in args.files:
+        if is_binary(fname):
+            print("Skipping binary file \"%s\"" % (fname, ), file=sys.stderr)
+            continue
+
+        if args.out_dir is not None:
+            out_name = os.path.join(args.out_dir, os.path.basename(fname))
+        else:
+            out_name = fname + ".tmp"
+
+        num_recs = convert(fname, out_name, encoder)
+        if args.out_dir is None:
+            os.rename(out_name, fname)
+            out_name = fname
+
+        print("Wrote %d records to %s" % (num_recs, out_name))
+
+
+if __name__ == "__main__":
+    main()
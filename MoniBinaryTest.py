@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import MoniBinary
+
+from MonitorTask import MoniFileWriter, MonitorToFile
+from moni_stream import moni_stream
+
+
+class MoniBinaryTest(unittest.TestCase):
+    BEANS = (
+        ("stringhub", {"HubId": 12, "NumberOfActiveChannels": 60,
+                       "LatestFirstChannelHitTime": 300000000000000001,
+                       "NumberOfActiveAndTotalChannels": [60, 60]}),
+        ("sender", {"NumHitsReceived": 1234567890123, "Name": "abc"}),
+        ("jvm", {"NumGCs": {"PS Scavenge": 17, "PS MarkSweep": 2}}),
+    )
+
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmpdir, ignore_errors=True)
+
+    def __write_files(self, encoder, cycles=3):
+        "Write a text file and a binary file with the same data"
+        text_file = MonitorToFile(self.__tmpdir, "text")
+        writer = MoniFileWriter(encoder=encoder)
+        bin_file = MonitorToFile(self.__tmpdir, "binary", writer=writer)
+
+        now = datetime.datetime(2020, 1, 2, 3, 4, 5, 678901)
+        for _ in range(cycles):
+            for bean, attrs in self.BEANS:
+                text_file.send(now, bean, attrs)
+                bin_file.send(now, bean, attrs)
+            now += datetime.timedelta(seconds=100)
+
+        text_file.close()
+        bin_file.close()
+        writer.stop()
+
+        return os.path.join(self.__tmpdir, "text.moni"), \
+            os.path.join(self.__tmpdir, "binary.moni")
+
+    def test_formats(self):
+        names = MoniBinary.format_names()
+        self.assertEqual(MoniBinary.TEXT_FORMAT, names[0])
+        self.assertTrue("json" in names)
+
+        self.assertTrue(MoniBinary.find_encoder(MoniBinary.TEXT_FORMAT)
+                        is None)
+        self.assertTrue(MoniBinary.find_encoder("unknown") is None)
+
+    def test_same_tuples(self):
+        encoder = MoniBinary.find_encoder("json")
+        text_path, bin_path = self.__write_files(encoder)
+
+        self.assertFalse(MoniBinary.is_binary(text_path))
+        self.assertTrue(MoniBinary.is_binary(bin_path))
+
+        for kwargs in ({},
+                       {"total_fields": ["NumGCs", ]},
+                       {"ignored_func": lambda cat, fld: cat == "sender"}):
+            expected = list(moni_stream(text_path, **kwargs))
+            self.assertEqual(expected, list(moni_stream(bin_path, **kwargs)))
+
+        # unfixed values are strings in both formats
+        for vals in zip(moni_stream(text_path, fix_values=False),
+                        moni_stream(bin_path, fix_values=False)):
+            self.assertEqual(vals[0], vals[1])
+
+    def test_convert(self):
+        encoder = MoniBinary.find_encoder("json")
+        text_path, _ = self.__write_files(None)
+
+        out_path = os.path.join(self.__tmpdir, "converted.moni")
+        num_recs = MoniBinary.convert(text_path, out_path, encoder)
+
+        self.assertEqual(len(self.BEANS) * 3, num_recs)
+        self.assertEqual(list(moni_stream(text_path)),
+                         list(moni_stream(out_path)))
+
+    def test_truncated(self):
+        encoder = MoniBinary.find_encoder("json")
+        _, bin_path = self.__write_files(encoder, cycles=1)
+
+        with open(bin_path, "rb") as fin:
+            data = fin.read()
+        with open(bin_path, "wb") as out:
+            out.write(data[:-5])
+
+        beans = [rec[1] for rec in MoniBinary.read_records(bin_path)]
+        self.assertEqual([bean for bean, _ in self.BEANS[:-1]], beans)
+
+    def test_bad_header(self):
+        path = os.path.join(self.__tmpdir, "bad.moni")
+        with open(path, "wb") as out:
+            out.write(MoniBinary.MAGIC + b"\x63\x04json")
+
+        try:
+            list(MoniBinary.read_records(path))
+            self.fail("Bad version should not be accepted")
+        except MoniBinary.MoniBinaryException as exc:
+            self.assertTrue(str(exc).startswith("Unknown binary .moni"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,13 @@ import datetime
 import os
 import threading
 import sys
+import time
+try:
+    import queue
+except:  # ModuleNotFoundError only works under 2.7/3.0
+    import Queue as queue
+
+import MoniBinary
 
 from CnCTask import CnCTask
 from CnCThread import CnCThread
@@ -67,7 +74,7 @@ class MBeanThread(MonitorThread):
     "MBean monitoring thread"
 
     def __init__(self, comp, run_dir, live_moni, run_options, dashlog,
-                 reporter=None, refused=0):
+                 reporter=None, refused=0, snapshot_cache=None, writer=None):
         "Create an MBean monitoring thread"
         self.__comp = comp
         self.__run_dir = run_dir
@@ -75,6 +82,8 @@ class MBeanThread(MonitorThread):
         self.__run_options = run_options
         self.__reporter = reporter
         self.__refused = refused
+        self.__snapshot_cache = snapshot_cache
+        self.__writer = writer
         self.__reporter_lock = threading.Lock()
 
         self.__mbean_client = comp.create_mbean_client()
@@ -86,10 +95,11 @@ class MBeanThread(MonitorThread):
         if RunOption.is_moni_to_both(self.__run_options) and \
                self.__live_moni is not None:
             return MonitorToBoth(self.__run_dir, self.__comp.filename,
-                                 self.__live_moni)
+                                 self.__live_moni, writer=self.__writer)
         if RunOption.is_moni_to_file(self.__run_options):
             if self.__run_dir is not None:
-                return MonitorToFile(self.__run_dir, self.__comp.filename)
+                return MonitorToFile(self.__run_dir, self.__comp.filename,
+                                     writer=self.__writer)
         if RunOption.is_moni_to_live(self.__run_options) and \
            self.__live_moni is not None:
             return MonitorToLive(self.__comp.filename, self.__live_moni)
@@ -99,7 +109,12 @@ class MBeanThread(MonitorThread):
     def __fetch_dictionary(self):
         "Fetch the MBean dictionary from the remote component"
         try:
-            bean_dict = self.__mbean_client.get_dictionary()
+            if self.__snapshot_cache is None:
+                bean_dict = self.__mbean_client.get_dictionary()
+            else:
+                # share these values with the other tasks
+                bean_dict = self.__snapshot_cache.refresh(self.__comp,
+                                                          self.__mbean_client)
             self.__refused = 0
         except BeanTimeoutException:
             bean_dict = None
@@ -126,9 +141,8 @@ class MBeanThread(MonitorThread):
                 # report monitoring data
                 with self.__reporter_lock:
                     reporter = self.__reporter
-                for key, data in list(bean_dict.items()):
-                    if not self.is_closed:
-                        reporter.send(datetime.datetime.now(), key, data)
+                if not self.is_closed:
+                    reporter.send_snapshot(datetime.datetime.now(), bean_dict)
 
     def _run(self):
         "Run the task"
@@ -162,7 +176,9 @@ class MBeanThread(MonitorThread):
         "Create a new monitoring thread"
         thrd = MBeanThread(self.__comp, self.__run_dir, self.__live_moni,
                            self.__run_options, self.dashlog,
-                           self.__reporter, self.__refused)
+                           self.__reporter, self.__refused,
+                           snapshot_cache=self.__snapshot_cache,
+                           writer=self.__writer)
         return thrd
 
     @property
@@ -174,11 +190,13 @@ class MBeanThread(MonitorThread):
 class CnCMoniThread(MonitorThread):
     "Thread to monitor pDAQ component MBean data"
 
-    def __init__(self, runset, rundir, write_to_file, dashlog, reporter=None):
+    def __init__(self, runset, rundir, write_to_file, dashlog, reporter=None,
+                 writer=None):
         "Create a monitoring thread"
         self.__runset = runset
         self.__rundir = rundir
         self.__reporter = reporter
+        self.__writer = writer
 
         self.__write_to_file = write_to_file
 
@@ -188,7 +206,8 @@ class CnCMoniThread(MonitorThread):
         "Create a monitoring reporter object"
         if self.__write_to_file:
             if self.__rundir is not None:
-                return MonitorToFile(self.__rundir, "cncServer")
+                return MonitorToFile(self.__rundir, "cncServer",
+                                     writer=self.__writer)
 
         return None
 
@@ -211,7 +230,7 @@ class CnCMoniThread(MonitorThread):
         "Create a new copy of this thread"
         thrd = CnCMoniThread(self.__runset, self.__rundir,
                              self.__write_to_file, self.dashlog,
-                             reporter=self.__reporter)
+                             reporter=self.__reporter, writer=self.__writer)
         return thrd
 
     @property
@@ -220,59 +239,380 @@ class CnCMoniThread(MonitorThread):
         return 0
 
 
+class MoniFileWriter(object):
+    """
+    Write the .moni records for all of a run's components from a single
+    thread.  Records are added to a bounded queue and written to each file
+    in large batches, and the files are fsync'ed every FSYNC_SECS seconds
+    and when the writer is stopped at the end of the run.
+
+    If `encoder` is specified, files are written in that MoniBinary format
+    instead of the text format.
+    """
+
+    # maximum number of queued records
+    MAX_QUEUED = 2000
+    # maximum number of records written in a single batch
+    MAX_BATCH = 500
+    # number of seconds between calls to fsync()
+    FSYNC_SECS = 10.0
+    # drop a record if the queue is still full after this many seconds
+    PUT_TIMEOUT = 5.0
+
+    def __init__(self, dashlog=None, encoder=None):
+        self.__dashlog = dashlog
+        self.__encoder = encoder
+
+        self.__queue = queue.Queue(self.MAX_QUEUED)
+
+        self.__lock = threading.Lock()
+        self.__thread = None
+        self.__stopped = False
+
+        self.__written = 0
+        self.__dropped = 0
+
+    def __close_all(self, files):
+        "Close all open files"
+        for fdesc in files:
+            try:
+                fdesc.close()
+            except (IOError, OSError):
+                self.__log_error("Cannot close %s" % (fdesc.name, ))
+
+    def __log_error(self, msg):
+        if self.__dashlog is not None:
+            self.__dashlog.error("%s: %s" % (msg, exc_string()))
+
+    def __put(self, item, block=False):
+        """
+        Queue an item for the writer thread, starting the thread if
+        necessary.  If `block` is False, give up after PUT_TIMEOUT seconds.
+        Return False if the item was not queued.
+        """
+        with self.__lock:
+            if self.__stopped:
+                return False
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run,
+                                                 name="MoniFileWriter")
+                self.__thread.daemon = True
+                self.__thread.start()
+
+        try:
+            if block:
+                self.__queue.put(item)
+            else:
+                self.__queue.put(item, timeout=self.PUT_TIMEOUT)
+        except queue.Full:
+            return False
+        return True
+
+    def __run(self):
+        "Write queued records until the writer is stopped"
+        files = []
+        dirty = set()
+        next_sync = time.time() + self.FSYNC_SECS
+
+        stopped = False
+        while not stopped:
+            try:
+                batch = [self.__queue.get(timeout=max(next_sync - time.time(),
+                                                      0.0)), ]
+            except queue.Empty:
+                batch = []
+
+            # grab everything which is already waiting
+            while len(batch) < self.MAX_BATCH:
+                try:
+                    batch.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            pending = {}
+            closing = []
+            events = []
+            for fdesc, data in batch:
+                if fdesc is None:
+                    if data is None:
+                        stopped = True
+                    else:
+                        events.append(data)
+                elif data is None:
+                    closing.append(fdesc)
+                else:
+                    if fdesc not in pending:
+                        if fdesc not in files:
+                            files.append(fdesc)
+                        pending[fdesc] = []
+                    pending[fdesc].append(data)
+
+            # write each file's records with a single call
+            for fdesc, chunks in pending.items():
+                try:
+                    if isinstance(chunks[0], bytes):
+                        fdesc.write(b"".join(chunks))
+                    else:
+                        fdesc.write("".join(chunks))
+                    fdesc.flush()
+                    dirty.add(fdesc)
+                except (IOError, OSError, ValueError):
+                    self.__log_error("Cannot write %s" % (fdesc.name, ))
+                self.__written += len(chunks)
+
+            if stopped or len(closing) > 0 or len(events) > 0 or \
+               time.time() >= next_sync:
+                self.__sync(dirty)
+                next_sync = time.time() + self.FSYNC_SECS
+
+            for fdesc in closing:
+                if fdesc in files:
+                    files.remove(fdesc)
+                self.__close_all((fdesc, ))
+
+            for evt in events:
+                evt.set()
+
+        self.__close_all(files)
+
+    def __sync(self, dirty):
+        "Push all recently written data to disk"
+        for fdesc in dirty:
+            try:
+                os.fsync(fdesc.fileno())
+            except (IOError, OSError, ValueError):
+                self.__log_error("Cannot sync %s" % (fdesc.name, ))
+        dirty.clear()
+
+    def close_file(self, fdesc):
+        """
+        Close the file after all its queued records have been written.
+        Returns False if the writer has been stopped.
+        """
+        return self.__put((fdesc, None), block=True)
+
+    @property
+    def dropped(self):
+        "Number of records dropped because the queue was full"
+        return self.__dropped
+
+    @property
+    def encoder(self):
+        "MoniBinary encoder used for files (None for the text format)"
+        return self.__encoder
+
+    def flush(self, timeout=None):
+        """
+        Wait until all queued records have been written and synced.
+        Return False if the writer is stopped or the timeout expired
+        """
+        evt = threading.Event()
+        if not self.__put((None, evt), block=True):
+            return False
+        return evt.wait(timeout)
+
+    def stop(self):
+        "Write all queued records, sync and close all files"
+        with self.__lock:
+            if self.__stopped:
+                return
+            self.__stopped = True
+            thrd = self.__thread
+
+        if thrd is not None:
+            self.__queue.put((None, None))
+            thrd.join()
+
+    def write(self, fdesc, data):
+        """
+        Queue a block of text (or binary data) to be written to the file.
+        Returns False if the text was dropped.
+        """
+        if self.__put((fdesc, data)):
+            return True
+
+        with self.__lock:
+            self.__dropped += 1
+        return False
+
+    @property
+    def written(self):
+        "Number of records written"
+        return self.__written
+
+
 class MonitorToFile(object):
     "Write monitoring info to a file"
-    def __init__(self, dirname, basename):
+    def __init__(self, dirname, basename, writer=None):
         "Open pDAQ monitoring file"
+        if writer is None:
+            self.__encoder = None
+        else:
+            self.__encoder = writer.encoder
+
         if dirname is None:
             self.__fd = None
         else:
-            self.__fd = open(os.path.join(dirname, basename + ".moni"), "w")
+            path = os.path.join(dirname, basename + ".moni")
+            if self.__encoder is None:
+                self.__fd = open(path, "w")
+            else:
+                self.__fd = open(path, "wb")
+                self.__fd.write(MoniBinary.file_header(self.__encoder))
         self.__fd_lock = threading.Lock()
+        self.__writer = writer
 
     def close(self):
         "Close pDAQ monitoring file"
         with self.__fd_lock:
             if self.__fd is not None:
-                self.__fd.close()
+                if self.__writer is None or \
+                   not self.__writer.close_file(self.__fd):
+                    self.__fd.close()
                 self.__fd = None
 
+    @classmethod
+    def format(cls, now, bean_name, attrs):
+        "Return the text for one bean's monitoring record"
+        lines = ["%s: %s:\n" % (bean_name, now), ]
+        for key in attrs:
+            lines.append("\t%s: %s\n" % (key, attrs[key]))
+        lines.append("\n")
+        return "".join(lines)
+
     def send(self, now, bean_name, attrs):
         "Send monitoring data to pDAQ file"
+        if self.__encoder is None:
+            text = self.format(now, bean_name, attrs)
+        else:
+            text = MoniBinary.encode_record(self.__encoder, now, bean_name,
+                                            attrs)
         with self.__fd_lock:
             if self.__fd is not None:
-                print("%s: %s:" % (bean_name, now), file=self.__fd)
-                for key in attrs:
-                    print("\t%s: %s" % (key, attrs[key]), file=self.__fd)
-                print(file=self.__fd)
-                self.__fd.flush()
+                if self.__writer is not None:
+                    self.__writer.write(self.__fd, text)
+                else:
+                    self.__fd.write(text)
+                    self.__fd.flush()
+
+    def send_snapshot(self, now, bean_dict):
+        "Send monitoring data for all beans to pDAQ file"
+        for bean_name, attrs in bean_dict.items():
+            self.send(now, bean_name, attrs)
 
 
 class MonitorToLive(object):
-    "Send monitoring info to I3Live"
+    """
+    Send monitoring info to I3Live.
+
+    Each bean is sent as a single "component*bean" message whose value is
+    the bean's dictionary of fields, and all the beans from one snapshot
+    are handed to the client as a single batch if it supports
+    sendMoniBatch().  Each component may send MAX_RATE messages per second
+    (with bursts of up to MAX_BURST messages); messages over the limit are
+    dropped, and the total number of dropped messages is sent as
+    "component*droppedMoni".
+    """
+
+    # if False, send each field as a separate "component*bean+field" message
+    COALESCE = True
+    # sustained number of messages per second for each component
+    MAX_RATE = 10.0
+    # maximum number of messages which can be sent at once
+    MAX_BURST = 250
+
     def __init__(self, name, live_moni):
         "Create I3Live monitoring object"
         self.__name = name
         self.__live_moni = live_moni
 
+        self.__lock = threading.Lock()
+        self.__tokens = float(self.MAX_BURST)
+        self.__last_fill = time.time()
+
+        self.__sent = 0
+        self.__dropped = 0
+        self.__reported_drops = 0
+
+    def __build_messages(self, now, bean_dict):
+        "Return the list of (name, value, prio, time) messages to be sent"
+        msgs = []
+        for bean_name, attrs in bean_dict.items():
+            if self.COALESCE:
+                msgs.append(("%s*%s" % (self.__name, bean_name), attrs,
+                             Prio.ITS, now))
+            else:
+                for key in attrs:
+                    msgs.append(("%s*%s+%s" % (self.__name, bean_name, key),
+                                 attrs[key], Prio.ITS, now))
+        return msgs
+
+    def __take_tokens(self, count):
+        """
+        Return the number of messages (up to `count`) which can be sent now
+        Note that self.__lock is acquired before calling this method
+        """
+        cur_time = time.time()
+        self.__tokens = min(self.__tokens +
+                            (cur_time - self.__last_fill) * self.MAX_RATE,
+                            float(self.MAX_BURST))
+        self.__last_fill = cur_time
+
+        allowed = min(count, int(self.__tokens))
+        self.__tokens -= allowed
+        return allowed
+
     def close(self):  # pylint: disable=no-self-use
         "Close I3Live monitoring object"
         return
 
+    @property
+    def dropped(self):
+        "Number of messages dropped by the rate limiter"
+        return self.__dropped
+
     def send(self, now, bean_name, attrs):
         "Send monitoring data to I3Live"
-        if self.__live_moni is not None:
-            for key in attrs:
-                self.__live_moni.sendMoni("%s*%s+%s" % (self.__name, bean_name,
-                                                        key), attrs[key],
-                                          Prio.ITS, now)
+        self.send_snapshot(now, {bean_name: attrs})
+
+    def send_snapshot(self, now, bean_dict):
+        "Send monitoring data for all beans to I3Live"
+        if self.__live_moni is None:
+            return
+
+        msgs = self.__build_messages(now, bean_dict)
+        with self.__lock:
+            allowed = self.__take_tokens(len(msgs))
+            if allowed < len(msgs):
+                self.__dropped += len(msgs) - allowed
+                del msgs[allowed:]
+            if self.__dropped != self.__reported_drops:
+                msgs.append(("%s*droppedMoni" % (self.__name, ),
+                             self.__dropped, Prio.ITS, now))
+                self.__reported_drops = self.__dropped
+            self.__sent += len(msgs)
+
+        if len(msgs) == 0:  # pylint: disable=len-as-condition
+            return
+
+        send_batch = getattr(self.__live_moni, "sendMoniBatch", None)
+        if send_batch is not None:
+            send_batch(msgs)
+        else:
+            for name, value, prio, msg_time in msgs:
+                self.__live_moni.sendMoni(name, value, prio, msg_time)
+
+    @property
+    def sent(self):
+        "Number of messages sent to I3Live"
+        return self.__sent
 
 
 class MonitorToBoth(object):
     "Send monitoring info to both I3Live and pDAQ"
-    def __init__(self, dirname, basename, live_moni):
+    def __init__(self, dirname, basename, live_moni, writer=None):
         "Create I3Live and pDAQ monitoring objects"
-        self.__file = MonitorToFile(dirname, basename)
+        self.__file = MonitorToFile(dirname, basename, writer=writer)
         self.__live = MonitorToLive(basename, live_moni)
 
     def close(self):
@@ -285,6 +625,11 @@ class MonitorToBoth(object):
         self.__file.send(now, bean_name, attrs)
         self.__live.send(now, bean_name, attrs)
 
+    def send_snapshot(self, now, bean_dict):
+        "Send monitoring data for all beans to both I3Live and a pDAQ file"
+        self.__file.send_snapshot(now, bean_dict)
+        self.__live.send_snapshot(now, bean_dict)
+
 
 class MonitorTask(CnCTask):
     "Monitor all components"
@@ -295,6 +640,9 @@ class MonitorTask(CnCTask):
 
     MONITOR_CNCSERVER = False
 
+    # format of .moni files (see MoniBinary.format_names())
+    MONI_FORMAT = MoniBinary.TEXT_FORMAT
+
     def __init__(self, task_mgr, runset, dashlog, live_moni, run_dir,
                  run_options, period=None):
         if period is None:
@@ -303,6 +651,13 @@ class MonitorTask(CnCTask):
         super(MonitorTask, self).__init__(self.name, task_mgr, dashlog,
                                           self.name, period)
 
+        # all .moni files for this run are written by a single thread
+        if run_dir is not None and RunOption.is_moni_to_file(run_options):
+            encoder = MoniBinary.find_encoder(self.MONI_FORMAT)
+            self.__writer = MoniFileWriter(dashlog, encoder=encoder)
+        else:
+            self.__writer = None
+
         self.__thread_list = self.__create_threads(runset, dashlog, live_moni,
                                                    run_dir, run_options)
 
@@ -315,15 +670,17 @@ class MonitorTask(CnCTask):
                 # refresh MBean info to pick up any new MBeans
                 comp.mbean.reload()
 
-                thread_list[comp] = self.create_thread(comp, run_dir,
-                                                       live_moni, run_options,
-                                                       dashlog)
+                thread_list[comp] \
+                    = self.create_thread(comp, run_dir, live_moni,
+                                         run_options, dashlog,
+                                         snapshot_cache=self.mbean_cache,
+                                         writer=self.__writer)
 
             if self.MONITOR_CNCSERVER:
                 to_file = RunOption.is_moni_to_file(run_options)
                 thread_list["CnCServer"] \
                     = self.__create_moni_thread(runset, run_dir, to_file,
-                                                dashlog)
+                                                dashlog, self.__writer)
 
         return thread_list
 
@@ -343,14 +700,17 @@ class MonitorTask(CnCTask):
                 self.__thread_list[key].start()
 
     @classmethod
-    def create_thread(cls, comp, run_dir, live_moni, run_options, dashlog):
+    def create_thread(cls, comp, run_dir, live_moni, run_options, dashlog,
+                      snapshot_cache=None, writer=None):
         "Create an MBean monitoring thread"
-        return MBeanThread(comp, run_dir, live_moni, run_options, dashlog)
+        return MBeanThread(comp, run_dir, live_moni, run_options, dashlog,
+                           snapshot_cache=snapshot_cache, writer=writer)
 
     @classmethod
-    def __create_moni_thread(cls, runset, run_dir, to_file, dashlog):
+    def __create_moni_thread(cls, runset, run_dir, to_file, dashlog,
+                             writer):
         "Create a monitoring thread"
-        return CnCMoniThread(runset, run_dir, to_file, dashlog)
+        return CnCMoniThread(runset, run_dir, to_file, dashlog, writer=writer)
 
     def close(self):
         "Close everything associated with this task"
@@ -362,6 +722,14 @@ class MonitorTask(CnCTask):
                 if not saved_exc:
                     saved_exc = sys.exc_info()
 
+        # write and sync everything before the run directory is archived
+        if self.__writer is not None:
+            try:
+                self.__writer.stop()
+            except:  # pylint: disable=bare-except
+                if not saved_exc:
+                    saved_exc = sys.exc_info()
+
         if saved_exc:
             reraise_excinfo(saved_exc)
 
@@ -1,15 +1,18 @@
 #!/usr/bin/env python
 "MonitorTask unit tests"
 
+import datetime
 import os
 import tempfile
 import unittest
 import shutil
 
 from DAQClient import BeanTimeoutException
-from LiveImports import Prio
-from MonitorTask import MonitorTask
+from LiveImports import LIVE_IMPORT, MoniClient, MoniPort, Prio
+from MonitorTask import MoniFileWriter, MonitorTask, MonitorToFile, \
+     MonitorToLive
 from RunOption import RunOption
+from moni_stream import moni_stream
 
 from DAQMocks import MockComponent, MockIntervalTimer, MockLiveMoni, \
      MockLogger, MockMBeanClient, MockRunSet, MockTaskManager
@@ -83,7 +86,8 @@ class BadMonitorTask(MonitorTask):
                                              rundir, run_opts)
 
     @classmethod
-    def create_thread(cls, comp, run_dir, live_moni, run_options, dashlog):
+    def create_thread(cls, comp, run_dir, live_moni, run_options, dashlog,
+                      snapshot_cache=None, writer=None):
         return BadCloseThread()
 
 
@@ -127,11 +131,11 @@ class MonitorTaskTest(unittest.TestCase):
                     if isinstance(comp, BadComponent):
                         comp.mbean.clear_conditions()
                     for bnm in comp.mbean.get_bean_names():
+                        attrs = {}
                         for fld in comp.mbean.get_bean_fields(bnm):
-                            live.add_expected(comp.filename + "*" + bnm + "+" +
-                                              fld,
-                                              comp.mbean.get(bnm, fld),
-                                              Prio.ITS)
+                            attrs[fld] = comp.mbean.get(bnm, fld)
+                        live.add_expected(comp.filename + "*" + bnm, attrs,
+                                          Prio.ITS)
 
             for comp in comp_list:
                 if isinstance(comp, BadComponent):
@@ -277,6 +281,86 @@ class MonitorTaskTest(unittest.TestCase):
         self.assertTrue(tsk.open_threads == 0,
                         "%d threads were not closed" % (tsk.open_threads, ))
 
+    def test_file_writer(self):
+        writer = MoniFileWriter()
+
+        now = datetime.datetime(2020, 1, 2, 3, 4, 5, 678901)
+
+        files = []
+        for name in ("foo-1", "bar-0"):
+            files.append(MonitorToFile(self.__temp_dir, name, writer=writer))
+
+        for idx in range(100):
+            for mtf in files:
+                mtf.send(now, "bean%d" % (idx % 3),
+                         {"count": idx, "list": [idx, idx + 1]})
+
+        self.assertTrue(writer.flush(timeout=10), "Writer was not flushed")
+        self.assertEqual(200, writer.written)
+
+        for mtf in files:
+            mtf.close()
+        writer.stop()
+
+        self.assertEqual(0, writer.dropped)
+        self.assertFalse(writer.write(None, "ignored"),
+                         "Stopped writer should not accept records")
+        self.assertEqual(1, writer.dropped)
+
+        for name in ("foo-1", "bar-0"):
+            path = os.path.join(self.__temp_dir, name + ".moni")
+
+            records = list(moni_stream(path))
+            self.assertEqual(200, len(records))
+            for idx in range(100):
+                self.assertEqual((str(now), "bean%d" % (idx % 3), "count",
+                                  idx), records[idx * 2])
+                self.assertEqual((str(now), "bean%d" % (idx % 3), "list",
+                                  [idx, idx + 1]), records[idx * 2 + 1])
+
+    @unittest.skipIf(LIVE_IMPORT, "Requires the stand-in MoniClient")
+    def test_live_batches(self):
+        client = MoniClient("pdaq", "localhost", MoniPort)
+        live = MonitorToLive("stringHub-1", client)
+
+        now = datetime.datetime.now()
+        beans = {
+            "sender": {"NumHitsReceived": 12, "NumReadoutsSent": 3},
+            "stringhub": {"HubId": 1},
+        }
+
+        live.send_snapshot(now, beans)
+
+        self.assertEqual(1, len(client.batches))
+        self.assertEqual(2, client.num_sent)
+        self.assertEqual(2, live.sent)
+
+        batch = sorted(client.batches[0])
+        self.assertEqual([("stringHub-1*sender", beans["sender"], Prio.ITS,
+                           now),
+                          ("stringHub-1*stringhub", beans["stringhub"],
+                           Prio.ITS, now)], batch)
+
+    @unittest.skipIf(LIVE_IMPORT, "Requires the stand-in MoniClient")
+    def test_live_rate_limit(self):
+        client = MoniClient("pdaq", "localhost", MoniPort)
+        live = MonitorToLive("stringHub-1", client)
+
+        now = datetime.datetime.now()
+        beans = {}
+        for idx in range(MonitorToLive.MAX_BURST + 10):
+            beans["bean%03d" % (idx, )] = {"value": idx}
+
+        live.send_snapshot(now, beans)
+
+        self.assertEqual(10, live.dropped)
+
+        # the dropped count is reported to Live after the allowed messages
+        batch = client.batches[-1]
+        self.assertEqual(MonitorToLive.MAX_BURST + 1, len(batch))
+        self.assertEqual(("stringHub-1*droppedMoni", 10, Prio.ITS, now),
+                         batch[-1])
+
 
 if __name__ == '__main__':
     unittest.main()
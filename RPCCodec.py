@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""
+Request/response encodings which can be used in place of XML-RPC by
+RPCClient and RPCServer.  XML-RPC can only send 32-bit integers, so the
+Java components send longs as strings and DAQClient.unfix_value() has to
+walk every result to turn them back into numbers.  The codecs here carry
+64-bit integers natively, and are usually smaller and faster to encode.
+
+A client asks the server for its codecs with 'system.listCodecs' and
+falls back to XML-RPC if the server doesn't answer or doesn't support the
+requested codec.  The server recognizes the encoding from the first byte
+of the request body, so XML-RPC requests are always accepted.
+"""
+
+import json
+
+try:
+    import xmlrpclib as xclient
+except ImportError:
+    import xmlrpc.client as xclient
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class RPCCodecException(Exception):
+    "Problem with an encoded RPC request or response"
+
+
+class RPCCodec(object):
+    "Base class for RPC encodings"
+
+    # name used to negotiate this codec
+    NAME = None
+    # value of the HTTP Content-Type header
+    CONTENT_TYPE = None
+    # True if integers larger than 32 bits are sent as numbers
+    NATIVE_LONGS = False
+
+    def __str__(self):
+        return self.NAME
+
+    def dumps_fault(self, code, message):
+        "Encode a fault response"
+        raise NotImplementedError()
+
+    def dumps_request(self, method, params):
+        "Encode a request"
+        raise NotImplementedError()
+
+    def dumps_response(self, result):
+        "Encode a successful response"
+        raise NotImplementedError()
+
+    def loads_request(self, data):
+        "Decode a request, returning a (method, params) tuple"
+        raise NotImplementedError()
+
+    def loads_response(self, data):
+        "Decode a response, returning the result or raising a Fault"
+        raise NotImplementedError()
+
+    @classmethod
+    def matches(cls, data):
+        "Return True if the request body appears to use this encoding"
+        raise NotImplementedError()
+
+
+class MappingCodec(RPCCodec):
+    """
+    Codec which encodes requests as {"method": name, "params": [...]}
+    and responses as either {"result": value} or
+    {"fault": {"faultCode": code, "faultString": message}}
+    """
+
+    def _dumps(self, obj):
+        "Encode a dictionary"
+        raise NotImplementedError()
+
+    def _loads(self, data):
+        "Decode a dictionary"
+        raise NotImplementedError()
+
+    def dumps_fault(self, code, message):
+        return self._dumps({"fault": {"faultCode": code,
+                                      "faultString": message}})
+
+    def dumps_request(self, method, params):
+        return self._dumps({"method": method, "params": list(params)})
+
+    def dumps_response(self, result):
+        return self._dumps({"result": result})
+
+    def loads_request(self, data):
+        try:
+            req = self._loads(data)
+            return req["method"], tuple(req.get("params", ()))
+        except (KeyError, TypeError, ValueError) as exc:
+            raise RPCCodecException("Bad %s request: %s" % (self.NAME, exc))
+
+    def loads_response(self, data):
+        try:
+            rsp = self._loads(data)
+        except ValueError as exc:
+            raise RPCCodecException("Bad %s response: %s" % (self.NAME, exc))
+
+        if not isinstance(rsp, dict):
+            raise RPCCodecException("Bad %s response %s" % (self.NAME, rsp))
+        if "fault" in rsp:
+            fault = rsp["fault"]
+            raise xclient.Fault(fault.get("faultCode", 0),
+                                fault.get("faultString", str(fault)))
+        if "result" not in rsp:
+            raise RPCCodecException("%s response has no result: %s" %
+                                    (self.NAME, rsp))
+        return rsp["result"]
+
+
+class JSONCodec(MappingCodec):
+    "JSON encoding"
+
+    NAME = "json"
+    CONTENT_TYPE = "application/json"
+    NATIVE_LONGS = True
+
+    def _dumps(self, obj):
+        return json.dumps(obj, separators=(",", ":"),
+                          default=str).encode("utf-8")
+
+    def _loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return json.loads(data)
+
+    @classmethod
+    def matches(cls, data):
+        return data[:1] == b"{"
+
+
+class MsgpackCodec(MappingCodec):
+    "MessagePack encoding (requires the 'msgpack' package)"
+
+    NAME = "msgpack"
+    CONTENT_TYPE = "application/msgpack"
+    NATIVE_LONGS = True
+
+    def _dumps(self, obj):
+        return msgpack.packb(obj, use_bin_type=True, default=str)
+
+    def _loads(self, data):
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except (msgpack.ExtraData, msgpack.FormatError,
+                msgpack.StackError) as exc:
+            raise ValueError(str(exc))
+
+    @classmethod
+    def matches(cls, data):
+        # requests are always encoded as maps with 1 or 2 entries
+        return data[:1] in (b"\x81", b"\x82")
+
+
+class XMLRPCCodec(RPCCodec):
+    "Standard XML-RPC encoding"
+
+    NAME = "xmlrpc"
+    CONTENT_TYPE = "text/xml"
+
+    def dumps_fault(self, code, message):
+        return xclient.dumps(xclient.Fault(code, message),
+                             methodresponse=True).encode("utf-8")
+
+    def dumps_request(self, method, params):
+        return xclient.dumps(tuple(params), method).encode("utf-8")
+
+    def dumps_response(self, result):
+        return xclient.dumps((result, ), methodresponse=True,
+                             allow_none=True).encode("utf-8")
+
+    def loads_request(self, data):
+        params, method = xclient.loads(data)
+        return method, params
+
+    def loads_response(self, data):
+        result = xclient.loads(data)[0]
+        if len(result) == 1:
+            return result[0]
+        return result
+
+    @classmethod
+    def matches(cls, data):
+        return data.lstrip()[:1] == b"<"
+
+
+# alternate codecs, in order of preference
+_CODECS = [JSONCodec()]
+if msgpack is not None:
+    _CODECS.insert(0, MsgpackCodec())
+
+
+def codec_names():
+    "Return the names of all supported non-XML-RPC codecs"
+    return [codec.NAME for codec in _CODECS]
+
+
+def find_codec(name):
+    "Return the codec with this name, or None if it isn't supported"
+    for codec in _CODECS:
+        if codec.NAME == name:
+            return codec
+    return None
+
+
+def request_codec(data):
+    """
+    Return the alternate codec used to encode this request body, or None
+    if it should be handled as XML-RPC
+    """
+    for codec in _CODECS:
+        if codec.matches(data):
+            return codec
+    return None
@@ -23,12 +23,14 @@ from ComponentManager import ComponentManager
 from DAQClient import DAQClientState
 from DAQConfig import DOMNotInConfigException
 from DAQConst import DAQPort
-from DAQLog import DAQLog, FileAppender, LiveSocketAppender, LogSocketServer
+from DAQLog import AsyncAppender, DAQLog, FileAppender, LiveSocketAppender, \
+     LogSocketServer
 from DAQRPC import RPCClient
 from DAQTime import PayloadTime
 from LiveImports import LIVE_IMPORT, MoniClient, MoniPort, Prio
 from RunOption import RunOption
 from RunSetState import RunSetState
+from RunTiming import RunTimer, write_run_timing
 from TaskManager import TaskManager
 from UniqueID import UniqueID
 from i3helper import Comparable, reraise_excinfo
@@ -596,6 +598,9 @@ class RunData(object):
         self.__finished = False
         self.__task_mgr = None
 
+        # fetch times of the MBean snapshots used for event counts
+        self.__snapshot_times = {}
+
         if not RunOption.is_log_to_file(self.__run_options):
             self.__log_dir = None
             self.__run_dir = None
@@ -693,13 +698,13 @@ class RunData(object):
                 raise RunSetException("Run directory has not been specified")
             app = FileAppender("dashlog", os.path.join(self.__run_dir,
                                                        "dash.log"))
-            log.add_appender(app)
+            log.add_appender(AsyncAppender(app))
             added = True
 
         if RunOption.is_log_to_live(self.__run_options):
             app = LiveSocketAppender("localhost", DAQPort.I3LIVE_ZMQ,
                                      priority=Prio.EMAIL)
-            log.add_appender(app)
+            log.add_appender(AsyncAppender(app))
             added = True
 
         if not added:
@@ -779,6 +784,12 @@ class RunData(object):
         if no_physics:
             self.__add_rate(self.__first_pay_time, 1)
 
+    def flush_log(self):
+        "Wait until all queued dash.log messages have been written"
+        flush = getattr(self.__dashlog, "flush", None)
+        if flush is not None:
+            flush(AsyncAppender.CLOSE_SECS)
+
     def get_event_counts(self, run_num, run_set):
         """
         Return the 'standard' monitoring data for the run, including
@@ -1142,6 +1153,9 @@ class RunData(object):
         # cache for eventBuilder object
         evt_bldr = None
 
+        # list of (component, bean name, EventData value, fetch time) tuples
+        event_data = []
+
         # start threads to query components
         tgroup = ComponentGroup(OpGetSingleBeanField)
         for comp in run_set.components:
@@ -1152,15 +1166,23 @@ class RunData(object):
                 # save eventBuilder in case we need to get the first event time
                 evt_bldr = comp
 
-                tgroup.run_thread(comp, ("backEnd", "EventData"),
-                                  logger=self)
+                bean_names = ("backEnd", )
             elif comp.is_component("secondaryBuilders"):
-                for bldr in ("moni", "sn", "tcal"):
-                    tgroup.run_thread(comp, (bldr + "Builder", "EventData"),
-                                      logger=self)
+                bean_names = ("moniBuilder", "snBuilder", "tcalBuilder")
+            else:
+                continue
+
+            # use MonitorTask's values if they haven't been used yet
+            cached = self.__get_snapshot_data(comp, bean_names)
+            if cached is not None:
+                event_data += cached
+                continue
+
+            for bean in bean_names:
+                tgroup.run_thread(comp, (bean, "EventData"), logger=self)
         tgroup.wait(wait_secs=8, reps=10)
 
-        # process results
+        # gather results
         for thrd, result in list(tgroup.results(full_result=True).items()):
             comp = thrd.component
             if not ComponentGroup.has_value(result, full_result=True):
@@ -1168,7 +1190,11 @@ class RunData(object):
                            (comp.fullname, result))
                 continue
 
-            evt_data = result.value
+            event_data.append((comp, result.arguments[0], result.value,
+                               None))
+
+        # process results
+        for comp, bean_name, evt_data, fetch_time in event_data:
             if not isinstance(evt_data, list) and \
                not isinstance(evt_data, tuple):
                 self.error("Got bad event data (%s) <%s>" %
@@ -1190,7 +1216,10 @@ class RunData(object):
                     return None
 
                 physics_count = int(evt_data[1])
-                wall_time = datetime.datetime.utcnow()
+                if fetch_time is None:
+                    wall_time = datetime.datetime.utcnow()
+                else:
+                    wall_time = datetime.datetime.utcfromtimestamp(fetch_time)
                 last_pay_time = int(evt_data[2])
             elif comp.is_component("secondaryBuilders"):
                 if len(evt_data) != 3:
@@ -1206,17 +1235,16 @@ class RunData(object):
                                    "!= run#%d)" % (run_num, self.__run_number))
                     return None
 
-                bldr_name = result.arguments[0]
                 num = evt_data[1]
                 now = evt_data[2]
 
-                if bldr_name.startswith("moni"):
+                if bean_name.startswith("moni"):
                     moni_count = num
                     moni_time = now
-                elif bldr_name.startswith("sn"):
+                elif bean_name.startswith("sn"):
                     sn_count = num
                     sn_time = now
-                elif bldr_name.startswith("tcal"):
+                elif bean_name.startswith("tcal"):
                     tcal_count = num
                     tcal_time = now
 
@@ -1237,6 +1265,31 @@ class RunData(object):
                                    moni_count, moni_time, sn_count, sn_time,
                                    tcal_count, tcal_time, add_rate=True)
 
+    def __get_snapshot_data(self, comp, bean_names):
+        """
+        Return a list of (component, bean name, EventData value, fetch time)
+        tuples from the shared MBean snapshot, or None if there's no snapshot
+        newer than the one used by the previous update
+        """
+        cache = getattr(self.__task_mgr, "mbean_cache", None)
+        if cache is None:
+            return None
+
+        snap = cache.fresh_snapshot(comp,
+                                    newer_than=self.__snapshot_times.get(comp))
+        if snap is None:
+            return None
+
+        data = []
+        for bean in bean_names:
+            attrs = snap.fields(bean, ("EventData", ))
+            if attrs is None:
+                return None
+            data.append((comp, bean, attrs["EventData"], snap.fetch_time))
+
+        self.__snapshot_times[comp] = snap.fetch_time
+        return data
+
     def update_event_counts(self, physics_count, wall_time, first_pay_time,
                             evt_pay_time, moni_count, moni_time, sn_count,
                             sn_time, tcal_count, tcal_time, add_rate=False):
@@ -1328,6 +1381,11 @@ class RunSet(object):
     # number of days before file expiration to start sending alerts
     LEAPSECOND_FILE_EXPIRY = 14
 
+    # shortest and longest pauses between state polls while connecting
+    # and configuring components
+    MIN_POLL_SECS = 0.05
+    MAX_POLL_SECS = 1.0
+
     def __init__(self, parent, cfg, runset, logger):
         """
         RunSet constructor:
@@ -1354,6 +1412,11 @@ class RunSet(object):
         self.__run_data = None
         self.__comp_log = {}
 
+        # seconds spent in each stage of building this runset
+        self.__build_times = {}
+        # timing of the latest start, stop and switch
+        self.__timings = {}
+
         self.__stopping = None
         self.__stop_lock = threading.Lock()
 
@@ -1377,7 +1440,7 @@ class RunSet(object):
         return set_str
 
     def __attempt_to_stop(self, src_set, other_set, new_state, src_op,
-                          timeout_secs):
+                          timeout_secs, timer):
         self.__state = new_state
 
         # self.__run_data is guaranteed to be set here
@@ -1388,16 +1451,21 @@ class RunSet(object):
             self.__run_data.error('%s: Forcing %d component%s to stop: %s' %
                                   (str(self), len(full_set), plural, cstr))
 
+        comp_times = timer.component_times(src_op.name)
+
         # stop sources in parallel
         #
-        ComponentGroup.run_simple(src_op, src_set, (), self.__run_data,
-                                  report_errors=True)
+        with timer.span(src_op.name + ":sources"):
+            ComponentGroup.run_simple(src_op, src_set, (), self.__run_data,
+                                      report_errors=True, timings=comp_times)
 
         # stop non-sources in order
         #
-        for comp in other_set:
-            ComponentGroup.run_simple(src_op, (comp, ), (), self.__run_data,
-                                      report_errors=True)
+        with timer.span(src_op.name + ":others"):
+            for comp in other_set:
+                ComponentGroup.run_simple(src_op, (comp, ), (),
+                                          self.__run_data, report_errors=True,
+                                          timings=comp_times)
 
         # make sure we run at least once
         if timeout_secs == 0:
@@ -1409,28 +1477,33 @@ class RunSet(object):
         cur_secs = time.time()
         end_secs = cur_secs + timeout_secs
 
-        # pylint: disable=len-as-condition
-        while (len(src_set) > 0 or len(other_set) > 0) and cur_secs < end_secs:
-            changed = self.__stop_components(src_set, other_set, conn_dict)
-            if not changed:
-                #
-                # hmmm ... we may be hanging
-                #
-                time.sleep(1)
-            elif len(src_set) > 0 or len(other_set) > 0:
-                #
-                # one or more components must have stopped
-                #
-                new_secs = time.time()
-                if msg_secs is None or \
-                   new_secs < (msg_secs + self.WAIT_MSG_PERIOD):
-                    wait_str = self.__connection_string(src_set + other_set,
-                                                        conn_dict)
-                    self.__run_data.info('%s: Waiting for %s %s' %
-                                         (str(self), self.__state, wait_str))
-                msg_secs = new_secs
-
-            cur_secs = time.time()
+        with timer.span(src_op.name + ":wait"):
+            # pylint: disable=len-as-condition
+            while (len(src_set) > 0 or len(other_set) > 0) and \
+              cur_secs < end_secs:
+                changed = self.__stop_components(src_set, other_set,
+                                                 conn_dict)
+                if not changed:
+                    #
+                    # hmmm ... we may be hanging
+                    #
+                    time.sleep(1)
+                elif len(src_set) > 0 or len(other_set) > 0:
+                    #
+                    # one or more components must have stopped
+                    #
+                    new_secs = time.time()
+                    if msg_secs is None or \
+                       new_secs < (msg_secs + self.WAIT_MSG_PERIOD):
+                        wait_str = \
+                          self.__connection_string(src_set + other_set,
+                                                   conn_dict)
+                        self.__run_data.info('%s: Waiting for %s %s' %
+                                             (str(self), self.__state,
+                                              wait_str))
+                    msg_secs = new_secs
+
+                cur_secs = time.time()
 
         return conn_dict
 
@@ -1853,6 +1926,9 @@ class RunSet(object):
             return
 
         if run_data.spade_directory is not None:
+            # make sure dash.log is complete before it's archived
+            run_data.flush_log()
+
             if self.__jade_thread is not None:
                 if self.__jade_thread.is_alive():
                     try:
@@ -1892,26 +1968,44 @@ class RunSet(object):
         ComponentGroup.run_simple(OpResetLogging, self.__set, (),
                                   self.__logger, report_errors=False)
 
-    def __start_components(self, quiet):
+    def __save_timing(self, run_data, timer):
+        """
+        Remember the timing for this transition and write the timing
+        for this runset to the run directory
+        """
+        timer.finish()
+        self.__timings[timer.transition] = timer.to_dict()
+
+        if run_data is None:
+            return
+
+        try:
+            write_run_timing(run_data.run_directory, self.timing())
+        except:  # pylint: disable=bare-except
+            run_data.exception("Cannot write run timing")
+
+    def __start_components(self, quiet, timer):
         log_host = ip.get_local_address()
 
         old_servers = self.__comp_log.copy()
 
-        tgroup = ComponentGroup(OpConfigureLogging)
-        for comp in self.__set:
-            new_log \
-              = self.create_component_log(self.__run_data.run_directory, comp,
-                                          None, quiet=quiet)
-            self.__comp_log[comp] = new_log
-            if new_log.port is None:
-                raise Exception("Newly created %s logger has no port number" %
-                                (comp.fullname, ))
+        with timer.span("startLogging"):
+            tgroup = ComponentGroup(OpConfigureLogging)
+            for comp in self.__set:
+                new_log \
+                  = self.create_component_log(self.__run_data.run_directory,
+                                              comp, None, quiet=quiet)
+                self.__comp_log[comp] = new_log
+                if new_log.port is None:
+                    raise Exception("Newly created %s logger has no port"
+                                    " number" % (comp.fullname, ))
 
-            tgroup.run_thread(comp, (log_host, new_log.port, None, None),
-                              logger=self.__run_data)
+                tgroup.run_thread(comp, (log_host, new_log.port, None, None),
+                                  logger=self.__run_data)
 
-        tgroup.wait()
-        tgroup.report_errors(self.__run_data, "startLogging")
+            tgroup.wait()
+            timer.component_times("startLogging").update(tgroup.times())
+            tgroup.report_errors(self.__run_data, "startLogging")
 
         self.__stop_log_servers(old_servers)
 
@@ -1928,41 +2022,49 @@ class RunSet(object):
 
         # start non-sources
         #
-        self.__start_set("NonHubs", other_set)
+        self.__start_set("NonHubs", other_set, timer)
 
         # start sources
         #
-        self.__start_set("Hubs", src_set)
+        self.__start_set("Hubs", src_set, timer)
 
-        # start thread to find latest first time from hubs
-        #
-        good_thread = FirstGoodTimeThread(src_set[:], other_set[:], self,
-                                          self.__run_data, self.__run_data)
-        good_thread.start()
+        with timer.span("firstGoodTime"):
+            # start thread to find latest first time from hubs
+            #
+            good_thread = FirstGoodTimeThread(src_set[:], other_set[:], self,
+                                              self.__run_data,
+                                              self.__run_data)
+            good_thread.start()
 
-        # wait up to 30 seconds for the thread to finish
-        #
-        for _ in range(300):
-            if good_thread.finished:
-                break
-            time.sleep(0.1)
+            # wait up to 30 seconds for the thread to finish
+            #
+            for _ in range(300):
+                if good_thread.finished:
+                    break
+                time.sleep(0.1)
 
         if not good_thread.finished:
             raise RunSetException("Could not get runset#%s latest first time" %
                                   self.__id)
 
-    def __start_set(self, set_name, components):
+    def __start_set(self, set_name, components, timer):
         """
         Start a set of components and verify that they are running
         """
         rstart = datetime.datetime.now()
 
         op_data = (self.__run_data.run_number, self.__run_data.dom_mode)
-        ComponentGroup.run_simple(OpStartRun, components, op_data,
-                                  self.__run_data, report_errors=True)
-
-        self.__wait_for_state_change(self.__run_data, (RunSetState.RUNNING, ),
-                                     timeout_secs=30, components=components)
+        with timer.span("start" + set_name):
+            ComponentGroup.run_simple(OpStartRun, components, op_data,
+                                      self.__run_data, report_errors=True,
+                                      timings=timer.component_times(
+                                          "start" + set_name))
+
+        with timer.span("wait" + set_name):
+            self.__wait_for_state_change(self.__run_data,
+                                         (RunSetState.RUNNING, ),
+                                         timeout_secs=30,
+                                         components=components)
 
         bad_states = self.__check_state(RunSetState.RUNNING, components)
         if len(bad_states) > 0:  # pylint: disable=len-as-condition
@@ -2046,14 +2148,24 @@ class RunSet(object):
         ComponentGroup.run_simple(OpStopLocalLogger, loglist, servers,
                                   self.__logger, report_errors=True)
 
-    def __stop_run_internal(self, run_data, timeout=20):
+        # report any log messages which were lost
+        for comp in loglist:
+            dropped = getattr(servers[comp], "dropped", 0)
+            if dropped > 0:
+                self.__logger.error("Log server for %s dropped %d of %d"
+                                    " messages" %
+                                    (comp.fullname, dropped,
+                                     servers[comp].received))
+
+    def __stop_run_internal(self, run_data, timer, timeout=20):
         """
         Stop all components in the runset
         Return list of components which did not stop
         """
         try:
             # stop monitoring, watchdog, etc.
-            run_data.stop_tasks()
+            with timer.span("stopTasks"):
+                run_data.stop_tasks()
         except:  # pylint: disable=bare-except
             run_data.exception("Cannot stop tasks")
 
@@ -2091,7 +2203,7 @@ class RunSet(object):
                     op_timeout = int(timeout * .25)
 
                 self.__attempt_to_stop(src_set, other_set, rs_state, comp_op,
-                                       op_timeout)
+                                       op_timeout, timer)
 
                 # pylint: disable=len-as-condition
                 if len(src_set) == 0 and len(other_set) == 0:
@@ -2153,6 +2265,12 @@ class RunSet(object):
             doms.append(args)
         return (doms, not_found)
 
+    def __log_waiting(self, state, waitlist):
+        "Log the components which have not finished the current stage"
+        wait_str = ComponentManager.format_component_list(waitlist)
+        self.__logger.info('%s: Waiting for %s %s' %
+                           (str(self), state, wait_str))
+
     def __wait_for_state_change(self, logger, valid_states,
                                 timeout_secs=TIMEOUT_SECS, components=None):
         """
@@ -2247,6 +2365,14 @@ class RunSet(object):
 
         return conn_map
 
+    @property
+    def build_times(self):
+        """
+        Return a dictionary mapping each runset build stage to the number
+        of seconds it took
+        """
+        return self.__build_times.copy()
+
     @property
     def client_statistics(self):
         "Return RPC statistics for server->client calls"
@@ -2329,6 +2455,116 @@ class RunSet(object):
                       self.__bad_state_string(bad_states)
             raise RunSetException(errmsg)
 
+    def connect_and_configure(self, conn_map, connect_secs=20,
+                              configure_secs=60):
+        """
+        Connect all components and configure each one as soon as it
+        reports that it is connected, rather than waiting for the entire
+        runset to connect first.  `connect_secs` and `configure_secs` are
+        the number of seconds to wait for each stage, renewed each time
+        any component changes state.
+        """
+        self.__state = RunSetState.CONNECTING
+
+        start = time.time()
+        ComponentGroup.run_simple(OpConnect, self.__set, conn_map,
+                                  self.__logger, report_errors=True)
+
+        connecting = self.__set[:]
+        configuring = []
+        cfg_group = ComponentGroup(OpConfigureComponent)
+        cfg_data = (self.config_name, )
+
+        connected_secs = None
+        end_secs = time.time() + connect_secs
+        poll_secs = self.MIN_POLL_SECS
+        while len(connecting) + len(configuring) > 0 and \
+          time.time() < end_secs:
+            states = ComponentGroup.run_simple(OpGetState,
+                                               connecting + configuring, (),
+                                               self.__logger)
+
+            new_connected = False
+            new_ready = False
+            found_error = False
+            for comp in connecting + configuring:
+                if comp not in states or \
+                   not ComponentGroup.has_value(states[comp]):
+                    continue
+
+                state_str = str(states[comp])
+                if state_str.upper() == "ERROR":
+                    self.__logger.error("!!! %s is in ERROR state" %
+                                        comp.fullname)
+                    found_error = True
+                    break
+
+                if comp in connecting and \
+                   state_str == RunSetState.CONNECTED:
+                    # configure this component while others are connecting
+                    connecting.remove(comp)
+                    configuring.append(comp)
+                    cfg_group.run_thread(comp, cfg_data, logger=self.__logger)
+                    self.__state = RunSetState.CONFIGURING
+                    new_connected = True
+                elif comp in configuring and \
+                   state_str == RunSetState.READY:
+                    configuring.remove(comp)
+                    new_ready = True
+
+            if connected_secs is None and \
+               len(connecting) == 0:  # pylint: disable=len-as-condition
+                connected_secs = time.time() - start
+
+            # if any component encounters an error, give up
+            if found_error:
+                break
+
+            if new_connected or new_ready:
+                # something changed, print new 'Waiting' messages
+                if new_connected and \
+                   len(connecting) > 0:  # pylint: disable=len-as-condition
+                    self.__log_waiting(RunSetState.CONNECTING, connecting)
+                if new_ready and \
+                   len(configuring) > 0:  # pylint: disable=len-as-condition
+                    self.__log_waiting(RunSetState.CONFIGURING, configuring)
+
+                # renew the timeout, using the configuration timeout once
+                # every component is connected
+                if len(connecting) > 0:  # pylint: disable=len-as-condition
+                    end_secs = time.time() + connect_secs
+                else:
+                    end_secs = time.time() + configure_secs
+                poll_secs = self.MIN_POLL_SECS
+            else:
+                time.sleep(poll_secs)
+                poll_secs = min(poll_secs * 2, self.MAX_POLL_SECS)
+
+        cfg_group.wait()
+        cfg_group.report_errors(self.__logger, OpConfigureComponent.name)
+
+        if connected_secs is None:
+            connected_secs = time.time() - start
+        self.__build_times["connect"] = connected_secs
+        self.__build_times["configure"] = time.time() - start - connected_secs
+
+        if len(connecting) > 0:  # pylint: disable=len-as-condition
+            bad_states = self.__check_state(RunSetState.CONNECTED,
+                                            components=connecting)
+            if len(bad_states) > 0:  # pylint: disable=len-as-condition
+                errmsg = "Could not connect %s" % \
+                  self.__bad_state_string(bad_states)
+                raise RunSetException(errmsg)
+
+        bad_states = self.__check_state(RunSetState.READY)
+        if len(bad_states) > 0:  # pylint: disable=len-as-condition
+            msg = "Could not configure %s" % \
+                  self.__bad_state_string(bad_states)
+            self.__logger.error(msg)
+            raise RunSetException(msg)
+
+        self.__configured = True
+
     @classmethod
     def create_component_log(cls, run_dir, comp, port, quiet=True):
         if not os.path.exists(run_dir):
@@ -2811,6 +3047,10 @@ class RunSet(object):
         "Return RPC statistics for client->server calls"
         return self.__parent.server_statistics()
 
+    def set_build_time(self, stage, secs):
+        "Record the number of seconds spent in one runset build stage"
+        self.__build_times[stage] = secs
+
     def set_order(self, conn_map, logger):
         "Set the order in which components are started/stopped"
         # pylint: disable=len-as-condition
@@ -2914,22 +3154,42 @@ class RunSet(object):
             raise RunSetException("Cannot start runset from state \"%s\"" %
                                   self.__state)
 
-        self.__run_data = self.create_run_data(run_num, cluster_config,
-                                               run_options, version_info,
-                                               jade_dir, copy_dir, log_dir)
+        timer = RunTimer("start", run_num)
+        run_data = None
+        try:
+            with timer.span("createRunData"):
+                run_data = self.create_run_data(run_num, cluster_config,
+                                                run_options, version_info,
+                                                jade_dir, copy_dir, log_dir)
+                self.__run_data = run_data
 
-        # record the earliest possible start time
-        #
-        start_time = datetime.datetime.now()
+            # record the earliest possible start time
+            #
+            start_time = datetime.datetime.now()
 
-        self.__run_data.connect_to_live()
-        self.__start_components(quiet)
-        self.finish_setup(self.__run_data, start_time)
+            with timer.span("connectToLive"):
+                self.__run_data.connect_to_live()
+            with timer.span("startComponents"):
+                self.__start_components(quiet, timer)
+            with timer.span("finishSetup"):
+                self.finish_setup(self.__run_data, start_time)
+        finally:
+            self.__save_timing(run_data, timer)
 
     @property
     def state(self):
         return self.__state
 
+    def timing(self):
+        """
+        Return a dictionary containing the build stage times and the
+        timing of the latest start, stop and switch
+        """
+        timing = {"build": self.__build_times.copy()}
+        for transition, tdict in self.__timings.items():
+            timing[transition] = tdict
+        return timing
+
     def status(self):
         """
         Return a dictionary of components in the runset
@@ -2973,8 +3233,10 @@ class RunSet(object):
 
             self.__stopping = caller_name
 
+        timer = RunTimer("stop", run_data.run_number)
         try:
-            waitlist = self.__stop_run_internal(run_data, timeout=timeout)
+            waitlist = self.__stop_run_internal(run_data, timer,
+                                                timeout=timeout)
         except:
             waitlist = []
             had_error = True
@@ -2988,6 +3250,8 @@ class RunSet(object):
                                      "" if len(waitlist) == 1 else "s",
                                      ", ".join(str(obj) for obj in waitlist)))
                 had_error = True
+            # timing must be written before the run directory is queued
+            self.__save_timing(run_data, timer)
             try:
                 self.__finish_stop(run_data, caller_name, had_error=had_error)
             finally:
@@ -3110,21 +3374,28 @@ class RunSet(object):
             raise RunSetException("RunSet #%s has already switched to run %s" %
                                   (self.__id, new_num))
 
+        timer = RunTimer("switch", new_num)
+
         # create new run data object
         #
-        new_data = self.__run_data.clone(self, new_num)
-        new_data.connect_to_live()
+        with timer.span("createRunData"):
+            new_data = self.__run_data.clone(self, new_num)
+        with timer.span("connectToLive"):
+            new_data.connect_to_live()
 
         new_data.error("Switching to run %d..." % new_data.run_number)
 
         # switch logs to new daqrun directory before switching components
         #
-        for comp, logger in list(self.__comp_log.items()):
-            self.switch_component_log(logger, new_data.run_directory, comp)
+        with timer.span("switchLogs"):
+            for comp, logger in list(self.__comp_log.items()):
+                self.switch_component_log(logger, new_data.run_directory,
+                                          comp)
 
         try:
             # stop monitoring, watchdog, etc.
-            self.__run_data.stop_tasks()
+            with timer.span("stopTasks"):
+                self.__run_data.stop_tasks()
         except:  # pylint: disable=bare-except
             self.__run_data.exception("Cannot stop tasks")
 
@@ -3136,40 +3407,44 @@ class RunSet(object):
         #
         start_time = datetime.datetime.now()
 
-        # switch builders first
-        #
-        for comp in bldr_set:
-            comp.switch_to_new_run(new_data.run_number)
+        comp_times = timer.component_times(OpSwitchRun.name)
 
-        # switch non-builders in order
+        # switch builders first, then non-builders in order
         #
-        for comp in middle_set:
-            comp.switch_to_new_run(new_data.run_number)
+        for span_name, comp_list in (("switchBuilders", bldr_set),
+                                     ("switchOthers", middle_set)):
+            with timer.span(span_name):
+                for comp in comp_list:
+                    comp_start = time.time()
+                    comp.switch_to_new_run(new_data.run_number)
+                    comp_times[comp] = time.time() - comp_start
 
         # switch sources in parallel
         #
-        ComponentGroup.run_simple(OpSwitchRun, src_set,
-                                  (new_data.run_number, ), self.__run_data,
-                                  report_errors=True)
+        with timer.span("switchSources"):
+            ComponentGroup.run_simple(OpSwitchRun, src_set,
+                                      (new_data.run_number, ), self.__run_data,
+                                      report_errors=True, timings=comp_times)
 
         # wait for builders to finish switching
         #
         bldr_sleep = 0.5
         bldr_max_sleep = 30   # wait up to 30 seconds
-        for i in range(int(bldr_max_sleep / bldr_sleep)):
-            for comp in bldr_set:
-                num = comp.get_run_number()
-                if num == new_data.run_number:
-                    bldr_set.remove(comp)
-
-            if len(bldr_set) == 0:  # pylint: disable=len-as-condition
-                break
+        with timer.span("waitBuilders"):
+            for i in range(int(bldr_max_sleep / bldr_sleep)):
+                for comp in bldr_set:
+                    num = comp.get_run_number()
+                    if num == new_data.run_number:
+                        bldr_set.remove(comp)
+
+                if len(bldr_set) == 0:  # pylint: disable=len-as-condition
+                    break
 
-            if i > 0 and i % 10 == 0:
-                self.__run_data.error("Waiting for builders to switch"
-                                      " (after %.1f seconds): %s" %
-                                      ((i * bldr_sleep), bldr_set))
-            time.sleep(bldr_sleep)
+                if i > 0 and i % 10 == 0:
+                    self.__run_data.error("Waiting for builders to switch"
+                                          " (after %.1f seconds): %s" %
+                                          ((i * bldr_sleep), bldr_set))
+                time.sleep(bldr_sleep)
 
         # from this point, cache any failures until the end
         saved_exc = None
@@ -3195,7 +3470,8 @@ class RunSet(object):
         # finish new run data setup
         #
         try:
-            self.finish_setup(new_data, start_time)
+            with timer.span("finishSetup"):
+                self.finish_setup(new_data, start_time)
         except:  # pylint: disable=bare-except
             if saved_exc is None:
                 saved_exc = sys.exc_info()
@@ -3232,6 +3508,8 @@ class RunSet(object):
             if not saved_exc:
                 saved_exc = sys.exc_info()
 
+        self.__save_timing(new_data, timer)
+
         if saved_exc:
             reraise_excinfo(saved_exc)
 
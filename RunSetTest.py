@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import numbers
+import time
 import unittest
 
 from ComponentManager import ComponentManager
@@ -9,6 +10,7 @@ from DAQTime import PayloadTime
 from LiveImports import LIVE_IMPORT, Prio
 from RunOption import RunOption
 from RunSet import ConnectionException, RunData, RunSet, RunSetException
+from RunSetState import RunSetState
 from locate_pdaq import set_pdaq_config_dir
 from scmversion import get_scmversion_str
 
@@ -1087,6 +1089,125 @@ class TestRunSet(unittest.TestCase):
         self.__stop_run(runset, run_num, moni_client, components=comp_list,
                         logger=logger)
 
+    def test_run_timing(self):
+        comp_list = self.__build_comp_list(("oneHub", "two", "three"))
+        run_config = FakeRunConfig(None, "XXXrunCfgXXX")
+        logger = MockLogger('foo#0')
+
+        moni_client = FakeMoniClient()
+
+        runset = MyRunSet(MyParent(), run_config, comp_list, logger,
+                          moni_client)
+
+        runset.configure()
+
+        run_num = 100
+        clu_cfg = FakeCluster("foo-cluster")
+
+        self.__add_hub_mbeans(comp_list)
+
+        self.__start_run(runset, run_num, run_config, clu_cfg,
+                         components=comp_list, logger=logger)
+
+        self.__stop_run(runset, run_num, moni_client, components=comp_list,
+                        logger=logger)
+
+        timing = runset.timing()
+        self.assertTrue("build" in timing)
+        for transition in ("start", "stop"):
+            self.assertTrue(transition in timing,
+                            "Missing %s timing" % (transition, ))
+            tdict = timing[transition]
+            self.assertEqual(run_num, tdict["run_number"])
+            self.assertTrue(tdict["total_secs"] >= 0.0)
+            for span in tdict["spans"]:
+                self.assertTrue(span["secs"] >= 0.0,
+                                "Unfinished %s span %s" % (transition, span))
+
+        names = [span["name"] for span in timing["start"]["spans"]]
+        for name in ("startComponents", "startNonHubs", "startHubs"):
+            self.assertTrue(name in names, "Missing start span " + name)
+
+        start_times = timing["start"]["components"]["startHubs"]
+        self.assertEqual([comp_list[0].fullname], list(start_times.keys()))
+
+        stop_times = timing["stop"]["components"]["StopRun"]
+        self.assertEqual(len(comp_list), len(stop_times))
+
+    def test_connect_and_configure(self):
+        comp_list = self.__build_comp_list(("oneHub", "two", "three"))
+        run_config = FakeRunConfig(None, "XXXrunCfgXXX")
+        logger = MockLogger('foo#0')
+
+        # one component takes a few polls to finish configuring
+        comp_list[0].configure_wait = 3
+
+        runset = MyRunSet(MyParent(), run_config, comp_list, logger,
+                          FakeMoniClient())
+
+        # the number of progress messages depends on thread timing
+        waiting = []
+        logger.info = waiting.append
+
+        runset.connect_and_configure({})
+
+        # the slow component is listed until it is the last one left
+        prefix = "RunSet #%d (configuring): Waiting for configuring " % \
+            (runset.id, )
+        self.assertTrue(len(waiting) > 0, "No 'Waiting for' messages")
+        for msg in waiting:
+            self.assertTrue(msg.startswith(prefix + "oneHub#1"),
+                            "Unexpected message: " + msg)
+        self.assertEqual(prefix + "oneHub#1", waiting[-1])
+
+        self.assertTrue(runset.configured())
+        self.assertEqual(str(runset), 'RunSet #%d (%s)' %
+                         (runset.id, "ready"))
+        self.assertTrue(self.__is_comp_list_configured(comp_list),
+                        'Components should be configured')
+
+        times = runset.build_times
+        for stage in ("connect", "configure"):
+            self.assertTrue(stage in times, "Missing %s time" % (stage, ))
+            self.assertTrue(times[stage] >= 0.0)
+
+        logger.check_status(10)
+
+    def test_connect_and_configure_error(self):
+        comp_list = self.__build_comp_list(("oneHub", "two"))
+        run_config = FakeRunConfig(None, "XXXrunCfgXXX")
+        logger = MockLogger('foo#0')
+
+        # one component connects in the same poll where the other fails
+        comp_list[1].set_monitor_state(RunSetState.ERROR)
+
+        runset = MyRunSet(MyParent(), run_config, comp_list, logger,
+                          FakeMoniClient())
+
+        logger.add_expected_exact("!!! %s is in ERROR state" %
+                                  comp_list[1].fullname)
+        logger.add_expected_exact("Failed to transition to %s: %s[%s]" %
+                                  (RunSetState.CONNECTED, RunSetState.ERROR,
+                                   comp_list[1].fullname))
+
+        start = time.time()
+        try:
+            runset.connect_and_configure({}, connect_secs=5,
+                                         configure_secs=5)
+            self.fail("connect_and_configure() should have failed")
+        except RunSetException as rse:
+            self.assertEqual("Could not connect %s[%s]" %
+                             (RunSetState.ERROR, comp_list[1].fullname),
+                             str(rse))
+        elapsed = time.time() - start
+
+        # the error should end the wait rather than renewing the timeout
+        self.assertTrue(elapsed < 2.0, "Waited %.2fs for a component in"
+                        " ERROR state" % (elapsed, ))
+        self.assertFalse(runset.configured())
+
+        logger.check_status(10)
+
     def test_short_stop_hang(self):
         comp_list = self.__build_comp_list(("oneHub", "two", "three"))
         run_config = FakeRunConfig(None, "XXXrunCfgXXX")
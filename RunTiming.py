@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+Timing of the phases of a run transition (start, stop or switch) and of
+each component's RPC calls during those phases
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+class RunTimer(object):
+    """
+    Record the start time and duration of each phase ("span") of a run
+    transition, along with the number of seconds each component took to
+    answer the RPC calls made during a phase.
+    """
+
+    # name of the file written to the run directory
+    FILENAME = "run-timing.json"
+
+    def __init__(self, transition, run_num):
+        self.__transition = transition
+        self.__run_num = run_num
+
+        self.__start = time.time()
+        self.__total = None
+
+        self.__lock = threading.Lock()
+        self.__spans = []
+        self.__depth = 0
+        self.__components = {}
+
+    def __str__(self):
+        if self.__total is None:
+            tstr = "active"
+        else:
+            tstr = "%.3fs" % self.__total
+        return "RunTimer[%s run %s, %d spans, %s]" % \
+            (self.__transition, self.__run_num, len(self.__spans), tstr)
+
+    def component_times(self, name):
+        """
+        Return the dictionary which holds each component's RPC times for
+        the phase `name`, suitable for ComponentGroup.run_simple()'s
+        `timings` argument
+        """
+        with self.__lock:
+            if name not in self.__components:
+                self.__components[name] = {}
+            return self.__components[name]
+
+    def finish(self):
+        "Note that the transition has finished"
+        self.__total = time.time() - self.__start
+
+    @property
+    def run_number(self):
+        return self.__run_num
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """
+        Time the enclosed block of code.  The number of seconds is not
+        recorded until the block finishes.
+        """
+        start = time.time()
+        with self.__lock:
+            depth = self.__depth
+            self.__depth += 1
+            entry = {
+                "name": name,
+                "offset": start - self.__start,
+                "depth": depth,
+            }
+            self.__spans.append(entry)
+        try:
+            yield entry
+        finally:
+            with self.__lock:
+                entry["secs"] = time.time() - start
+                self.__depth -= 1
+
+    def slowest(self, name, count=5):
+        """
+        Return a list of (component name, seconds) pairs for the slowest
+        components in phase `name`
+        """
+        with self.__lock:
+            times = self.__components.get(name, {})
+            pairs = [(str(comp), secs) for comp, secs in times.items()]
+        pairs.sort(key=lambda pair: pair[1], reverse=True)
+        return pairs[:count]
+
+    def to_dict(self):
+        "Return the timing data as a dictionary"
+        with self.__lock:
+            components = {}
+            for name, times in self.__components.items():
+                components[name] = {getattr(comp, "fullname", str(comp)): secs
+                                     for comp, secs in times.items()}
+            timing = {
+                "transition": self.__transition,
+                "run_number": self.__run_num,
+                "start_time": self.__start,
+                "spans": [entry.copy() for entry in self.__spans],
+                "components": components,
+            }
+        # XML-RPC cannot send None, so leave out unfinished values
+        if self.__total is not None:
+            timing["total_secs"] = self.__total
+        return timing
+
+    @property
+    def total(self):
+        "Return the total number of seconds (None if not finished)"
+        return self.__total
+
+    @property
+    def transition(self):
+        return self.__transition
+
+
+def write_run_timing(run_dir, timing):
+    """
+    Write the dictionary of timing data to the run directory.
+    Return False if the directory does not exist.
+    """
+    if run_dir is None or not os.path.isdir(run_dir):
+        return False
+
+    path = os.path.join(run_dir, RunTimer.FILENAME)
+    with open(path, "w") as out:
+        json.dump(timing, out, indent=2, sort_keys=True)
+    return True
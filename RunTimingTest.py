@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from RunTiming import RunTimer, write_run_timing
+
+
+class MockComponent(object):
+    def __init__(self, name, num):
+        self.__name = name
+        self.__num = num
+
+    def __str__(self):
+        return self.fullname
+
+    @property
+    def fullname(self):
+        return "%s#%d" % (self.__name, self.__num)
+
+
+class RunTimingTest(unittest.TestCase):
+    def setUp(self):
+        self.__tmpdir = None
+
+    def tearDown(self):
+        if self.__tmpdir is not None:
+            shutil.rmtree(self.__tmpdir, ignore_errors=True)
+
+    def test_spans(self):
+        timer = RunTimer("start", 123)
+
+        with timer.span("outer"):
+            with timer.span("inner"):
+                pass
+
+        try:
+            with timer.span("broken"):
+                raise ValueError("Oops")
+        except ValueError:
+            pass
+
+        self.assertTrue(timer.total is None)
+        self.assertFalse("total_secs" in timer.to_dict())
+
+        timer.finish()
+
+        tdict = timer.to_dict()
+        self.assertEqual("start", tdict["transition"])
+        self.assertEqual(123, tdict["run_number"])
+        self.assertTrue(tdict["total_secs"] >= 0.0)
+
+        spans = tdict["spans"]
+        self.assertEqual(["outer", "inner", "broken"],
+                         [span["name"] for span in spans])
+        self.assertEqual([0, 1, 0], [span["depth"] for span in spans])
+        for span in spans:
+            self.assertTrue(span["secs"] >= 0.0)
+            self.assertTrue(span["offset"] >= 0.0)
+
+    def test_component_times(self):
+        timer = RunTimer("stop", 1)
+
+        hub = MockComponent("stringHub", 1)
+        bldr = MockComponent("eventBuilder", 0)
+
+        times = timer.component_times("StopRun")
+        self.assertTrue(times is timer.component_times("StopRun"))
+
+        times.update({hub: 0.5, bldr: 2.0})
+
+        self.assertEqual([("eventBuilder#0", 2.0), ("stringHub#1", 0.5)],
+                         timer.slowest("StopRun"))
+        self.assertEqual([], timer.slowest("Unknown"))
+
+        comps = timer.to_dict()["components"]
+        self.assertEqual({"StopRun": {"stringHub#1": 0.5,
+                                      "eventBuilder#0": 2.0}}, comps)
+
+    def test_write(self):
+        timer = RunTimer("start", 2)
+        with timer.span("foo"):
+            pass
+        timer.finish()
+
+        timing = {"start": timer.to_dict()}
+
+        self.assertFalse(write_run_timing(None, timing))
+        self.assertFalse(write_run_timing("/bad/path", timing))
+
+        self.__tmpdir = tempfile.mkdtemp()
+        self.assertTrue(write_run_timing(self.__tmpdir, timing))
+
+        path = os.path.join(self.__tmpdir, RunTimer.FILENAME)
+        with open(path, "r") as fin:
+            self.assertEqual(timing, json.load(fin))
+
+
+if __name__ == '__main__':
+    unittest.main()
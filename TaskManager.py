@@ -7,6 +7,7 @@ import threading
 from ActiveDOMsTask import ActiveDOMsTask
 from CnCTask import CnCTask, TaskException
 from IntervalTimer import IntervalTimer
+from MBeanSnapshotCache import MBeanSnapshotCache
 from MonitorTask import MonitorTask
 from RateTask import RateTask
 from WatchdogTask import WatchdogTask
@@ -34,6 +35,12 @@ class TaskManager(threading.Thread):
         super(TaskManager, self).__init__(name="TaskManager")
         self.setDaemon(True)
 
+        # MBean values fetched by MonitorTask and shared by all tasks
+        moni_period = run_cfg.monitor_period
+        if moni_period is None:
+            moni_period = MonitorTask.period
+        self.__mbean_cache = MBeanSnapshotCache(ttl=moni_period)
+
         self.__tasks = self.__create_all_tasks(live_moni, rundir, run_cfg,
                                                run_options)
 
@@ -131,6 +138,11 @@ class TaskManager(threading.Thread):
     def is_stopped(self):
         return not self.__running and not self.__stopping
 
+    @property
+    def mbean_cache(self):
+        "Return the MBean snapshot cache shared by all tasks"
+        return self.__mbean_cache
+
     def reset(self):
         for tsk in self.__tasks:
             tsk.reset()
@@ -234,52 +234,44 @@ class TaskManagerTest(unittest.TestCase):
     def __load_expected(cls, live, first=True):
         "Add expected monitoring values to 'live'"
 
-        # add monitoring data
-        live.add_expected("stringHub-1*sender+NumHitsReceived",
-                          0, Prio.ITS)
-        live.add_expected("stringHub-1*sender+NumReadoutRequestsReceived",
-                          0, Prio.ITS)
-        live.add_expected("stringHub-1*sender+NumReadoutsSent", 0, Prio.ITS)
-        live.add_expected("stringHub-1*stringhub+NumberOfActiveChannels",
-                          2, Prio.ITS)
-        live.add_expected("stringHub-1*stringhub+TotalLBMOverflows",
-                          20, Prio.ITS)
-        live.add_expected(
-            "stringHub-1*stringhub+NumberOfActiveAndTotalChannels",
-            [1, 2], Prio.ITS)
-
-        live.add_expected("iceTopTrigger-0*icetopHit+RecordsReceived",
-                          0, Prio.ITS)
-        live.add_expected("iceTopTrigger-0*trigger+RecordsSent", 0, Prio.ITS)
-        live.add_expected("inIceTrigger-0*stringHit+RecordsReceived",
-                          0, Prio.ITS)
-        live.add_expected("inIceTrigger-0*trigger+RecordsSent", 0, Prio.ITS)
-        live.add_expected("globalTrigger-0*trigger+RecordsReceived",
-                          0, Prio.ITS)
-
-        live.add_expected("globalTrigger-0*glblTrig+RecordsSent",
-                          0, Prio.ITS)
-        live.add_expected("eventBuilder-0*backEnd+NumTriggerRequestsReceived",
-                          0, Prio.ITS)
-        live.add_expected("eventBuilder-0*backEnd+NumReadoutsReceived",
-                          0, Prio.ITS)
-        live.add_expected("eventBuilder-0*backEnd+NumEventsSent",
-                          0, Prio.ITS)
-        live.add_expected("eventBuilder-0*backEnd+NumEventsDispatched",
-                          0, Prio.ITS)
-        live.add_expected("eventBuilder-0*backEnd+NumBadEvents",
-                          0, Prio.ITS)
-        live.add_expected("eventBuilder-0*backEnd+DiskAvailable",
-                          2560, Prio.ITS)
-        live.add_expected("eventBuilder-0*backEnd+NumBytesWritten",
-                          0, Prio.ITS)
-
-        live.add_expected("secondaryBuilders-0*moniBuilder+NumDispatchedData",
-                          0, Prio.ITS)
-        live.add_expected("secondaryBuilders-0*snBuilder+NumDispatchedData",
-                          0, Prio.ITS)
-        live.add_expected("secondaryBuilders-0*snBuilder+DiskAvailable",
-                          0, Prio.ITS)
+        # add monitoring data (each bean is sent as a single message)
+        live.add_expected("stringHub-1*sender",
+                          {"NumHitsReceived": 0,
+                           "NumReadoutRequestsReceived": 0,
+                           "NumReadoutsSent": 0}, Prio.ITS)
+        live.add_expected("stringHub-1*stringhub",
+                          {"NumberOfActiveChannels": 2,
+                           "TotalLBMOverflows": 20,
+                           "NumberOfActiveAndTotalChannels": [1, 2]},
+                          Prio.ITS)
+
+        live.add_expected("iceTopTrigger-0*icetopHit",
+                          {"RecordsReceived": 0}, Prio.ITS)
+        live.add_expected("iceTopTrigger-0*trigger", {"RecordsSent": 0},
+                          Prio.ITS)
+        live.add_expected("inIceTrigger-0*stringHit",
+                          {"RecordsReceived": 0}, Prio.ITS)
+        live.add_expected("inIceTrigger-0*trigger", {"RecordsSent": 0},
+                          Prio.ITS)
+        live.add_expected("globalTrigger-0*trigger",
+                          {"RecordsReceived": 0}, Prio.ITS)
+
+        live.add_expected("globalTrigger-0*glblTrig", {"RecordsSent": 0},
+                          Prio.ITS)
+        live.add_expected("eventBuilder-0*backEnd",
+                          {"NumTriggerRequestsReceived": 0,
+                           "NumReadoutsReceived": 0,
+                           "NumEventsSent": 0,
+                           "NumEventsDispatched": 0,
+                           "NumBadEvents": 0,
+                           "DiskAvailable": 2560,
+                           "NumBytesWritten": 0}, Prio.ITS)
+
+        live.add_expected("secondaryBuilders-0*moniBuilder",
+                          {"NumDispatchedData": 0}, Prio.ITS)
+        live.add_expected("secondaryBuilders-0*snBuilder",
+                          {"NumDispatchedData": 0,
+                           "DiskAvailable": 0}, Prio.ITS)
 
         # add activeDOM data
         live.add_expected("missingDOMs", 1, Prio.ITS)
@@ -1,10 +1,12 @@
 #!/usr/bin/env python
 """
 A ThreadGroup implementation used by CompOp.py to manage groups of threads
-(e.g. start, join, etc.) 
+(e.g. start, join, etc.)
 """
 
+import collections
 import threading
+import time
 
 
 class GThread(threading.Thread):
@@ -27,6 +29,10 @@ class GThread(threading.Thread):
         self.__result = None
         self.__error = None
 
+        self.__done = False
+        self.__callbacks = []
+        self.__cb_lock = threading.Lock()
+
         super(GThread, self).__init__(name=name)
         if is_daemon:
             self.setDaemon(True)
@@ -35,6 +41,22 @@ class GThread(threading.Thread):
         return "Thread[tgt %s super %s]" % \
             (self.__run_method, str(super(GThread, self)))
 
+    def add_done_callback(self, func):
+        """
+        Call `func(thread)` when the run method finishes (or immediately if
+        it has already finished)
+        """
+        with self.__cb_lock:
+            if not self.__done:
+                self.__callbacks.append(func)
+                return
+        func(self)
+
+    @property
+    def done(self):
+        "Return True if the run method has finished"
+        return self.__done
+
     @property
     def error(self):
         "Return error (or None)"
@@ -56,14 +78,347 @@ class GThread(threading.Thread):
 
     def run(self):
         "Main method for thread"
-        if self.__run_method is None:
-            self.__error = "!!! No run method for %s" % (self.name, )
-        else:
-            try:
-                self.__run_method(*self.__args, **self.__kwargs)
-            except Exception as exception:  # pylint: disable=broad-except
-                self.report_exception(exception)
-                self.__error = exception
+        try:
+            if self.__run_method is None:
+                self.__error = "!!! No run method for %s" % (self.name, )
+            else:
+                try:
+                    self.__run_method(*self.__args, **self.__kwargs)
+                except Exception as exception:  # pylint: disable=broad-except
+                    self.report_exception(exception)
+                    self.__error = exception
+        finally:
+            with self.__cb_lock:
+                self.__done = True
+                callbacks = self.__callbacks
+                self.__callbacks = []
+            for func in callbacks:
+                func(self)
+
+
+class WorkerPool(object):
+    """
+    Persistent pool of daemon threads which run PooledTask objects.
+
+    At most `max_workers` threads are normally kept, but a thread whose
+    task has run past its deadline (i.e. is probably hung) is not counted
+    against that limit, so a few hung components cannot starve the pool.
+    Replacement threads are started by submit() and check_workers(), and
+    exit once their tasks finish.
+    """
+
+    # default maximum number of worker threads
+    MAX_WORKERS = 64
+    # seconds to wait before rechecking a pool whose workers are starting
+    STARTUP_SECS = 0.01
+
+    def __init__(self, max_workers=None, name="WorkerPool"):
+        if max_workers is None:
+            max_workers = self.MAX_WORKERS
+        if max_workers < 1:
+            raise ValueError("Bad number of workers %s" % (max_workers, ))
+
+        self.__max_workers = max_workers
+        self.__name = name
+
+        self.__cond = threading.Condition()
+        self.__queue = collections.deque()
+        self.__running = {}
+        self.__num_workers = 0
+        self.__num_idle = 0
+        self.__num_created = 0
+
+    def __str__(self):
+        return "%s[%d workers, %d idle, %d queued]" % \
+            (self.__name, self.__num_workers, self.__num_idle,
+             len(self.__queue))
+
+    def __add_workers(self):
+        """
+        Start enough worker threads to run all queued tasks, ignoring
+        workers whose task is overdue.  Must be called with the lock held.
+        """
+        while self.__num_idle < len(self.__queue) and \
+              self.__num_workers - self.__num_overdue() < self.__max_workers:
+            self.__num_workers += 1
+            self.__num_created += 1
+            thrd = threading.Thread(target=self.__run_worker,
+                                    name="%s#%d" % (self.__name,
+                                                    self.__num_created))
+            thrd.daemon = True
+            thrd.start()
+            # count the new thread as idle until it takes a task
+            self.__num_idle += 1
+
+    def __num_overdue(self):
+        "Return the number of workers whose task has passed its deadline"
+        now = time.time()
+        num = 0
+        for task in self.__running.values():
+            deadline = task.deadline
+            if deadline is not None and deadline < now:
+                num += 1
+        return num
+
+    def __run_worker(self):
+        "Main loop for worker threads"
+        ident = threading.current_thread().ident
+        with self.__cond:
+            # new threads are counted as idle by __add_workers()
+            self.__num_idle -= 1
+            while True:
+                while not self.__queue:
+                    self.__num_idle += 1
+                    self.__cond.wait()
+                    self.__num_idle -= 1
+
+                # other workers may have gone overdue while we were busy
+                self.__add_workers()
+
+                task = self.__queue.popleft()
+                task.begin()
+                self.__running[ident] = task
+                self.__cond.release()
+                try:
+                    task.run()
+                finally:
+                    self.__cond.acquire()
+                    del self.__running[ident]
+
+                if self.__num_workers - self.__num_overdue() > \
+                   self.__max_workers:
+                    # replacement thread is no longer needed
+                    self.__num_workers -= 1
+                    return
+
+    def check_workers(self):
+        """
+        Start replacement threads if queued tasks are stuck behind overdue
+        ones, then return the earliest deadline of the running tasks which
+        are not yet overdue (or None)
+        """
+        with self.__cond:
+            self.__add_workers()
+
+            now = time.time()
+            if self.__queue and self.__num_idle > 0:
+                # a new or idle worker is about to take a queued task
+                return now + self.STARTUP_SECS
+
+            earliest = None
+            for task in self.__running.values():
+                deadline = task.deadline
+                if deadline is not None and deadline >= now and \
+                   (earliest is None or deadline < earliest):
+                    earliest = deadline
+            return earliest
+
+    @property
+    def max_workers(self):
+        "Return the maximum number of (non-hung) worker threads"
+        return self.__max_workers
+
+    @property
+    def num_created(self):
+        "Return the number of threads created by this pool"
+        return self.__num_created
+
+    @property
+    def num_workers(self):
+        "Return the current number of worker threads"
+        return self.__num_workers
+
+    def submit(self, task):
+        "Queue a task, starting another worker thread if necessary"
+        with self.__cond:
+            self.__queue.append(task)
+            self.__add_workers()
+            self.__cond.notify()
+
+
+class PooledTask(object):
+    """
+    Task which runs on a WorkerPool thread and can be managed by a
+    ThreadGroup in place of a GThread.  If `timeout` is set, the task's
+    deadline is `timeout` seconds after a worker begins running it; time
+    spent waiting in the pool's queue does not count against it.
+    """
+
+    def __init__(self, target=None, name=None, args=(), kwargs=None,
+                 timeout=None, pool=None):
+        """
+        Initialize a pooled task
+        target - object invoked by the run() method
+        name - task name
+        args - arguments passed to the target
+        kwargs - dictionary of keyword arguments passed to the target
+        timeout - number of seconds before the task is considered hung
+        pool - WorkerPool used to run this task
+        """
+        if pool is None:
+            raise ValueError("No WorkerPool specified for %s" % (name, ))
+
+        self.__run_method = target
+        self.__name = name
+        self.__args = args
+        self.__kwargs = kwargs if kwargs is not None else {}
+        self.__timeout = timeout
+        self.__pool = pool
+
+        self.__deadline = None
+        self.__started = False
+        self.__start_time = None
+        self.__run_time = None
+        self.__elapsed = None
+        self.__done = threading.Event()
+        self.__callbacks = []
+        self.__cb_lock = threading.Lock()
+
+        self.__error = None
+
+    def __str__(self):
+        return "Task[%s tgt %s]" % (self.__name, self.__run_method)
+
+    def add_done_callback(self, func):
+        """
+        Call `func(task)` when the task finishes (or immediately if it has
+        already finished)
+        """
+        with self.__cb_lock:
+            if not self.__done.is_set():
+                self.__callbacks.append(func)
+                return
+        func(self)
+
+    def begin(self):
+        """
+        Record that the task is about to run, starting the clock on its
+        deadline.  Pools call this just before running the task.
+        """
+        self.__run_time = time.time()
+        if self.__timeout is not None:
+            self.__deadline = self.__run_time + self.__timeout
+
+    def check_pool(self):
+        """
+        Ask the pool to replace any overdue workers and return the next
+        time it should be checked (or None)
+        """
+        check = getattr(self.__pool, "check_workers", None)
+        if check is None:
+            return None
+        return check()
+
+    @property
+    def deadline(self):
+        "Return the time when this task is considered hung (or None)"
+        return self.__deadline
+
+    @property
+    def done(self):
+        "Return True if this task has finished"
+        return self.__done.is_set()
+
+    @property
+    def elapsed(self):
+        """
+        Return the number of seconds between when this task began running
+        and when it finished (or None if it hasn't finished)
+        """
+        return self.__elapsed
+
+    @property
+    def error(self):
+        "Return error (or None)"
+        return self.__error
+
+    def is_alive(self):
+        "Return True if this task has been started but has not finished"
+        return self.__started and not self.__done.is_set()
+
+    def finish(self, error=None):
+        """
+        Record the task's error (if any), mark it as done, and notify
+        anyone waiting for it
+        """
+        with self.__cb_lock:
+            self.__error = error
+            if self.__run_time is not None:
+                self.__elapsed = time.time() - self.__run_time
+            self.__done.set()
+            callbacks = self.__callbacks
+            self.__callbacks = []
+        for func in callbacks:
+            func(self)
+
+    @property
+    def is_error(self):
+        "Return True if this task encountered an error"
+        return self.__error is not None
+
+    def join(self, timeout=None):
+        "Wait until the task finishes or the timeout expires"
+        self.__done.wait(timeout)
+
+    @property
+    def name(self):
+        "Return the task name"
+        return self.__name
+
+    @property
+    def pool(self):
+        "Return the pool which runs this task"
+        return self.__pool
+
+    @property
+    def queue_wait(self):
+        """
+        Return the number of seconds this task waited for a worker (or None
+        if it hasn't begun running)
+        """
+        if self.__start_time is None or self.__run_time is None:
+            return None
+        return self.__run_time - self.__start_time
+
+    @property
+    def run_time(self):
+        "Return the time when this task began running (or None)"
+        return self.__run_time
+
+    def report_exception(self,        # pylint: disable=no-self-use
+                         exception):  # pylint: disable=unused-argument
+        "Don't report exceptions"
+        return
+
+    def result(self):  # pylint: disable=no-self-use
+        "Subclasses should return cached result"
+        return None
+
+    def run(self):
+        "Called by the worker thread to run this task"
+        error = None
+        try:
+            if self.__run_time is None:
+                self.begin()
+            if self.__run_method is None:
+                error = "!!! No run method for %s" % (self.__name, )
+            else:
+                try:
+                    self.__run_method(*self.__args, **self.__kwargs)
+                except Exception as exception:  # pylint: disable=broad-except
+                    self.report_exception(exception)
+                    error = exception
+        finally:
+            self.finish(error=error)
+
+    def start(self):
+        "Queue this task on the worker pool"
+        if self.__started:
+            raise RuntimeError("Task %s has already been started" %
+                               (self.__name, ))
+        self.__started = True
+        self.__start_time = time.time()
+        self.__pool.submit(self)
 
 
 class ThreadGroup(object):
@@ -75,6 +430,10 @@ class ThreadGroup(object):
 
         self.__list = []
 
+        # notified whenever a thread in the group finishes
+        self.__cond = threading.Condition()
+        self.__last_done = None
+
     def __len__(self):
         return len(self.__list)
 
@@ -101,9 +460,39 @@ class ThreadGroup(object):
 
         return (num_alive, num_errors)
 
+    @staticmethod
+    def __check_pools(threads):
+        """
+        Ask each worker pool used by the unfinished threads to replace any
+        overdue workers, and return the earliest time a pool should be
+        checked again (or None)
+        """
+        checked = set()
+        earliest = None
+        for thrd in threads:
+            if thrd.done or not hasattr(thrd, "check_pool"):
+                continue
+            if id(thrd.pool) in checked:
+                continue
+            checked.add(id(thrd.pool))
+
+            next_check = thrd.check_pool()
+            if next_check is not None and \
+               (earliest is None or next_check < earliest):
+                earliest = next_check
+        return earliest
+
+    def __thread_done(self, _):
+        "Wake up anyone waiting for threads in this group"
+        with self.__cond:
+            self.__last_done = time.time()
+            self.__cond.notify_all()
+
     def add(self, thread, start_immediate=False):
         "Add a thread to the group"
         self.__list.append(thread)
+        if hasattr(thread, "add_done_callback"):
+            thread.add_done_callback(self.__thread_done)
         if start_immediate:
             thread.start()
 
@@ -148,20 +537,92 @@ class ThreadGroup(object):
         for thread in self.__list:
             thread.start()
 
+    def __last_progress(self, notifiers):
+        """
+        Return the last time a thread in this group started running or
+        finished (or None)
+        """
+        latest = self.__last_done
+        for thrd in notifiers:
+            run_time = getattr(thrd, "run_time", None)
+            if run_time is not None and \
+               (latest is None or run_time > latest):
+                latest = run_time
+        return latest
+
+    @staticmethod
+    def __wait_limit(thrd, wait_secs, deadline, progress, hard_limit):
+        """
+        Return the time after which `thrd` is considered hung.  A pooled
+        task gets `wait_secs` seconds from when it began running, and a
+        queued task is waited for as long as other tasks in the group are
+        still making progress.
+        """
+        if not hasattr(thrd, "run_time"):
+            limit = deadline
+        elif thrd.run_time is not None:
+            limit = max(deadline, thrd.run_time + wait_secs)
+        elif progress is not None:
+            limit = max(deadline, progress + wait_secs)
+        else:
+            limit = deadline
+        return min(limit, hard_limit)
+
     def wait(self, wait_secs=2, reps=4):
         """
-        Wait for all the threads to finish
-        wait_secs - total number of seconds to wait
-        reps - number of times to loop before deciding threads are hung
-        NOTE:
-        if all threads are hung, max wait time is (#threads * wait_secs * reps)
-        """
-        part_secs = float(wait_secs) / float(reps)
-        for _ in range(reps):
-            alive = False
-            for thrd in self.__list:
-                if thrd.is_alive():
-                    thrd.join(part_secs)
-                    alive |= thrd.is_alive()
-            if not alive:
-                break
+        Wait for all the threads to finish, returning as soon as the last
+        thread is done or `wait_secs` seconds have passed, whichever comes
+        first.  Pooled tasks which were delayed in a worker pool's queue
+        are given more time, as long as the group is still making progress,
+        up to a total of `wait_secs * reps` seconds.  Returns True if all
+        threads finished.
+        wait_secs - number of seconds to wait
+        reps - multiplier for the longest wait on delayed pooled tasks
+        """
+        wait_secs = float(wait_secs)
+        now = time.time()
+        deadline = now + wait_secs
+        hard_limit = now + wait_secs * max(int(reps), 1)
+
+        # threads which notify the group can be waited on together
+        notifiers = [thrd for thrd in self.__list
+                     if hasattr(thrd, "add_done_callback")]
+        idx = 0
+        with self.__cond:
+            while idx < len(notifiers):
+                thrd = notifiers[idx]
+                if thrd.done or not thrd.is_alive():
+                    idx += 1
+                    continue
+
+                now = time.time()
+                progress = self.__last_progress(notifiers)
+                limit = self.__wait_limit(thrd, wait_secs, deadline, progress,
+                                          hard_limit)
+                if limit <= now:
+                    # this one is hung, but keep waiting for the rest
+                    idx += 1
+                    continue
+
+                # make sure queued tasks aren't stuck behind hung ones
+                wake_time = limit
+                next_check = self.__check_pools(notifiers[idx:])
+                if next_check is not None and next_check < wake_time:
+                    wake_time = next_check
+
+                remaining = wake_time - time.time()
+                if remaining > 0:
+                    self.__cond.wait(remaining)
+
+        # join everything else (including finished threads which may not
+        # have exited yet) using the same deadline
+        all_done = True
+        for thrd in self.__list:
+            if thrd.is_alive():
+                remaining = deadline - time.time()
+                if remaining > 0:
+                    thrd.join(remaining)
+                if thrd.is_alive() and \
+                   not getattr(thrd, "done", False):
+                    all_done = False
+        return all_done
@@ -259,11 +259,15 @@ class ValueWatcher(Watcher):
 class WatchData(object):
     "Object which holds all the watched MBean fields for a component"
 
-    def __init__(self, comp, mbean_client, dashlog):
+    def __init__(self, comp, mbean_client, dashlog, snapshot_cache=None):
         "Create a data-watching object"
         self.__comp = comp
         self.__mbean_client = mbean_client
         self.__dashlog = dashlog
+        self.__snapshot_cache = snapshot_cache
+
+        # fetch time of the most recent MBean snapshot used by check()
+        self.__snapshot_time = None
 
         self.__input_fields = {}
         self.__output_fields = {}
@@ -275,14 +279,14 @@ class WatchData(object):
         "Return the name of the component associated with this data"
         return self.__comp.fullname
 
-    def __check_beans(self, bean_list):
+    def __check_beans(self, bean_list, cache=None):
         "Check values for all MBeans in 'bean_list'"
         unhealthy = []
         for bean in bean_list:
             if self.__closed:
                 # break out of the loop if this thread has been closed
                 break
-            bad_list = self.__check_values(bean_list[bean])
+            bad_list = self.__check_values(bean_list[bean], cache=cache)
             if bad_list is not None:
                 unhealthy += bad_list
 
@@ -291,14 +295,17 @@ class WatchData(object):
 
         return unhealthy
 
-    def __check_values(self, watch_list):
+    def __check_values(self, watch_list, cache=None):
         "Check all values in 'watch_list'"
         unhealthy = []
         if len(watch_list) == 1:
             try:
                 bean_name = watch_list[0].bean_name()
                 fld_name = watch_list[0].field_name()
-                val = self.__mbean_client.get(bean_name, fld_name)
+                if cache is None:
+                    val = self.__mbean_client.get(bean_name, fld_name)
+                else:
+                    val = self.__cached_values(cache, bean_name)[fld_name]
 
                 chk_val = watch_list[0].check(val)
             except Exception as exc:  # pylint: disable=broad-except
@@ -320,8 +327,11 @@ class WatchData(object):
                 fld_list.append(fld.field_name())
 
             try:
-                val_map = self.__mbean_client.get_attributes(bean_name,
-                                                             fld_list)
+                if cache is None:
+                    val_map = self.__mbean_client.get_attributes(bean_name,
+                                                                 fld_list)
+                else:
+                    val_map = self.__cached_values(cache, bean_name)
             except Exception as exc:  # pylint: disable=broad-except
                 fld_list = []
                 unhealthy.append(watch_list[0].unhealthy_record(exc))
@@ -348,6 +358,72 @@ class WatchData(object):
 
         return unhealthy
 
+    @classmethod
+    def __cached_values(cls, cache, bean_name):
+        """
+        Return the prefetched values for this bean, raising the exception
+        if the bean's request failed
+        """
+        vals = cache[bean_name]
+        if isinstance(vals, Exception):
+            raise vals
+        return vals
+
+    def __fetch_all(self):
+        """
+        Fetch every watched field from a new MBean snapshot or with a single
+        request.  Return a dictionary mapping bean names to field values
+        (or to the exception raised while fetching that bean), or None if
+        there's no snapshot and the MBean client cannot batch requests.
+        """
+        request = {}
+        for fields in (self.__input_fields, self.__output_fields,
+                       self.__threshold_fields):
+            for bean_name, watch_list in fields.items():
+                if bean_name not in request:
+                    request[bean_name] = []
+                for watch in watch_list:
+                    if watch.field_name() not in request[bean_name]:
+                        request[bean_name].append(watch.field_name())
+
+        if len(request) == 0:  # pylint: disable=len-as-condition
+            return None
+
+        values = self.__snapshot_values(request)
+        if values is not None:
+            return values
+
+        if not hasattr(self.__mbean_client, "get_multiple"):
+            return None
+
+        try:
+            return self.__mbean_client.get_multiple(request)
+        except Exception as exc:  # pylint: disable=broad-except
+            return {bean_name: exc for bean_name in request}
+
+    def __snapshot_values(self, request):
+        """
+        Return the requested values from the shared MBean snapshot, or None
+        if there's no snapshot newer than the one used by the last check
+        (since reused values would look like stalled counters)
+        """
+        if self.__snapshot_cache is None:
+            return None
+
+        snap = self.__snapshot_cache.fresh_snapshot(
+            self.__comp, newer_than=self.__snapshot_time)
+        if snap is None:
+            return None
+
+        values = {}
+        for bean_name, fld_list in request.items():
+            values[bean_name] = snap.fields(bean_name, fld_list)
+            if values[bean_name] is None:
+                return None
+
+        self.__snapshot_time = snap.fetch_time
+        return values
+
     def add_input_value(self, other_comp, bean_name, field_name):
         "Add a rule which triggers when an input field value stops increasing"
         if bean_name not in self.__input_fields:
@@ -387,10 +463,16 @@ class WatchData(object):
         """
         is_ok = True
 
+        # fetch all the values at once if possible
+        cache = None
+        if not self.__closed:
+            cache = self.__fetch_all()
+
         # look for input problems
         if not self.__closed:
             try:
-                bad_list = self.__check_beans(self.__input_fields)
+                bad_list = self.__check_beans(self.__input_fields,
+                                              cache=cache)
                 if bad_list is not None:
                     # add any input problems to the 'starved' list
                     starved += bad_list
@@ -403,7 +485,8 @@ class WatchData(object):
         # only look for output problems if there are no input problems
         if not self.__closed and is_ok:
             try:
-                bad_list = self.__check_beans(self.__output_fields)
+                bad_list = self.__check_beans(self.__output_fields,
+                                              cache=cache)
                 if bad_list is not None:
                     # add any output problems to the 'stagnant' list
                     stagnant += bad_list
@@ -416,7 +499,8 @@ class WatchData(object):
         # look for threshold problems
         if not self.__closed:
             try:
-                bad_list = self.__check_beans(self.__threshold_fields)
+                bad_list = self.__check_beans(self.__threshold_fields,
+                                              cache=cache)
                 if bad_list is not None:
                     # add any threshold problems (value too big or too small)
                     #  to the 'threshold' list
@@ -443,7 +527,7 @@ class WatchdogThread(CnCThread):
     "Thread which checks a rule for a component"
 
     def __init__(self, runset, comp, rule, dashlog, data=None, init_fail=0,
-                 mbean_client=None):
+                 mbean_client=None, snapshot_cache=None):
         "Create a watchdog thread"
         self.__runset = runset
         self.__comp = comp
@@ -453,6 +537,7 @@ class WatchdogThread(CnCThread):
             self.__mbean_client = comp.create_mbean_client()
         self.__rule = rule
         self.__dashlog = dashlog
+        self.__snapshot_cache = snapshot_cache
 
         self.__data = data
         self.__init_fail = init_fail
@@ -479,7 +564,8 @@ class WatchdogThread(CnCThread):
                     self.__comp,
                     self.__mbean_client,
                     self.__runset.components,
-                    self.__dashlog)
+                    self.__dashlog,
+                    snapshot_cache=self.__snapshot_cache)
             except:  # pylint: disable=bare-except
                 self.__init_fail += 1
                 self.__dashlog.error(("Initialization failure #%d" +
@@ -503,7 +589,8 @@ class WatchdogThread(CnCThread):
         thrd = WatchdogThread(self.__runset, self.__comp, self.__rule,
                               self.__dashlog, data=self.__data,
                               init_fail=self.__init_fail,
-                              mbean_client=self.__mbean_client)
+                              mbean_client=self.__mbean_client,
+                              snapshot_cache=self.__snapshot_cache)
         return thrd
 
     def stagnant(self):
@@ -545,9 +632,11 @@ class WatchdogRule(object):
         "Initialize the monitoring parameters"
         raise NotImplementedError("you were supposed to implement init_data")
 
-    def create_data(self, this_comp, this_client, components, dashlog):
+    def create_data(self, this_comp, this_client, components, dashlog,
+                    snapshot_cache=None):
         "This is a base method for classes that define init_data"
-        data = WatchData(this_comp, this_client, dashlog)
+        data = WatchData(this_comp, this_client, dashlog,
+                         snapshot_cache=snapshot_cache)
         self.init_data(data, this_comp, components)
         return data
 
@@ -741,8 +830,9 @@ class WatchdogTask(CnCTask):
                 found = False
                 for rule in rules:
                     if rule.matches(comp):
-                        thread_list[comp] = self.create_thread(runset, comp,
-                                                               rule, dashlog)
+                        thread_list[comp] \
+                            = self.create_thread(runset, comp, rule, dashlog,
+                                                 self.mbean_cache)
                         found = True
                         break
                 if not found:
@@ -835,9 +925,10 @@ class WatchdogTask(CnCTask):
                 self.set_error("WatchdogTask")
 
     @classmethod
-    def create_thread(cls, runset, comp, rule, dashlog):
+    def create_thread(cls, runset, comp, rule, dashlog, snapshot_cache=None):
         "Create a watchdog thread"
-        return WatchdogThread(runset, comp, rule, dashlog)
+        return WatchdogThread(runset, comp, rule, dashlog,
+                              snapshot_cache=snapshot_cache)
 
     def close(self):
         "Close everything associated with this task"
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Compare the time needed to parse text and binary .moni files with
+moni_stream()
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import MoniBinary
+
+from MonitorTask import MonitorToFile
+from bench_rpc import simulate_hub
+from moni_stream import moni_stream
+
+
+def add_arguments(parser):
+    "Add command-line arguments"
+
+    parser.add_argument("-H", "--hubs", type=int, dest="num_hubs",
+                        default=4,
+                        help="Number of simulated hub files")
+    parser.add_argument("-n", "--cycles", type=int, dest="cycles",
+                        default=60,
+                        help="Number of monitoring cycles in each simulated"
+                        " file")
+    parser.add_argument("-r", "--repeat", type=int, dest="repeat",
+                        default=3,
+                        help="Number of times each file is parsed")
+    parser.add_argument(dest="fileList", nargs="*",
+                        help=("Text hub .moni files to parse"
+                              " (if omitted, files are simulated)"))
+
+
+def simulate_files(tmpdir, num_hubs, cycles):
+    "Write simulated text hub .moni files and return the list of paths"
+    rand = random.Random(12345)
+    now = datetime.datetime(2020, 1, 1, 0, 0, 0, 123456)
+
+    paths = []
+    for num in range(num_hubs):
+        path = os.path.join(tmpdir, "stringHub-%d.moni" % (num + 1, ))
+        with open(path, "w") as out:
+            for _ in range(cycles):
+                now += datetime.timedelta(seconds=100)
+                for bean, attrs in simulate_hub(num + 1, rand).items():
+                    out.write(MonitorToFile.format(now, bean, attrs))
+        paths.append(path)
+    return paths
+
+
+def time_parse(paths, repeat):
+    """
+    Parse each file `repeat` times, returning the best time
+    and the number of values
+    """
+    best = None
+    num_vals = 0
+    for _ in range(repeat):
+        start = time.time()
+        num_vals = 0
+        for path in paths:
+            for _ in moni_stream(path):
+                num_vals += 1
+        secs = time.time() - start
+        if best is None or secs < best:
+            best = secs
+    return best, num_vals
+
+
+def main():
+    "Main program"
+
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        if len(args.fileList) > 0:  # pylint: disable=len-as-condition
+            text_paths = args.fileList
+        else:
+            text_paths = simulate_files(tmpdir, args.num_hubs, args.cycles)
+
+        results = [(MoniBinary.TEXT_FORMAT, text_paths)]
+        for name in MoniBinary.format_names()[1:]:
+            encoder = MoniBinary.find_encoder(name)
+            bin_paths = []
+            for path in text_paths:
+                bin_path = os.path.join(tmpdir, "%s.%s" %
+                                        (os.path.basename(path), name))
+                MoniBinary.convert(path, bin_path, encoder)
+                bin_paths.append(bin_path)
+            results.append((name, bin_paths))
+
+        ref_secs = None
+        for name, paths in results:
+            secs, num_vals = time_parse(paths, args.repeat)
+            num_bytes = sum(os.path.getsize(path) for path in paths)
+            if ref_secs is None:
+                ref_secs = secs
+            print("  %-8s %.3fs  %9d values/sec  %10d bytes  (%.1fx)" %
+                  (name, secs, num_vals / secs, num_bytes, ref_secs / secs))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the optimized payload decoders and readers
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+from payload import DeltaCompressedHit, PayloadReader, delta_codec, \
+    decode_delta_waveforms, is_compressed
+
+
+def add_arguments(parser):
+    "Add command-line arguments"
+
+    parser.add_argument("-B", "--benchmark", dest="benchmark",
+                        choices=("delta", "decompress"), default="delta",
+                        help=("Benchmark to run (\"delta\" compares waveform"
+                              " decoders, \"decompress\" compares compressed"
+                              " file readers)"))
+    parser.add_argument("-b", "--batch-size", type=int, dest="batch_size",
+                        default=1000,
+                        help="Number of hits decoded in each batch")
+    parser.add_argument("-n", "--max_payloads", type=int,
+                        dest="max_payloads", default=None,
+                        help="Maximum number of hits to read from each file")
+    parser.add_argument(dest="fileList", nargs="+")
+
+
+def load_hits(filename, max_payloads=None):
+    "Return all delta-compressed hits found in the file"
+    hits = []
+    with PayloadReader(filename) as rdr:
+        for pay in rdr:
+            if not isinstance(pay, DeltaCompressedHit):
+                continue
+            hits.append(pay)
+            if max_payloads is not None and len(hits) >= max_payloads:
+                break
+    return hits
+
+
+def decode_with_delta_codec(hits):
+    "Decode waveforms from all hits using the original decoder"
+    results = []
+    for hit in hits:
+        codec = delta_codec(hit.data_bytes[38:])
+
+        fadc = None
+        if hit.has_fadc:
+            fadc = codec.decode(256)
+
+        atwd = None
+        if hit.has_atwd:
+            atwd = []
+            for _ in range(hit.atwd_channels + 1):
+                atwd.append(codec.decode(128))
+
+        results.append((fadc, atwd))
+    return results
+
+
+def decode_in_batches(hits, batch_size):
+    "Decode waveforms from all hits using the NumPy decoder"
+    results = []
+    for idx in range(0, len(hits), batch_size):
+        results += decode_delta_waveforms(hits[idx:idx + batch_size])
+    return results
+
+
+def compare_results(ref_results, new_results):
+    "Return the number of hits whose waveforms do not match"
+    bad = 0
+    for (ref_fadc, ref_atwd), (new_fadc, new_atwd) in zip(ref_results,
+                                                          new_results):
+        if new_fadc is not None:
+            new_fadc = new_fadc.tolist()
+        if new_atwd is not None:
+            new_atwd = [chan.tolist() for chan in new_atwd]
+        if ref_fadc != new_fadc or ref_atwd != new_atwd:
+            bad += 1
+    return bad
+
+
+def bench_delta_codec(args):
+    "Compare the original and NumPy waveform decoders"
+    hits = []
+    for fnm in args.fileList:
+        hits += load_hits(fnm, max_payloads=args.max_payloads)
+
+    if len(hits) == 0:  # pylint: disable=len-as-condition
+        print("No delta-compressed hits found")
+        return
+
+    start = time.time()
+    ref_results = decode_with_delta_codec(hits)
+    ref_secs = time.time() - start
+
+    start = time.time()
+    new_results = decode_in_batches(hits, args.batch_size)
+    new_secs = time.time() - start
+
+    print("Decoded %d hits" % (len(hits), ))
+    print("  delta_codec:            %.3fs (%.0f hits/sec)" %
+          (ref_secs, len(hits) / ref_secs))
+    print("  decode_delta_waveforms: %.3fs (%.0f hits/sec)" %
+          (new_secs, len(hits) / new_secs))
+    print("  speedup: %.1fx" % (ref_secs / new_secs, ))
+
+    bad = compare_results(ref_results, new_results)
+    if bad > 0:
+        print("!! %d of %d hits did not match" % (bad, len(hits)))
+
+
+def time_reader(filename, prefetch, max_payloads=None):
+    """
+    Decode all payloads in the file, returning the number of payloads and
+    the elapsed time
+    """
+    start = time.time()
+    num = 0
+    with PayloadReader(filename, prefetch=prefetch) as rdr:
+        for _ in rdr:
+            num += 1
+            if max_payloads is not None and num >= max_payloads:
+                break
+    return num, time.time() - start
+
+
+def bench_decompress(args):
+    "Compare serial and pipelined decompression of compressed files"
+    for fnm in args.fileList:
+        if not is_compressed(fnm):
+            print("Skipping uncompressed file %s" % (fnm, ))
+            continue
+
+        ser_num, ser_secs = time_reader(fnm, False,
+                                        max_payloads=args.max_payloads)
+        pipe_num, pipe_secs = time_reader(fnm, True,
+                                          max_payloads=args.max_payloads)
+
+        print("%s: %d payloads" % (fnm, ser_num))
+        print("  serial:    %.3fs (%.0f payloads/sec)" %
+              (ser_secs, ser_num / ser_secs))
+        print("  pipelined: %.3fs (%.0f payloads/sec)" %
+              (pipe_secs, pipe_num / pipe_secs))
+        print("  speedup: %.1fx" % (ser_secs / pipe_secs, ))
+        if ser_num != pipe_num:
+            print("!! Pipelined reader found %d payloads" % (pipe_num, ))
+
+
+def main():
+    "Main program"
+
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.benchmark == "decompress":
+        bench_decompress(args)
+    else:
+        bench_delta_codec(args)
+
+
+if __name__ == "__main__":
+    main()
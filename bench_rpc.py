@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""
+Compare the CPU time and number of bytes needed to send MBean dictionaries
+with XML-RPC and the alternate RPC codecs
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import time
+
+from DAQClient import unfix_value
+from RPCCodec import XMLRPCCodec, codec_names, find_codec
+from moni_stream import moni_stream
+
+
+# XML-RPC integer limits
+MININT = -2 ** 31
+MAXINT = 2 ** 31 - 1
+
+
+def add_arguments(parser):
+    "Add command-line arguments"
+
+    parser.add_argument("-H", "--hubs", type=int, dest="num_hubs",
+                        default=86,
+                        help="Number of hub dictionaries in each cycle")
+    parser.add_argument("-n", "--cycles", type=int, dest="cycles",
+                        default=10,
+                        help="Number of monitoring cycles to time")
+    parser.add_argument(dest="fileList", nargs="*",
+                        help=("Hub .moni files used to build dictionaries"
+                              " (if omitted, dictionaries are simulated)"))
+
+
+def fix_value(obj):
+    "Encode longs as strings, as the Java MBean server does for XML-RPC"
+    if isinstance(obj, dict):
+        return {key: fix_value(val) for key, val in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [fix_value(val) for val in obj]
+    if isinstance(obj, int) and not isinstance(obj, bool) and \
+       (obj < MININT or obj > MAXINT):
+        return str(obj)
+    return obj
+
+
+def simulate_hub(hub_num, rand):
+    "Return a simulated stringHub MBean dictionary"
+    utc_time = 300000000000000000 + rand.randrange(10 ** 12)
+
+    beans = {}
+    for chan in range(60):
+        beans["DataCollectorMonitor-%02d%s" % (chan // 2, "AB"[chan % 2])] = {
+            "MainboardId": "%012x" % rand.randrange(1 << 48),
+            "RunLevel": "RUNNING",
+            "NumHits": rand.randrange(10 ** 9),
+            "NumMoni": rand.randrange(10 ** 6),
+            "NumSupernova": rand.randrange(10 ** 6),
+            "NumTcal": rand.randrange(10 ** 6),
+            "LBMOverflowCount": 0,
+            "HitRate": rand.random() * 1000.0,
+            "HitRateLC": rand.random() * 10.0,
+            "FirstHitTime": utc_time,
+            "LastHitTime": utc_time + rand.randrange(10 ** 13),
+            "AcquisitionLoopCount": rand.randrange(10 ** 10),
+        }
+
+    beans["sender"] = {
+        "NumHitsReceived": rand.randrange(10 ** 10),
+        "NumHitsCached": rand.randrange(10 ** 4),
+        "NumReadoutRequestsReceived": rand.randrange(10 ** 6),
+        "NumReadoutsSent": rand.randrange(10 ** 6),
+        "LatestReadoutTime": utc_time,
+        "ReadoutLatency": rand.randrange(10 ** 12),
+    }
+    beans["stringhub"] = {
+        "HubId": hub_num,
+        "NumberOfActiveChannels": 60,
+        "NumberOfActiveAndTotalChannels": [60, 60],
+        "NumberOfNonZombies": 60,
+        "LatestFirstChannelHitTime": utc_time,
+        "EarliestLastChannelHitTime": utc_time + 10 ** 10,
+        "TotalLBMOverflows": 0,
+        "HitRate": rand.random() * 60000.0,
+        "HitRateLC": rand.random() * 600.0,
+    }
+    beans["jvm"] = {
+        "MemoryStatistics": [rand.randrange(10 ** 9), rand.randrange(10 ** 9)],
+        "NumGCs": {"PS Scavenge": rand.randrange(10 ** 5),
+                   "PS MarkSweep": rand.randrange(100)},
+        "GCTime": {"PS Scavenge": rand.randrange(10 ** 8),
+                   "PS MarkSweep": rand.randrange(10 ** 6)},
+    }
+    beans["system"] = {
+        "AvailableDiskSpace": {"/": rand.randrange(10 ** 12),
+                               "/mnt/data": rand.randrange(10 ** 13)},
+        "LoadAverage": [rand.random() for _ in range(3)],
+        "NetworkIO": {"eth0": [rand.randrange(10 ** 12),
+                               rand.randrange(10 ** 12)]},
+    }
+    return beans
+
+
+def load_hubs(filenames):
+    "Build one MBean dictionary from the last values in each .moni file"
+    hubs = []
+    for fnm in filenames:
+        beans = {}
+        for _, bean, field, value in moni_stream(fnm):
+            if bean not in beans:
+                beans[bean] = {}
+            beans[bean][field] = value
+        if len(beans) > 0:  # pylint: disable=len-as-condition
+            hubs.append(beans)
+    return hubs
+
+
+def time_codec(codec, hubs, cycles, fix_longs):
+    """
+    Encode (as the component would) and decode (as CnCServer would) each
+    hub dictionary, returning the encode and decode times and number of
+    bytes per cycle
+    """
+    enc_secs = 0.0
+    dec_secs = 0.0
+    num_bytes = 0
+    for _ in range(cycles):
+        for beans in hubs:
+            start = time.time()
+            if fix_longs:
+                beans = fix_value(beans)
+            data = codec.dumps_response(beans)
+            mid = time.time()
+            result = codec.loads_response(data)
+            if fix_longs:
+                for key, val in result.items():
+                    result[key] = unfix_value(val)
+            end = time.time()
+
+            enc_secs += mid - start
+            dec_secs += end - mid
+            num_bytes += len(data)
+
+    return enc_secs / cycles, dec_secs / cycles, num_bytes // cycles
+
+
+def main():
+    "Main program"
+
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if len(args.fileList) > 0:  # pylint: disable=len-as-condition
+        hubs = load_hubs(args.fileList)
+    else:
+        rand = random.Random(12345)
+        hubs = [simulate_hub(num + 1, rand) for num in range(args.num_hubs)]
+    if len(hubs) == 0:  # pylint: disable=len-as-condition
+        raise SystemExit("No MBean data found")
+
+    print("%d hub dictionaries per cycle, %d cycles" %
+          (len(hubs), args.cycles))
+
+    codecs = [(XMLRPCCodec(), True)]
+    for name in codec_names():
+        codecs.append((find_codec(name), False))
+
+    ref_total = None
+    for codec, fix_longs in codecs:
+        enc_secs, dec_secs, num_bytes = \
+          time_codec(codec, hubs, args.cycles, fix_longs)
+        total = enc_secs + dec_secs
+        if ref_total is None:
+            ref_total = total
+        print("  %-8s encode %.4fs  decode %.4fs  %9d bytes/cycle"
+              "  (%.1fx)" % (codec, enc_secs, dec_secs, num_bytes,
+                             ref_total / total))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ import re
 import sys
 import time
 
+import MoniBinary
+
 MONISEC_PAT = \
     re.compile(r'^(.*):\s+(\d+-\d+-\d+ \d+:\d+:\d+)\.(\d+):\s*$')
 MONILINE_PAT = re.compile(r'^\s+([^:]+):\s+(.*)$')
@@ -267,6 +269,33 @@ class Summary(object):
             self.__last_saved[name] = 0.0
 
 
+def process_binary_file(file_name, flds, summary):
+    """Process the specified binary .moni file"""
+    for datestr, name, pairs in MoniBinary.read_records(file_name):
+        if flds is not None and name not in flds:
+            if name.startswith("DataCollectorMonitor"):
+                name = "DOM"
+            elif name.find("Trigger") < 0:
+                continue
+
+        dot = datestr.find(".")
+        if dot < 0:
+            msec = 0.0
+        else:
+            msec = float(datestr[dot + 1:]) / 1000000.0
+            datestr = datestr[:dot]
+        sec_time = time.mktime(time.strptime(datestr, TIMEFMT)) + msec
+
+        summary.register(name)
+
+        for field, value in pairs:
+            if (name.find("Trigger") > 0 and field == "SentTriggerCount") or \
+               flds is None or (name in flds and flds[name] == field):
+                summary.add(name, sec_time, str(value))
+
+    return summary.data()
+
+
 def process_file(file_name, comp, time_interval):
     """Process the specified file"""
     if comp.name not in COMP_FIELDS:
@@ -276,6 +305,9 @@ def process_file(file_name, comp, time_interval):
 
     summary = Summary(time_interval)
 
+    if MoniBinary.is_binary(file_name):
+        return process_binary_file(file_name, flds, summary)
+
     sec_name = None
     sec_time = None
 
@@ -6,8 +6,11 @@ file, then create a JADE meta.xml file to transfer the HDF5 file North
 
 from __future__ import print_function
 
+import collections
 import datetime
+import io
 import logging
+import multiprocessing
 import os
 import re
 import tarfile
@@ -40,6 +43,19 @@ def add_arguments(parser):
     parser.add_argument("-D", "--data-directory", dest="data_directory",
                         default=".",
                         help="Directory where HDF5 files are written")
+    parser.add_argument("-c", "--chunk-size", type=int, dest="chunk_size",
+                        default=ChunkedHDF5Writer.CHUNK_ROWS,
+                        help=("Number of rows appended to the HDF5 file"
+                              " in each chunk (with --stream)"))
+    parser.add_argument("-j", "--jobs", type=int, dest="jobs",
+                        default=None,
+                        help=("Number of worker processes used to decode"
+                              " monitoring files (with --stream)"))
+    parser.add_argument("-s", "--stream", dest="stream",
+                        action="store_true", default=False,
+                        help=("Read monitoring files directly from the tar"
+                              " file, decode them in parallel and write"
+                              " HDF5 data in chunks"))
     parser.add_argument("-v", "--verbose", dest="verbose",
                         action="store_true", default=False,
                         help="Print more log messages")
@@ -153,6 +169,35 @@ def create_meta_xml(path, suffix, run_number, verbose=False, dry_run=False):
     return metaname
 
 
+def parse_fast_record(pay):
+    """
+    Return the (spe_count, mpe_count, launches, deadtime) values from an
+    IceTop "fast" monitoring record, or None if this is not a valid FAST
+    record
+    """
+    text = pay.text
+    if isinstance(text, bytes):
+        text = text.decode("ascii", "replace")
+
+    if not text.startswith("F "):
+        # only want FAST records
+        return None
+
+    flds = []
+    for tmp in text[2:].split():
+        try:
+            flds.append(int(tmp))
+        except ValueError:
+            logging.error("Bad FAST data \"%s\"", text)
+            return None
+
+    if len(flds) != 4:
+        logging.error("Too many fields in FAST data \"%s\"", text)
+        return None
+
+    return tuple(flds)
+
+
 def process_moni(dom_dict, moniname):
     """
     Return a list of all IceTop "fast" monitoring records in this file
@@ -170,29 +215,17 @@ def process_moni(dom_dict, moniname):
 
             key = "%012x" % pay.dom_id
             if key not in dom_dict:
-                logging.error("Ignoring unknown DOM %012x", key)
+                logging.error("Ignoring unknown DOM %s", key)
                 continue
 
             dom = dom_dict[key]
             if not dom.is_icetop:
                 continue
 
-            if not pay.text.startswith("F "):
-                # only want FAST records
+            flds = parse_fast_record(pay)
+            if flds is None:
                 continue
 
-            flds = []
-            for tmp in pay.text[2:].split():
-                try:
-                    flds.append(int(tmp))
-                except ValueError:
-                    logging.error("Bad FAST data \"%s\"", pay.text)
-                    continue
-
-            if len(flds) != 4:
-                logging.error("Too many fields in FAST data \"%s\"", pay.text)
-                continue
-            # pylint: disable=unbalanced-tuple-unpacking
             (spe_count, mpe_count, launches, deadtime) = flds
             data.append((dom.original_string, dom.pos, spe_count, mpe_count,
                          launches, deadtime, pay.utime))
@@ -200,6 +233,73 @@ def process_moni(dom_dict, moniname):
     return data
 
 
+def build_dom_table(dom_dict):
+    """
+    Return a picklable dictionary mapping each mainboard ID to either
+    an IceTop DOM's (string, position) pair or to None for in-ice DOMs
+    """
+    table = {}
+    for key, dom in dom_dict.items():
+        if dom.is_icetop:
+            table[int(key, 16)] = (dom.original_string, dom.pos)
+        else:
+            table[int(key, 16)] = None
+    return table
+
+
+def decode_moni_bytes(dom_table, moniname, rawdata):
+    """
+    Return a NumPy array containing all IceTop "fast" monitoring records
+    found in the in-memory contents of a .moni file
+    """
+    data = []
+    stream = io.BytesIO(rawdata)
+    while True:
+        pay = payload.PayloadReader.decode_payload(stream)
+        if pay is None:
+            break
+
+        if not isinstance(pay, payload.MonitorRecord):
+            logging.error("Ignoring %s payload %s", moniname, pay)
+            continue
+
+        if pay.subtype != payload.MonitorASCII.SUBTYPE_ID:
+            # only want ASCII records
+            continue
+
+        if pay.dom_id not in dom_table:
+            logging.error("Ignoring unknown DOM %012x", pay.dom_id)
+            continue
+
+        dompos = dom_table[pay.dom_id]
+        if dompos is None:
+            # not an IceTop DOM
+            continue
+
+        flds = parse_fast_record(pay)
+        if flds is None:
+            continue
+
+        data.append(dompos + flds + (pay.utime, ))
+
+    return numpy.array(data, dtype=H5_TYPES)
+
+
+# DOM table used by worker processes, set by init_worker()
+WORKER_DOM_TABLE = None
+
+
+def init_worker(dom_table):
+    "Save the DOM table in each worker process"
+    global WORKER_DOM_TABLE  # pylint: disable=global-statement
+    WORKER_DOM_TABLE = dom_table
+
+
+def decode_moni_worker(moniname, rawdata):
+    "Decode a .moni file inside a worker process"
+    return decode_moni_bytes(WORKER_DOM_TABLE, moniname, rawdata)
+
+
 def process_list(monilist, dom_dict, data_dir=None, verbose=False,
                  dry_run=False, debug=False):
     "Process all .moni files in the list"
@@ -240,10 +340,204 @@ def process_tar_file(tarname, dom_dict, data_dir=None, verbose=False,
     run = None
     data = []
 
+    with tarfile.open(tarname, "r") as tfl:
+        for frun, member_tar, info in iter_moni_infos(tarname, tfl,
+                                                      debug=debug):
+            # if we've got data from another run, write it to a file
+            if run is not None and run != frun:
+                write_data(run, data, data_dir=data_dir, verbose=verbose)
+                del data[:]
+
+            # extract this file from the tarfile
+            member_tar.extract(info)
+
+            try:
+                # save the new data
+                run = frun
+                data += process_moni(dom_dict, info.name)
+            finally:
+                os.unlink(info.name)
+
+    if run is not None:
+        write_data(run, data, data_dir=data_dir, verbose=verbose)
+
+
+def next_hdf5_filename(run, data_dir=None, suffix=".hdf5"):
+    "Return the next unused HDF5 filename for this run"
+
+    # if no destination directory was specified, write to current directory
+    if data_dir is None:
+        data_dir = os.getcwd()
+
+    # assemble the base name for the file
+    now = datetime.datetime.now()
+    basename = "IceTop_%06d_%04d%02d%02d_%02d%02d%02d" % \
+               (run, now.year, now.month, now.day, now.hour, now.minute,
+                now.second)
+    basepath = os.path.join(data_dir, basename)
+
+    # find the next unused filename
+    seq = 0
+    while True:
+        filename = "%s_%d%s" % (basepath, seq, suffix)
+        if not os.path.exists(filename):
+            return filename
+        seq += 1
+
+
+def write_data(run, data, data_dir=None, verbose=False, dry_run=False,
+               make_meta_xml=False):
+    "Write IceTop monitoring data to an HDF5 file"
+
+    # ignore empty arrays
+    if data is None or len(data) == 0:  # pylint: disable=len-as-condition
+        return
+
+    # define file suffix here since we'll need it in a couple of places
+    suffix = ".hdf5"
+
+    filename = next_hdf5_filename(run, data_dir=data_dir, suffix=suffix)
+
+    if verbose:
+        print("Writing %s" % (filename, ))
+
+    # write data
+    if not dry_run:
+        with h5py.File(filename, "w") as out:
+            # create a NumPy array from the data
+            narray = numpy.array(data, dtype=H5_TYPES)
+            # add the data to the file
+            out.create_dataset("FastIceTop", data=narray, chunks=True)
+
+    if make_meta_xml:
+        create_meta_xml(filename, suffix, run, verbose=verbose,
+                        dry_run=dry_run)
+
+
+class ChunkedHDF5Writer(object):
+    """
+    Append IceTop monitoring data for a single run to a resizable HDF5
+    dataset, writing one chunk at a time.  The file is not created until
+    the first row is added.
+    """
+
+    # default number of rows in each chunk
+    CHUNK_ROWS = 65536
+
+    SUFFIX = ".hdf5"
+
+    def __init__(self, run, data_dir=None, chunk_rows=None, verbose=False,
+                 dry_run=False, make_meta_xml=False):
+        if chunk_rows is None:
+            chunk_rows = self.CHUNK_ROWS
+
+        self.__run = run
+        self.__data_dir = data_dir
+        self.__chunk_rows = chunk_rows
+        self.__verbose = verbose
+        self.__dry_run = dry_run
+        self.__make_meta_xml = make_meta_xml
+
+        self.__pending = []
+        self.__num_pending = 0
+        self.__total = 0
+
+        self.__filename = None
+        self.__out = None
+        self.__dataset = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __open(self):
+        "Create the HDF5 file and the (initially empty) dataset"
+        self.__filename = next_hdf5_filename(self.__run,
+                                             data_dir=self.__data_dir,
+                                             suffix=self.SUFFIX)
+        if self.__verbose:
+            print("Writing %s" % (self.__filename, ))
+
+        if not self.__dry_run:
+            self.__out = h5py.File(self.__filename, "w")
+            self.__dataset = \
+                self.__out.create_dataset("FastIceTop", shape=(0, ),
+                                          maxshape=(None, ),
+                                          dtype=numpy.dtype(H5_TYPES),
+                                          chunks=(self.__chunk_rows, ))
+
+    def add(self, rows):
+        "Add a NumPy array of rows, writing a chunk whenever one is full"
+        if len(rows) == 0:  # pylint: disable=len-as-condition
+            return
+
+        self.__pending.append(rows)
+        self.__num_pending += len(rows)
+        if self.__num_pending >= self.__chunk_rows:
+            self.flush()
+
+    def close(self):
+        "Write any remaining rows and close the HDF5 file"
+        self.flush()
+
+        if self.__out is not None:
+            self.__out.close()
+            self.__out = None
+            self.__dataset = None
+
+        if self.__filename is not None and self.__make_meta_xml:
+            create_meta_xml(self.__filename, self.SUFFIX, self.__run,
+                            verbose=self.__verbose, dry_run=self.__dry_run)
+            self.__make_meta_xml = False
+
+    @property
+    def filename(self):
+        "Return the HDF5 file name (or None if nothing has been written)"
+        return self.__filename
+
+    def flush(self):
+        "Append all pending rows to the HDF5 dataset"
+        if self.__num_pending == 0:
+            return
+
+        if self.__filename is None:
+            self.__open()
+
+        if len(self.__pending) == 1:
+            narray = self.__pending[0]
+        else:
+            narray = numpy.concatenate(self.__pending)
+        self.__pending = []
+        self.__num_pending = 0
+
+        if self.__dataset is not None:
+            self.__dataset.resize((self.__total + len(narray), ))
+            self.__dataset[self.__total:] = narray
+        self.__total += len(narray)
+
+    @property
+    def run(self):
+        "Return the run number"
+        return self.__run
+
+    @property
+    def total(self):
+        "Return the number of rows written so far"
+        return self.__total + self.__num_pending
+
+
+def iter_moni_infos(tarname, tfl, debug=False):
+    """
+    Generator which returns (run, tar file, member info) for each
+    monitoring file in the tar file, recursing into JADE .dat.tar files.
+    The returned tar file is the one which holds the member.
+    """
+    saw_run = False
     saw_meta = False
     dat_tar = None
-    tfl = tarfile.open(tarname, "r")
-    for info in tfl.getmembers():
+    for info in tfl:
         if not info.isfile():
             if debug:
                 print("NONFILE[%s] %s" % (tarname, info.name, ))
@@ -254,8 +548,8 @@ def process_tar_file(tarname, dom_dict, data_dir=None, verbose=False,
                 saw_meta = True
                 if debug:
                     print("METAXML[%s] %s" % (tarname, info.name))
-            elif info.name.endswith(".dat.tar") and \
-                 info.name.startswith("SPS-pDAQ-2ndBld-"):
+            elif (info.name.endswith(".dat.tar") and
+                  info.name.startswith("SPS-pDAQ-2ndBld-")):
                 dat_tar = info
                 if debug:
                     print("DAT_TAR[%s] %s" % (tarname, info.name))
@@ -269,87 +563,123 @@ def process_tar_file(tarname, dom_dict, data_dir=None, verbose=False,
                 print("BADNAME[%s] %s" % (tarname, info.name))
             continue
 
-        # get the run number from the file name
-        frun = int(match.group(1))
-
-        # if we've got data from another run, write it to a file
-        if run is not None and run != frun:
-            write_data(run, data, data_dir=data_dir, verbose=verbose)
-            del data[:]
-
-        # extract this file from the tarfile
-        tfl.extract(info)
-
-        try:
-            # save the new data
-            run = frun
-            data += process_moni(dom_dict, info.name)
-        finally:
-            os.unlink(info.name)
-
-    if run is not None:
-        write_data(run, data, data_dir=data_dir, verbose=verbose)
+        saw_run = True
+        yield int(match.group(1)), tfl, info
 
     if saw_meta and dat_tar is not None:
-        # if this looks like a JADE file, extract the .dat.tar and process it
-        if run is not None:
+        # if this looks like a JADE file, process the embedded .dat.tar
+        if saw_run:
             raise Exception("Got run information along with metafile"
                             " and tar datafile")
 
-        # extract tar file containing data
-        tfl.extract(dat_tar)
-
+        subtar = tarfile.open(fileobj=tfl.extractfile(dat_tar), mode="r")
         try:
-            process_tar_file(dat_tar.name, dom_dict, data_dir=data_dir,
-                             verbose=verbose, debug=debug)
+            for entry in iter_moni_infos(dat_tar.name, subtar, debug=debug):
+                yield entry
         finally:
-            os.unlink(dat_tar.name)
+            subtar.close()
 
 
-def write_data(run, data, data_dir=None, verbose=False, dry_run=False,
-               make_meta_xml=False):
-    "Write IceTop monitoring data to an HDF5 file"
+def iter_moni_members(tarname, tfl, debug=False):
+    """
+    Generator which returns (run, member name, file contents) for each
+    monitoring file in the tar file, recursing into JADE .dat.tar files.
+    Files are read directly from the archive without being extracted.
+    """
+    for run, member_tar, info in iter_moni_infos(tarname, tfl, debug=debug):
+        fin = member_tar.extractfile(info)
+        try:
+            rawdata = fin.read()
+        finally:
+            fin.close()
 
-    # ignore empty arrays
-    if data is None or len(data) == 0:  # pylint: disable=len-as-condition
-        return
+        yield run, info.name, rawdata
 
-    # if no destination directory was specified, write to current directory
-    if data_dir is None:
-        data_dir = os.getcwd()
 
-    # define file suffix here since we'll need it in a couple of places
-    suffix = ".hdf5"
+def convert_tar_file(tarname, dom_dict, data_dir=None, processes=None,
+                     chunk_rows=None, verbose=False, debug=False):
+    """
+    Stream all .moni files from the tar file, decode IceTop "fast" records
+    across a pool of worker processes, and append them to one HDF5 file
+    per run.  At most a few files per worker are held in memory at once.
+    Returns the list of HDF5 files written.
+    """
+    dom_table = build_dom_table(dom_dict)
 
-    # assemble the base name for the file
-    now = datetime.datetime.now()
-    basename = "IceTop_%06d_%04d%02d%02d_%02d%02d%02d" % \
-               (run, now.year, now.month, now.day, now.hour, now.minute,
-                now.second)
-    basepath = os.path.join(data_dir, basename)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
 
-    # find the next unused filename
-    seq = 0
-    while True:
-        filename = "%s_%d%s" % (basepath, seq, suffix)
-        if not os.path.exists(filename):
-            break
-        seq += 1
+    if processes > 1:
+        pool = multiprocessing.Pool(processes, initializer=init_worker,
+                                    initargs=(dom_table, ))
+    else:
+        pool = None
+    max_pending = 2 * processes
+
+    written = []
+    writer = None
+    pending = collections.deque()
+    try:
+        with tarfile.open(tarname, "r") as tfl:
+            for run, name, rawdata in iter_moni_members(tarname, tfl,
+                                                        debug=debug):
+                if verbose:
+                    print("Processing %s" % (name, ))
+
+                if pool is None:
+                    pending.append((run, decode_moni_bytes(dom_table, name,
+                                                           rawdata)))
+                else:
+                    pending.append((run, pool.apply_async(decode_moni_worker,
+                                                          (name, rawdata))))
+                del rawdata
+
+                # write results in order, waiting if too many are queued
+                while len(pending) > 0:
+                    if pool is not None and len(pending) < max_pending and \
+                       not pending[0][1].ready():
+                        break
+                    writer = write_chunk(writer, pending.popleft(), written,
+                                         data_dir, chunk_rows, verbose)
+
+        while len(pending) > 0:
+            writer = write_chunk(writer, pending.popleft(), written,
+                                 data_dir, chunk_rows, verbose)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+        if writer is not None:
+            writer.close()
+            if writer.filename is not None:
+                written.append(writer.filename)
+
+    return written
+
+
+def write_chunk(writer, entry, written, data_dir, chunk_rows, verbose):
+    """
+    Add a decoded (run, rows) entry to the HDF5 file for its run, opening a
+    new writer (and closing the old one) when the run number changes.
+    `rows` may be an AsyncResult from a worker pool.  Returns the writer.
+    """
+    run, rows = entry
+    if not isinstance(rows, numpy.ndarray):
+        rows = rows.get()
 
-    if verbose:
-        print("Writing %s" % (filename, ))
+    if writer is not None and writer.run != run:
+        writer.close()
+        if writer.filename is not None:
+            written.append(writer.filename)
+        writer = None
 
-    # write data
-    if not dry_run:
-        with h5py.File(filename, "w") as out:
-            # create a NumPy array from the data
-            narray = numpy.array(data, dtype=H5_TYPES)
-            # add the data to the file
-            out.create_dataset("FastIceTop", data=narray, chunks=True)
+    if writer is None:
+        writer = ChunkedHDF5Writer(run, data_dir=data_dir,
+                                   chunk_rows=chunk_rows, verbose=verbose)
 
-    if make_meta_xml:
-        create_meta_xml(filename, suffix, run, verbose=verbose,
-                        dry_run=dry_run)
+    writer.add(rows)
+    return writer
 
 
 def main():
@@ -374,8 +704,14 @@ def main():
         if args.verbose:
             count += 1
             print("** Processing %d of %d files" % (count, total))
-        process_tar_file(fname, ddict, data_dir=args.data_directory,
-                         verbose=args.verbose)
+        if args.stream:
+            convert_tar_file(fname, ddict, data_dir=args.data_directory,
+                             processes=args.jobs,
+                             chunk_rows=args.chunk_size,
+                             verbose=args.verbose)
+        else:
+            process_tar_file(fname, ddict, data_dir=args.data_directory,
+                             verbose=args.verbose)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+import h5py
+import numpy
+
+from icetop_hdf5 import convert_tar_file, process_tar_file
+from payload import MonitorASCII
+
+
+class FakeDOM(object):
+    def __init__(self, string, pos, is_icetop=True):
+        self.__string = string
+        self.__pos = pos
+        self.__is_icetop = is_icetop
+
+    @property
+    def is_icetop(self):
+        return self.__is_icetop
+
+    @property
+    def original_string(self):
+        return self.__string
+
+    @property
+    def pos(self):
+        return self.__pos
+
+
+class ConvertTarFileTest(unittest.TestCase):
+    RUN_NUMS = (123456, 123457)
+    FILES_PER_RUN = 5
+    RECORDS_PER_FILE = 20
+
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+
+        # two IceTop DOMs and one in-ice DOM
+        self.__dom_ids = (0x123456789abc, 0x23456789abcd, 0x3456789abcde)
+        self.__dom_dict = {
+            "%012x" % self.__dom_ids[0]: FakeDOM(1, 61),
+            "%012x" % self.__dom_ids[1]: FakeDOM(2, 62),
+            "%012x" % self.__dom_ids[2]: FakeDOM(2, 10, is_icetop=False),
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmpdir, ignore_errors=True)
+
+    def __add_member(self, tfl, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        tfl.addfile(info, io.BytesIO(data))
+
+    def __build_tar(self, name="moni.tar"):
+        "Build a tar file full of .moni files and return its path"
+        path = os.path.join(self.__tmpdir, name)
+        utime = 1000
+        with tarfile.open(path, "w") as tfl:
+            for run in self.RUN_NUMS:
+                for seq in range(self.FILES_PER_RUN):
+                    data = []
+                    for num in range(self.RECORDS_PER_FILE):
+                        dom_id = self.__dom_ids[num % len(self.__dom_ids)]
+                        text = "F %d %d %d %d" % (num, num * 2, num * 3,
+                                                  seq)
+                        rec = MonitorASCII(utime, dom_id, utime * 2,
+                                           text.encode("ascii"))
+                        data.append(rec.bytes)
+                        utime += 1
+
+                    name = "moni_%d_%d_0_0.dat" % (run, seq)
+                    self.__add_member(tfl, name, b"".join(data))
+
+            self.__add_member(tfl, "README", b"not a monitoring file")
+        return path
+
+    def __build_jade_tar(self):
+        "Wrap a tar file of .moni files in a JADE-style tar file"
+        datname = self.__build_tar(name="SPS-pDAQ-2ndBld-000.dat.tar")
+        with open(datname, "rb") as fin:
+            datbytes = fin.read()
+
+        path = os.path.join(self.__tmpdir, "jade.tar")
+        with tarfile.open(path, "w") as tfl:
+            self.__add_member(tfl, "SPS-pDAQ-2ndBld-000.meta.xml", b"<DIF/>")
+            self.__add_member(tfl, os.path.basename(datname), datbytes)
+        return path
+
+    @classmethod
+    def __read_rows(cls, written):
+        rows = []
+        for filename in sorted(written):
+            with h5py.File(filename, "r") as hdf:
+                rows.append(hdf["FastIceTop"][:])
+        return rows
+
+    def __convert(self, tarname, processes, subdir):
+        data_dir = os.path.join(self.__tmpdir, subdir)
+        os.mkdir(data_dir)
+
+        written = convert_tar_file(tarname, self.__dom_dict,
+                                   data_dir=data_dir, processes=processes,
+                                   chunk_rows=7)
+        self.assertEqual(len(written), len(self.RUN_NUMS))
+
+        return self.__read_rows(written)
+
+    def __process(self, tarname, subdir):
+        data_dir = os.path.join(self.__tmpdir, subdir)
+        os.mkdir(data_dir)
+
+        # process_tar_file() extracts members into the current directory
+        curdir = os.getcwd()
+        os.chdir(self.__tmpdir)
+        try:
+            process_tar_file(tarname, self.__dom_dict, data_dir=data_dir,
+                             debug=False)
+        finally:
+            os.chdir(curdir)
+
+        written = [os.path.join(data_dir, name)
+                   for name in os.listdir(data_dir)]
+        self.assertEqual(len(written), len(self.RUN_NUMS))
+
+        return self.__read_rows(written)
+
+    def __assert_same_rows(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for xrows, rows in zip(expected, actual):
+            self.assertEqual(xrows.dtype, rows.dtype)
+            self.assertTrue(numpy.array_equal(xrows, rows))
+
+    def test_serial_matches_pooled(self):
+        tarname = self.__build_tar()
+
+        serial = self.__convert(tarname, 1, "serial")
+        pooled = self.__convert(tarname, 3, "pooled")
+
+        # only the IceTop DOMs' records are kept
+        expected = self.FILES_PER_RUN * \
+            len([num for num in range(self.RECORDS_PER_FILE)
+                 if num % len(self.__dom_ids) != 2])
+        for srows in serial:
+            self.assertEqual(len(srows), expected)
+        self.__assert_same_rows(serial, pooled)
+
+        # rows are written in the order they appear in the tar file
+        for rows in serial:
+            self.assertTrue(numpy.all(numpy.diff(rows["UT"]) > 0))
+
+    def test_stream_matches_extract(self):
+        tarname = self.__build_tar()
+
+        self.__assert_same_rows(self.__process(tarname, "extract"),
+                                self.__convert(tarname, 1, "stream"))
+
+    def test_jade_tar(self):
+        tarname = self.__build_jade_tar()
+
+        expected = self.__convert(self.__build_tar(), 1, "plain")
+        self.__assert_same_rows(expected,
+                                self.__process(tarname, "extract"))
+        self.__assert_same_rows(expected,
+                                self.__convert(tarname, 2, "stream"))
+
+
+if __name__ == '__main__':
+    unittest.main()
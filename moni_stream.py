@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 """
-a generator which reads a pDAQ .moni file and returns a stream of tuples
+a generator which reads a pDAQ .moni file (either the text format or the
+binary format from MoniBinary) and returns a stream of tuples
 of (date_string, category, field, value)
 
 Also contains parse_date() which is a method to convert date strings into
@@ -14,6 +15,8 @@ import datetime
 import re
 import sys
 
+import MoniBinary
+
 CATTIME_PAT = re.compile(r"^([^:]+):\s(\d+-\d+-\d+\s\d+:\d+:\d+\.\d+):\s*$")
 
 
@@ -32,6 +35,58 @@ def moni_stream(filename, fix_values=True, fix_profile=False,
       dictionary, a 'Total' entry will be added
 
     """
+    if MoniBinary.is_binary(filename):
+        stream = __binary_stream(filename, fix_values, fix_profile,
+                                 ignored_func, total_fields)
+    else:
+        stream = __text_stream(filename, fix_values, fix_profile,
+                               ignored_func, total_fields)
+    for fields in stream:
+        yield fields
+
+
+def __binary_stream(filename, fix_values, fix_profile, ignored_func,
+                    total_fields):
+    "Return the stream of values from a binary .moni file"
+    for datestr, category, pairs in MoniBinary.read_records(filename):
+        for field, value in pairs:
+            if ignored_func is not None and ignored_func(category, field):
+                continue
+
+            if not fix_values:
+                value = str(value)
+            else:
+                value = __fix_value(field, value, fix_profile, total_fields)
+
+            yield (datestr, category, field, value)
+
+
+def __fix_value(field, value, fix_profile, total_fields):
+    "Apply the 'fix_profile' and 'total_fields' changes to a value"
+
+    # XXX this is a hack
+    is_profile = fix_profile and field == "ProfileTimes"
+
+    if is_profile and isinstance(value, dict):
+        for dkey, dval in list(value.items()):
+            # only keep the "count" field
+            value[dkey] = int(dval[0])
+
+    # should we add a Total entry for this field?
+    add_total = total_fields is not None and field in total_fields
+    if add_total and isinstance(value, dict):
+        try:
+            total = sum(value.values())
+            value["Total"] = total
+        except TypeError:
+            pass
+
+    return value
+
+
+def __text_stream(filename, fix_values, fix_profile, ignored_func,
+                  total_fields):
+    "Return the stream of values from a text .moni file"
     cur_cat = None
     cur_date = None
 
@@ -77,22 +132,7 @@ def moni_stream(filename, fix_values=True, fix_profile=False,
             except SyntaxError:
                 value = valstr
 
-            # XXX this is a hack
-            is_profile = fix_profile and field == "ProfileTimes"
-
-            if is_profile and isinstance(value, dict):
-                for dkey, dval in list(value.items()):
-                    # only keep the "count" field
-                    value[dkey] = int(dval[0])
-
-            # should we add a Total entry for this field?
-            add_total = total_fields is not None and field in total_fields
-            if add_total and isinstance(value, dict):
-                try:
-                    total = sum(value.values())
-                    value["Total"] = total
-                except TypeError:
-                    pass
+            value = __fix_value(field, value, fix_profile, total_fields)
 
         yield (cur_date, cur_cat, field, value)
 
@@ -10,16 +10,42 @@ on daq-dev@icecube.wisc.edu
 from __future__ import print_function
 
 import argparse
+import array
+import bisect
 import bz2
+import fnmatch
 import gzip
+import mmap
+import multiprocessing
 import numbers
 import os
 import struct
+import threading
 
 try:
     from cStringIO import StringIO
 except:  # ModuleNotFoundError only works under 2.7/3.0
-    from io import StringIO
+    from io import BytesIO as StringIO
+
+try:
+    import queue
+except:  # ModuleNotFoundError only works under 2.7/3.0
+    import Queue as queue
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 from i3helper import Comparable
 
@@ -28,6 +54,18 @@ class PayloadException(Exception):
     "Payload exception"
 
 
+# suffixes for all supported compressed file formats
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+
+
+def is_compressed(filename):
+    "Return True if the file name has a compressed file suffix"
+    for sfx in COMPRESSED_SUFFIXES:
+        if filename.endswith(sfx):
+            return True
+    return False
+
+
 # pylint: disable=too-few-public-methods
 class StopMessage(object):
     "Payload used to indicate that an input stream has stopped sending data"
@@ -253,6 +291,16 @@ class SimpleHit(Payload):
         "Mainboard ID as a string"
         return "%012x" % self.__mbid
 
+    @property
+    def source_id(self):
+        "ID of the component which created this hit"
+        return self.__src_id
+
+    @property
+    def trigger_mode(self):
+        "Trigger mode (always the same as the trigger type)"
+        return self.__trig_type
+
     @property
     def trigger_type(self):
         "Trigger flags"
@@ -345,6 +393,224 @@ class delta_codec(object):
         # print("Shifted down to %s %s" % (self.bpw, self.bth))
 
 
+# pylint: disable=invalid-name
+# This is an internal class
+class bulk_delta_codec(object):
+    """
+    NumPy version of `delta_codec` which converts the entire bitstream to
+    a list of 24-bit words up front, then uses a table of precomputed
+    bit groups to decode several samples with each lookup.  Decoded
+    waveforms are returned as NumPy int16 arrays.
+    """
+
+    # word size -> next larger word size
+    SHIFT_UP = {1: 2, 2: 3, 3: 6, 6: 11}
+    # word size -> next smaller word size
+    SHIFT_DOWN = {2: 1, 3: 2, 6: 3, 11: 6}
+    # word size -> threshold below which the word size is reduced
+    THRESHOLD = {1: 0, 2: 1, 3: 2, 6: 4, 11: 32}
+
+    # number of bits examined by each table lookup
+    WINDOW_BITS = 12
+
+    # word size -> list of (deltas, end_positions, next_word_size) entries
+    #  for every possible WINDOW_BITS-bit value
+    __TABLES = None
+
+    def __init__(self, buf):
+        "Unpack the buffer and prepare to decode"
+        if numpy is None:
+            raise PayloadException("NumPy is not installed")
+
+        if bulk_delta_codec.__TABLES is None:
+            bulk_delta_codec.__TABLES = self.__build_tables()
+
+        # pad the data so every window can be extracted from a single word
+        raw = numpy.frombuffer(buf, dtype=numpy.uint8)
+        self.__num_bits = raw.size * 8
+        raw = numpy.concatenate((raw, numpy.zeros(3, dtype=numpy.uint8)))
+        raw = raw.astype(numpy.uint32)
+        self.__words = (raw[:-2] | (raw[1:-1] << 8) |
+                        (raw[2:] << 16)).tolist()
+
+        self.position = 0
+
+    @classmethod
+    def __build_table_entry(cls, bpw, value):
+        """
+        Decode as many complete samples as possible from the bits in `value`
+        """
+        deltas = []
+        ends = []
+        pos = 0
+        while True:
+            nxt = pos
+            nbpw = bpw
+            while True:
+                if nxt + nbpw > cls.WINDOW_BITS:
+                    return tuple(deltas), tuple(ends), bpw
+                wrd = (value >> nxt) & ((1 << nbpw) - 1)
+                nxt += nbpw
+                if wrd != (1 << (nbpw - 1)):
+                    break
+                if nbpw not in cls.SHIFT_UP:
+                    # leave bad data for the slow path to report
+                    return tuple(deltas), tuple(ends), bpw
+                nbpw = cls.SHIFT_UP[nbpw]
+            if wrd > (1 << (nbpw - 1)):
+                wrd -= (1 << nbpw)
+            if abs(wrd) < cls.THRESHOLD[nbpw]:
+                nbpw = cls.SHIFT_DOWN[nbpw]
+            deltas.append(wrd)
+            ends.append(nxt)
+            pos = nxt
+            bpw = nbpw
+
+    @classmethod
+    def __build_tables(cls):
+        "Build the lookup tables for all word sizes"
+        tables = {}
+        for bpw in cls.THRESHOLD:
+            tables[bpw] = [cls.__build_table_entry(bpw, val)
+                           for val in range(1 << cls.WINDOW_BITS)]
+        return tables
+
+    def decode(self, length):
+        "Decode the specified number of values"
+        deltas = []
+        self.decode_deltas(length, deltas)
+        return numpy.cumsum(deltas, dtype=numpy.int32).astype(numpy.int16)
+
+    def decode_deltas(self, length, deltas):
+        """
+        Decode the specified number of values and append the raw
+        deltas to `deltas`
+        """
+        tables = self.__TABLES
+        words = self.__words
+        mask = (1 << self.WINDOW_BITS) - 1
+
+        bpw = 3
+        pos = self.position
+        remaining = length
+        while remaining > 0:
+            if pos >= self.__num_bits:
+                raise PayloadException("Delta-compressed data is truncated")
+
+            window = (words[pos >> 3] >> (pos & 7)) & mask
+            found, ends, next_bpw = tables[bpw][window]
+
+            num = len(found)
+            if num > remaining:
+                deltas.extend(found[:remaining])
+                pos += ends[remaining - 1]
+                break
+            if num > 0:
+                deltas.extend(found)
+                pos += ends[-1]
+                bpw = next_bpw
+                remaining -= num
+                continue
+
+            # this sample doesn't fit in a single window
+            while True:
+                if pos + bpw > self.__num_bits:
+                    raise PayloadException("Delta-compressed data is"
+                                           " truncated")
+                wrd = (words[pos >> 3] >> (pos & 7)) & ((1 << bpw) - 1)
+                pos += bpw
+                if wrd != (1 << (bpw - 1)):
+                    break
+                if bpw not in self.SHIFT_UP:
+                    raise ValueError("Bad BPW value %d" % bpw)
+                bpw = self.SHIFT_UP[bpw]
+            if wrd > (1 << (bpw - 1)):
+                wrd -= (1 << bpw)
+            if abs(wrd) < self.THRESHOLD[bpw]:
+                bpw = self.SHIFT_DOWN[bpw]
+            deltas.append(wrd)
+            remaining -= 1
+
+        if pos > self.__num_bits:
+            raise PayloadException("Delta-compressed data is truncated")
+        self.position = pos
+
+
+def decode_delta_waveforms(hits):
+    """
+    Decode the waveforms for a batch of DeltaCompressedHit payloads with
+    a single `bulk_delta_codec`, returning a list of (fadc, atwd) pairs
+    where `fadc` is an int16 array (or None) and `atwd` is a list of
+    int16 arrays, one per ATWD channel (or None)
+    """
+    chunks = []
+    for hit in hits:
+        chunks.append(hit.data_bytes[38:])
+
+    codec = bulk_delta_codec(b"".join(chunks))
+
+    # decode all deltas into a single list, remembering where each
+    #  waveform starts
+    deltas = []
+    starts = []
+    layout = []
+    offset = 0
+    for hit, chunk in zip(hits, chunks):
+        codec.position = offset
+        offset += len(chunk) * 8
+
+        has_fadc = hit.has_fadc
+        if has_fadc:
+            starts.append(len(deltas))
+            codec.decode_deltas(256, deltas)
+
+        num_atwd = 0
+        if hit.has_atwd:
+            num_atwd = hit.atwd_channels + 1
+            for _ in range(num_atwd):
+                starts.append(len(deltas))
+                codec.decode_deltas(128, deltas)
+
+        # don't let a truncated or corrupt hit run into the next hit's data
+        if codec.position > offset:
+            raise PayloadException("Delta-compressed data is truncated"
+                                   " for %s" % (hit, ))
+
+        layout.append((has_fadc, num_atwd))
+
+    if len(starts) == 0:  # pylint: disable=len-as-condition
+        return [(None, None) for _ in hits]
+
+    # convert the deltas for every waveform with a single cumulative sum
+    sums = numpy.cumsum(deltas, dtype=numpy.int32)
+    starts = numpy.array(starts, dtype=numpy.int64)
+    bases = numpy.zeros(len(starts), dtype=numpy.int32)
+    bases[1:] = sums[starts[1:] - 1]
+    lengths = numpy.diff(numpy.append(starts, len(deltas)))
+    values = (sums - numpy.repeat(bases, lengths)).astype(numpy.int16)
+
+    bounds = starts.tolist() + [len(deltas), ]
+    waves = [values[bounds[idx]:bounds[idx + 1]]
+             for idx in range(len(bounds) - 1)]
+
+    results = []
+    widx = 0
+    for has_fadc, num_atwd in layout:
+        fadc = None
+        if has_fadc:
+            fadc = waves[widx]
+            widx += 1
+
+        atwd = None
+        if num_atwd > 0:
+            atwd = waves[widx:widx + num_atwd]
+            widx += num_atwd
+
+        results.append((fadc, atwd))
+
+    return results
+
+
 class HitPayload(Payload):
     "Superclass for all hit payloads"
 
@@ -354,9 +620,9 @@ class HitPayload(Payload):
     @property
     def simple_hit(self):
         "Return the simplified version of this hit"
-        return struct.pack(">2iq3iqh", 38, self.payload_type_id(), self.utime,
-                           self.trigger_type, self.config_id, self.source_id,
-                           self.mbid, self.trigger_mode)
+        return struct.pack(">2iq3iqh", SimpleHit.MIN_LENGTH, SimpleHit.TYPE_ID,
+                           self.utime, self.trigger_type, self.config_id,
+                           self.source_id, self.mbid, self.trigger_mode)
 
     @property
     def config_id(self):
@@ -588,7 +854,10 @@ class DeltaCompressedHit(HitPayload):
 
 
 class EventV5(Payload):
-    "Standard event payload"
+    """
+    Standard event payload.  Hit and trigger records are only decoded
+    when they're first accessed.
+    """
 
     TYPE_ID = 21
     MIN_LENGTH = 18
@@ -611,31 +880,43 @@ class EventV5(Payload):
         self.__run = hdr[3]
         self.__subrun = hdr[4]
 
-        offset = 18
-        self.__hit_records, offset = self.__load_hit_records(utime, data,
-                                                             offset)
-        self.__trig_records, offset = self.__load_trig_records(utime, data,
-                                                               offset)
+        # keep a reference to the buffer so records can be decoded later
+        self.__rawdata = data
+        self.__num_hits = struct.unpack(">I", data[18:22])[0]
+        self.__num_trigs = None
+        self.__trig_offset = None
+
+        self.__hit_records = None
+        self.__trig_records = None
 
     def __str__(self):
         "Payload description"
         return "EventV5[#%d [%d-%d] yr %d run %d hitRecs*%d" \
             " trigRecs*%d]" % \
             (self.uid, self.start_time, self.stop_time, self.year,
-             self.run, len(self.__hit_records), len(self.__trig_records))
+             self.run, self.hit_count, self.trigger_count)
+
+    def __find_trigger_records(self):
+        "Skip over the hit records to find the start of the trigger records"
+        if self.__trig_offset is not None:
+            return
+
+        data = self.__rawdata
+        offset = 22
+        for _ in range(self.__num_hits):
+            reclen = struct.unpack_from(">H", data, offset)[0]
+            offset += max(reclen, BaseHitRecord.HEADER_LEN)
+
+        self.__num_trigs = struct.unpack_from(">I", data, offset)[0]
+        self.__trig_offset = offset + 4
 
     @staticmethod
-    def __load_hit_records(base_time, data, offset):
+    def __load_hit_records(base_time, data, offset, num_recs):
         "Return all the hit records"
 
-        # extract the number of hit records
-        num_recs = struct.unpack(">I", data[offset:offset+4])[0]
-        offset += 4
-
         recs = []
         for _ in range(num_recs):
-            hdrdata = data[offset:offset+BaseHitRecord.HEADER_LEN]
-            rechdr = struct.unpack(">HBBHI", hdrdata)
+            rechdr = struct.unpack_from(">HBBHI", data, offset)
             if rechdr[1] == EngineeringHitRecord.TYPE_ID:
                 rec = EngineeringHitRecord(base_time, rechdr, data,
                                            offset + BaseHitRecord.HEADER_LEN)
@@ -649,42 +930,54 @@ class EventV5(Payload):
             recs.append(rec)
             offset += len(rec)
 
-        return recs, offset
+        return recs
 
     @staticmethod
-    def __load_trig_records(base_time, data, offset):
+    def __load_trig_records(base_time, data, offset, num_recs):
         "Return all the trigger records"
 
-        # extract the number of trigger records
-        num_recs = struct.unpack(">I", data[offset:offset+4])[0]
-        offset += 4
-
         recs = []
         for _ in range(num_recs):
-            offend = offset + TriggerRecord.HEADER_LEN
-            rechdr = struct.unpack(">6i", data[offset:offend])
+            rechdr = struct.unpack_from(">6i", data, offset)
             rec = TriggerRecord(base_time, rechdr, data,
                                 offset + TriggerRecord.HEADER_LEN)
             recs.append(rec)
             offset += len(rec)
 
-        return recs, offset
+        return recs
+
+    def __hits(self):
+        "Return the list of hit records, decoding them if necessary"
+        if self.__hit_records is None:
+            self.__hit_records = \
+              self.__load_hit_records(self.utime, self.__rawdata, 22,
+                                      self.__num_hits)
+        return self.__hit_records
+
+    def __triggers(self):
+        "Return the list of trigger records, decoding them if necessary"
+        if self.__trig_records is None:
+            self.__find_trigger_records()
+            self.__trig_records = \
+              self.__load_trig_records(self.utime, self.__rawdata,
+                                       self.__trig_offset, self.__num_trigs)
+        return self.__trig_records
 
     def hit(self, idx):
         "Return the requested hit record, or None if the index is not valid"
-        if idx < 0 or idx >= len(self.__hit_records):
+        if idx < 0 or idx >= self.__num_hits:
             return None
-        return self.__hit_records[idx]
+        return self.__hits()[idx]
 
     @property
     def hit_count(self):
         "Return count of hit records"
-        return len(self.__hit_records)
+        return self.__num_hits
 
     @property
     def hits(self):
         "Return list of hit records"
-        return self.__hit_records[:]
+        return self.__hits()[:]
 
     @property
     def run(self):
@@ -709,12 +1002,13 @@ class EventV5(Payload):
     @property
     def trigger_count(self):
         "Return count of trigger records"
-        return len(self.__trig_records)
+        self.__find_trigger_records()
+        return self.__num_trigs
 
     @property
     def triggers(self):
         "Return list of trigger records"
-        return self.__trig_records[:]
+        return self.__triggers()[:]
 
     @property
     def uid(self):
@@ -731,17 +1025,17 @@ class BaseHitRecord(object):
     "Generic hit record class"
     HEADER_LEN = 10
 
+    __slots__ = ("__flags", "__chan_id", "__utime", "__length")
+
+    # pylint: disable=unused-argument
     def __init__(self, base_time, hdr, data, offset):
         self.__flags = hdr[2]
         self.__chan_id = hdr[3]
         self.__utime = base_time + hdr[4]
-        if hdr[0] == self.HEADER_LEN:
-            self.__data = []
-        else:
-            self.__data = data[offset+10:offset+hdr[0]]
+        self.__length = max(hdr[0], self.HEADER_LEN)
 
     def __len__(self):
-        return self.HEADER_LEN + len(self.__data)
+        return self.__length
 
     def __str__(self):
         return "%d@%d[flags %x]" % (self.__chan_id, self.__utime, self.__flags)
@@ -766,11 +1060,15 @@ class DeltaHitRecord(BaseHitRecord):
     "Delta-compressed hit record inside V5 event payload"
     TYPE_ID = 1
 
+    __slots__ = ()
+
 
 class EngineeringHitRecord(BaseHitRecord):
     "Engineering hit record inside V5 event payload"
     TYPE_ID = 0
 
+    __slots__ = ()
+
 
 # pylint: disable=too-few-public-methods
 class Monitor(object):
@@ -1115,19 +1413,18 @@ class TriggerRecord(object):
     "Encoded trigger request inside V5 event payload"
     HEADER_LEN = 24
 
+    __slots__ = ("__type", "__config_id", "__source_id", "__start_time",
+                 "__end_time", "__hit_index")
+
     def __init__(self, base_time, hdr, data, offset):
         self.__type = hdr[0]
         self.__config_id = hdr[1]
         self.__source_id = hdr[2]
         self.__start_time = base_time + hdr[3]
         self.__end_time = base_time + hdr[4]
-        self.__hit_index = []
 
-        num = hdr[5]
-        for _ in range(num):
-            idx = struct.unpack(">I", data[offset:offset+4])
-            self.__hit_index.append(idx[0])
-            offset += 4
+        num = max(hdr[5], 0)
+        self.__hit_index = struct.unpack_from(">%dI" % (num, ), data, offset)
 
     def __len__(self):
         return self.HEADER_LEN + (len(self.__hit_index) * 4)
@@ -1180,26 +1477,340 @@ class TriggerRecord(object):
         return self.__type
 
 
+class PayloadIndex(object):
+    """
+    Sparse index mapping payload times to file offsets, sampled every
+    `interval` payloads.  The index can be saved to a sidecar file next to
+    the payload file and is considered stale if the payload file's size
+    or modification time changes.
+    """
+
+    MAGIC = b"PDAQIDX1"
+    HEADER_FORMAT = ">8sIIQd"
+    HEADER_LENGTH = struct.calcsize(HEADER_FORMAT)
+    SUFFIX = ".idx"
+
+    def __init__(self, interval, size, mtime, times, offsets):
+        self.__interval = interval
+        self.__size = size
+        self.__mtime = mtime
+        self.__times = times
+        self.__offsets = offsets
+
+    def __len__(self):
+        return len(self.__times)
+
+    @classmethod
+    def build(cls, filename, interval):
+        "Scan the envelopes in a payload file and build an index"
+        stat = os.stat(filename)
+
+        times = []
+        offsets = []
+        with PayloadReader.open_file(filename) as fin:
+            seekable = not is_compressed(filename)
+
+            num = 0
+            offset = 0
+            while True:
+                envelope = fin.read(Payload.ENVELOPE_LENGTH)
+                if len(envelope) < Payload.ENVELOPE_LENGTH:
+                    break
+
+                length, type_id, utime = struct.unpack(">iiq", envelope)
+                if length < Payload.ENVELOPE_LENGTH:
+                    # found a StopMessage or a corrupted payload
+                    break
+
+                body_len = length - Payload.ENVELOPE_LENGTH
+                if type_id == DeltaCompressedHit.TYPE_ID:
+                    # envelope holds the mainboard ID, the time is in the body
+                    body = fin.read(16)
+                    if len(body) < 16:
+                        break
+                    utime, = struct.unpack(">Q", body[8:16])
+                    body_len -= 16
+
+                if num % interval == 0:
+                    times.append(utime)
+                    offsets.append(offset)
+
+                if seekable:
+                    fin.seek(body_len, os.SEEK_CUR)
+                else:
+                    fin.read(body_len)
+
+                num += 1
+                offset += length
+
+        return cls(interval, stat.st_size, stat.st_mtime, times, offsets)
+
+    def find_offset(self, utime):
+        """
+        Return the offset of a payload which precedes any payload whose time
+        is equal to or later than `utime` (assumes payloads are time-ordered)
+        """
+        idx = bisect.bisect_left(self.__times, utime) - 1
+        if idx < 0:
+            return 0
+        return self.__offsets[idx]
+
+    @property
+    def interval(self):
+        "Number of payloads between index entries"
+        return self.__interval
+
+    def is_current(self, filename):
+        "Return True if this index matches the current payload file"
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return False
+
+        return stat.st_size == self.__size and stat.st_mtime == self.__mtime
+
+    @classmethod
+    def load(cls, filename, interval):
+        """
+        Return the sidecar index for `filename`, building and saving a new
+        one if the sidecar file is missing or stale
+        """
+        idxpath = filename + cls.SUFFIX
+
+        index = cls.read(idxpath)
+        if index is not None and index.interval == interval and \
+           index.is_current(filename):
+            return index
+
+        index = cls.build(filename, interval)
+        try:
+            index.write(idxpath)
+        except (IOError, OSError):
+            # data directory may not be writable; use the in-memory index
+            pass
+        return index
+
+    @classmethod
+    def read(cls, path):
+        "Read an index from a sidecar file, returning None if it's not valid"
+        try:
+            with open(path, "rb") as fin:
+                hdr = fin.read(cls.HEADER_LENGTH)
+                if len(hdr) != cls.HEADER_LENGTH:
+                    return None
+
+                magic, interval, count, size, mtime = \
+                  struct.unpack(cls.HEADER_FORMAT, hdr)
+                if magic != cls.MAGIC:
+                    return None
+
+                body = fin.read(count * 16)
+        except (IOError, OSError):
+            return None
+
+        if len(body) != count * 16:
+            return None
+
+        flds = struct.unpack(">%dQ" % (count * 2, ), body)
+        return cls(interval, size, mtime, list(flds[0::2]),
+                   list(flds[1::2]))
+
+    def write(self, path):
+        "Save this index to a sidecar file"
+        count = len(self.__times)
+
+        flds = []
+        for utime, offset in zip(self.__times, self.__offsets):
+            flds.append(utime)
+            flds.append(offset)
+
+        tmppath = path + ".tmp"
+        with open(tmppath, "wb") as out:
+            out.write(struct.pack(self.HEADER_FORMAT, self.MAGIC,
+                                  self.__interval, count, self.__size,
+                                  self.__mtime))
+            out.write(struct.pack(">%dQ" % (count * 2, ), *flds))
+        os.rename(tmppath, path)
+
+
+class PrefetchingReader(object):
+    """
+    File-like wrapper which reads large blocks from another file object on
+    a background thread and hands them to the caller through a bounded
+    queue.  When the underlying file object decompresses its data, the
+    decompression (which releases the GIL) overlaps with payload decoding
+    on the caller's thread.
+    """
+
+    BLOCK_SIZE = 1024 * 1024
+    MAX_BLOCKS = 8
+
+    def __init__(self, fin, block_size=BLOCK_SIZE, max_blocks=MAX_BLOCKS):
+        self.__fin = fin
+        self.__block_size = block_size
+        self.__max_blocks = max_blocks
+
+        self.__block = b""
+        self.__block_pos = 0
+        self.__block_offset = 0
+        self.__eof = False
+
+        self.__queue = None
+        self.__stopped = None
+        self.__thread = None
+        self.__start_thread()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __next_block(self):
+        "Fetch the next block from the background thread"
+        self.__block_offset += len(self.__block)
+        self.__block_pos = 0
+
+        block = self.__queue.get()
+        if isinstance(block, Exception):
+            self.__eof = True
+            self.__block = b""
+            raise block
+        if len(block) == 0:  # pylint: disable=len-as-condition
+            self.__eof = True
+        self.__block = block
+
+    def __prefetch(self, fin, blkqueue, stopped):
+        "Background thread which reads blocks until EOF or until stopped"
+        while not stopped.is_set():
+            try:
+                block = fin.read(self.__block_size)
+            except Exception as exc:  # pylint: disable=broad-except
+                block = exc
+
+            while not stopped.is_set():
+                try:
+                    blkqueue.put(block, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+            if isinstance(block, Exception) or \
+               len(block) == 0:  # pylint: disable=len-as-condition
+                break
+
+    def __start_thread(self):
+        "Start reading blocks from the current position of the file"
+        self.__queue = queue.Queue(self.__max_blocks)
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target=self.__prefetch,
+                                         name="PayloadPrefetch",
+                                         args=(self.__fin, self.__queue,
+                                               self.__stopped))
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __stop_thread(self):
+        "Stop the background thread and discard any queued blocks"
+        if self.__thread is None:
+            return
+
+        self.__stopped.set()
+        while self.__thread.is_alive():
+            try:
+                self.__queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+            self.__thread.join(0.1)
+        self.__thread = None
+
+    def close(self):
+        "Stop the background thread and close the file"
+        if self.__fin is not None:
+            try:
+                self.__stop_thread()
+            finally:
+                self.__fin.close()
+                self.__fin = None
+
+    def read(self, size=-1):
+        "Read up to `size` bytes (or everything, if `size` is negative)"
+        pieces = []
+        while size != 0:
+            avail = len(self.__block) - self.__block_pos
+            if avail == 0:
+                if self.__eof:
+                    break
+                self.__next_block()
+                continue
+
+            if size < 0 or size >= avail:
+                num = avail
+            else:
+                num = size
+
+            pieces.append(self.__block[self.__block_pos:
+                                       self.__block_pos + num])
+            self.__block_pos += num
+            if size > 0:
+                size -= num
+
+        if len(pieces) == 1:
+            return pieces[0]
+        return b"".join(pieces)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        "Move to a new position in the file"
+        if whence == os.SEEK_CUR:
+            offset += self.tell()
+        elif whence != os.SEEK_SET:
+            raise PayloadException("Unsupported seek mode %s" % (whence, ))
+
+        # don't restart the thread if the position is in the current block
+        if self.__block_offset <= offset <= \
+           self.__block_offset + len(self.__block):
+            self.__block_pos = offset - self.__block_offset
+            return offset
+
+        self.__stop_thread()
+        self.__fin.seek(offset)
+        self.__block = b""
+        self.__block_pos = 0
+        self.__block_offset = offset
+        self.__eof = False
+        self.__start_thread()
+        return offset
+
+    def tell(self):
+        "Return the current position in the file"
+        return self.__block_offset + self.__block_pos
+
+
 class PayloadReader(object):
     "Read DAQ payloads from a file"
-    def __init__(self, filename, keep_data=True):
+
+    # default number of payloads between entries in the sidecar index
+    INDEX_INTERVAL = 1000
+
+    def __init__(self, filename, keep_data=True, prefetch=None):
         """
-        Open a payload file
+        Open a payload file.  If `prefetch` is True (the default for
+        compressed files), blocks are read and decompressed on a background
+        thread while payloads are decoded.
         """
         if not os.path.exists(filename):
             raise PayloadException("Cannot read \"%s\"" % filename)
 
-        if filename.endswith(".gz"):
-            fin = gzip.open(filename, "rb")
-        elif filename.endswith(".bz2"):
-            fin = bz2.BZ2File(filename)
-        else:
-            fin = open(filename, "rb")
+        if prefetch is None:
+            prefetch = is_compressed(filename)
 
         self.__filename = filename
-        self.__fin = fin
+        self.__fin = self.open_file(filename)
+        if prefetch:
+            self.__fin = PrefetchingReader(self.__fin)
         self.__keep_data = keep_data
         self.__num_read = 0
+        self.__index = None
 
     def __enter__(self):
         """
@@ -1261,6 +1872,62 @@ class PayloadReader(object):
         "Name of file being read"
         return self.__filename
 
+    def index(self, interval=None):
+        """
+        Return the sidecar index for this file, building (and saving)
+        it if necessary
+        """
+        if interval is None:
+            interval = self.INDEX_INTERVAL
+
+        if self.__index is None or self.__index.interval != interval or \
+           not self.__index.is_current(self.__filename):
+            self.__index = PayloadIndex.load(self.__filename, interval)
+
+        return self.__index
+
+    @staticmethod
+    def open_file(filename):
+        "Open a (possibly compressed) payload file"
+        if filename.endswith(".gz"):
+            return gzip.open(filename, "rb")
+        if filename.endswith(".bz2"):
+            return bz2.BZ2File(filename)
+        if filename.endswith(".xz"):
+            if lzma is None:
+                raise PayloadException("Cannot read \"%s\"; lzma module"
+                                       " is not installed" % (filename, ))
+            return lzma.open(filename, "rb")
+        if filename.endswith(".zst"):
+            if zstandard is None:
+                raise PayloadException("Cannot read \"%s\"; zstandard"
+                                       " module is not installed" %
+                                       (filename, ))
+            return zstandard.ZstdDecompressor().stream_reader(
+                open(filename, "rb"), closefd=True)
+        return open(filename, "rb")
+
+    def read_range(self, start_tick, stop_tick, interval=None):
+        """
+        Generator which returns all payloads with times between `start_tick`
+        and `stop_tick` (inclusive), using the sidecar index to skip
+        directly to the first payload.  Payloads must be time-ordered.
+        Note that this moves the reader's file position.
+        """
+        if self.__fin is None:
+            raise PayloadException("File \"%s\" has been closed" %
+                                   self.__filename)
+
+        offset = self.index(interval=interval).find_offset(start_tick)
+        self.__fin.seek(offset)
+
+        while self.__fin is not None:
+            pay = next(self)
+            if pay is None or pay.utime > stop_tick:
+                return
+            if pay.utime >= start_tick:
+                yield pay
+
     @classmethod
     def decode_payload(cls, stream, keep_data=True):
         """
@@ -1276,6 +1943,13 @@ class PayloadReader(object):
         else:
             rawdata = stream.read(length - Payload.ENVELOPE_LENGTH)
 
+        return cls.build_payload(type_id, utime, rawdata, keep_data=keep_data)
+
+    @classmethod
+    def build_payload(cls, type_id, utime, rawdata, keep_data=True):
+        """
+        Build a payload from the envelope fields and the remaining data bytes
+        """
         if type_id == SimpleHit.TYPE_ID:
             pay = SimpleHit(utime, rawdata, keep_data=keep_data)
         elif type_id == DeltaCompressedHit.TYPE_ID:
@@ -1297,22 +1971,916 @@ class PayloadReader(object):
     next = __next__  # XXX backward compatibility for Python 2
 
 
-def read_file(filename, max_payloads, write_simple_hits=False):
+class MappedPayloadReader(object):
+    """
+    Memory-map an uncompressed payload file and build a columnar index
+    (NumPy arrays of file offsets, lengths, payload types and times)
+    with a single pass over the envelopes.  Payloads are only built when
+    they're requested, and are decoded directly from `memoryview` slices
+    of the mapped file.
+    """
+
+    def __init__(self, filename, keep_data=True):
+        """
+        Map a payload file and index its contents
+        """
+        if numpy is None:
+            raise PayloadException("NumPy is not installed")
+        if not os.path.exists(filename):
+            raise PayloadException("Cannot read \"%s\"" % filename)
+        if is_compressed(filename):
+            raise PayloadException("Cannot map compressed file \"%s\"" %
+                                   filename)
+
+        self.__filename = filename
+        self.__keep_data = keep_data
+        self.__num_read = 0
+
+        with open(filename, "rb") as fin:
+            if os.fstat(fin.fileno()).st_size == 0:
+                self.__mmap = None
+                self.__view = memoryview(b"")
+            else:
+                self.__mmap = mmap.mmap(fin.fileno(), 0,
+                                        access=mmap.ACCESS_READ)
+                self.__view = memoryview(self.__mmap)
+
+        (self.__offsets, self.__lengths, self.__types,
+         self.__utimes) = self.build_index(self.__view)
+
+    def __enter__(self):
+        """
+        Return this object as a context manager to used as
+        `with MappedPayloadReader(filename) as payrdr:`
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Unmap the file when the context manager exits
+        """
+        self.close()
+
+    def __getitem__(self, idx):
+        "Return the payload at index `idx`"
+        return self.payload(idx)
+
+    def __iter__(self):
+        """
+        Generator which returns payloads in `for payload in payrdr:` loops
+        """
+        for idx in range(len(self.__offsets)):
+            if self.__view is None:
+                # generator has been explicitly closed
+                return
+            self.__num_read += 1
+            yield self.payload(idx)
+
+    def __len__(self):
+        return len(self.__offsets)
+
+    @staticmethod
+    def build_index(view):
+        """
+        Walk through all the payload envelopes in a buffer and return arrays
+        of offsets, lengths, types and times
+        """
+        offsets = array.array("q")
+        lengths = array.array("i")
+        types = array.array("i")
+        utimes = array.array("q")
+
+        unpack_from = struct.unpack_from
+        total = len(view)
+        offset = 0
+        while offset + Payload.ENVELOPE_LENGTH <= total:
+            length, type_id, utime = unpack_from(">iiq", view, offset)
+            if length < Payload.ENVELOPE_LENGTH:
+                if length == 4:
+                    # found a StopMessage
+                    break
+                raise PayloadException("Bad length %d for payload #%d" %
+                                       (length, len(offsets)))
+            if offset + length > total:
+                raise PayloadException("Payload #%d at offset %d is"
+                                       " truncated" % (len(offsets), offset))
+
+            if type_id == DeltaCompressedHit.TYPE_ID:
+                # envelope holds the mainboard ID, the time is in the body
+                utime, = unpack_from(">Q", view,
+                                     offset + Payload.ENVELOPE_LENGTH + 8)
+
+            offsets.append(offset)
+            lengths.append(length)
+            types.append(type_id)
+            utimes.append(utime)
+
+            offset += length
+
+        return (numpy.frombuffer(offsets, dtype=numpy.int64),
+                numpy.frombuffer(lengths, dtype=numpy.int32),
+                numpy.frombuffer(types, dtype=numpy.int32),
+                numpy.frombuffer(utimes, dtype=numpy.int64))
+
+    def close(self):
+        """
+        Release the mapped file.  If any payloads still hold slices of the
+        file, the mapping is released when the last of them is deleted.
+        """
+        if self.__view is not None:
+            try:
+                self.__view.release()
+            except BufferError:
+                pass
+            self.__view = None
+        if self.__mmap is not None:
+            try:
+                self.__mmap.close()
+            except BufferError:
+                pass
+            self.__mmap = None
+
+    @property
+    def filename(self):
+        "Name of file being read"
+        return self.__filename
+
+    @property
+    def lengths(self):
+        "Array of payload lengths (including the envelope)"
+        return self.__lengths
+
+    @property
+    def nrec(self):
+        "Number of payloads read to this point"
+        return self.__num_read
+
+    @property
+    def offsets(self):
+        "Array of file offsets for each payload"
+        return self.__offsets
+
+    def payload(self, idx):
+        "Build and return the payload at index `idx`"
+        if self.__view is None:
+            raise PayloadException("File \"%s\" has been closed" %
+                                   self.__filename)
+
+        offset = int(self.__offsets[idx])
+        length = int(self.__lengths[idx])
+        type_id = int(self.__types[idx])
+
+        _, _, utime = struct.unpack_from(">iiq", self.__view, offset)
+        if length <= Payload.ENVELOPE_LENGTH:
+            rawdata = None
+        else:
+            rawdata = self.__view[offset + Payload.ENVELOPE_LENGTH:
+                                  offset + length]
+
+        return PayloadReader.build_payload(type_id, utime, rawdata,
+                                           keep_data=self.__keep_data)
+
+    @property
+    def raw_bytes(self):
+        """
+        NumPy uint8 array backed by the mapped file.  The mapping is not
+        released until the array has been deleted.
+        """
+        if self.__view is None:
+            raise PayloadException("File \"%s\" has been closed" %
+                                   self.__filename)
+        return numpy.frombuffer(self.__view, dtype=numpy.uint8)
+
+    @property
+    def types(self):
+        "Array of payload type IDs"
+        return self.__types
+
+    @property
+    def utimes(self):
+        "Array of payload times (for hits, the time from the hit body)"
+        return self.__utimes
+
+
+# fields in the NumPy structured arrays returned by to_records()
+HIT_RECORD_FIELDS = [("utime", "i8"), ("mbid", "i8"), ("trigger_type", "i4"),
+                     ("config_id", "i4"), ("source_id", "i4"),
+                     ("trigger_mode", "i2")]
+EVENT_RECORD_FIELDS = [("uid", "i8"), ("run", "i4"), ("subrun", "i4"),
+                       ("year", "i2"), ("start_time", "i8"),
+                       ("stop_time", "i8"), ("hit_count", "i4"),
+                       ("trigger_count", "i4")]
+
+
+def gather_integers(raw, offsets, dtype):
+    """
+    Extract an integer of type `dtype` (e.g. ">i8") from the bytes at each
+    offset in the uint8 array `raw`
+    """
+    nbytes = numpy.dtype(dtype).itemsize
+    idx = offsets[:, None] + numpy.arange(nbytes)
+    return raw[idx].view(dtype).ravel()
+
+
+# pylint: disable=unused-argument
+def mapped_hit_records(raw, offsets, lengths, types, utimes):
+    """
+    Build an array of HIT_RECORD_FIELDS records for all the hits
+    (DeltaCompressedHits and SimpleHits) in the payload buffer `raw`, given
+    arrays from a MappedPayloadReader index
+    """
+    is_delta = types == DeltaCompressedHit.TYPE_ID
+    is_simple = types == SimpleHit.TYPE_ID
+    keep = is_delta | is_simple
+
+    recs = numpy.zeros(int(numpy.count_nonzero(keep)),
+                       dtype=HIT_RECORD_FIELDS)
+    if len(recs) == 0:  # pylint: disable=len-as-condition
+        return recs
+
+    recs["utime"] = utimes[keep]
+
+    is_delta = is_delta[keep]
+    is_simple = is_simple[keep]
+    offsets = offsets[keep]
+
+    # delta-compressed hits hold the mainboard ID in the envelope and the
+    #  trigger bits in the first trigger word
+    doffs = offsets[is_delta]
+    if len(doffs) > 0:  # pylint: disable=len-as-condition
+        recs["mbid"][is_delta] = gather_integers(raw, doffs + 8, ">i8")
+        bits = (gather_integers(raw, doffs + 46, ">u4") >> 18) & 0x1017
+        recs["trigger_mode"][is_delta] = \
+          numpy.select([(bits & 0x1000) != 0, (bits & 0x0010) != 0,
+                        (bits & 0x0003) != 0, (bits & 0x0004) != 0],
+                       [4, 3, 2, 1], 0)
+
+    soffs = offsets[is_simple]
+    if len(soffs) > 0:  # pylint: disable=len-as-condition
+        recs["trigger_type"][is_simple] = gather_integers(raw, soffs + 16,
+                                                          ">i4")
+        recs["config_id"][is_simple] = gather_integers(raw, soffs + 20, ">i4")
+        recs["source_id"][is_simple] = gather_integers(raw, soffs + 24, ">i4")
+        recs["mbid"][is_simple] = gather_integers(raw, soffs + 28, ">i8")
+        recs["trigger_mode"][is_simple] = gather_integers(raw, soffs + 36,
+                                                          ">i2")
+
+    return recs
+
+
+# pylint: disable=unused-argument
+def mapped_event_records(raw, offsets, lengths, types, utimes):
+    """
+    Build an array of EVENT_RECORD_FIELDS records for all the V5 events in
+    the payload buffer `raw`, given arrays from a MappedPayloadReader index
+    """
+    keep = types == EventV5.TYPE_ID
+    offsets = offsets[keep]
+
+    recs = numpy.zeros(len(offsets), dtype=EVENT_RECORD_FIELDS)
+    if len(recs) == 0:  # pylint: disable=len-as-condition
+        return recs
+
+    body = offsets + Payload.ENVELOPE_LENGTH
+
+    recs["start_time"] = utimes[keep]
+    recs["stop_time"] = recs["start_time"] + gather_integers(raw, body,
+                                                             ">u4")
+    recs["year"] = gather_integers(raw, body + 4, ">u2")
+    recs["uid"] = gather_integers(raw, body + 6, ">u4")
+    recs["run"] = gather_integers(raw, body + 10, ">u4")
+    recs["subrun"] = gather_integers(raw, body + 14, ">u4")
+    recs["hit_count"] = gather_integers(raw, body + 18, ">u4")
+
+    # skip over the variable-length hit records in every event at once,
+    #  one record per pass, to find the trigger record count
+    pos = body + 22
+    active = numpy.nonzero(recs["hit_count"] > 0)[0]
+    remaining = recs["hit_count"][active]
+    while len(active) > 0:  # pylint: disable=len-as-condition
+        reclen = gather_integers(raw, pos[active], ">u2")
+        pos[active] += numpy.maximum(reclen, BaseHitRecord.HEADER_LEN)
+        remaining -= 1
+        more = remaining > 0
+        active = active[more]
+        remaining = remaining[more]
+
+    recs["trigger_count"] = gather_integers(raw, pos, ">u4")
+
+    return recs
+
+
+def map_payload_arrays(filename, func):
+    """
+    Call `func(raw, offsets, lengths, types, utimes)` with a NumPy uint8
+    array holding the contents of the file and the arrays from a
+    MappedPayloadReader index, and return the result.  Uncompressed files
+    are memory-mapped; compressed files are decompressed into memory.
+    `func` must not return anything which refers to `raw`.
+    """
+    if numpy is None:
+        raise PayloadException("NumPy is not installed")
+
+    if is_compressed(filename):
+        with PayloadReader.open_file(filename) as fin:
+            data = fin.read()
+        offsets, lengths, types, utimes = \
+          MappedPayloadReader.build_index(memoryview(data))
+        return func(numpy.frombuffer(data, dtype=numpy.uint8), offsets,
+                    lengths, types, utimes)
+
+    with MappedPayloadReader(filename) as rdr:
+        raw = rdr.raw_bytes
+        try:
+            return func(raw, rdr.offsets, rdr.lengths, rdr.types, rdr.utimes)
+        finally:
+            # release the mapped file before the reader is closed
+            del raw
+
+
+def to_records(filename, kind):
+    """
+    Return a NumPy structured array summarizing the payloads in a file.
+    If `kind` is "hits", records have HIT_RECORD_FIELDS fields; if
+    it's "events", records have EVENT_RECORD_FIELDS fields.
+    """
+    if kind == "hits":
+        return map_payload_arrays(filename, mapped_hit_records)
+    if kind == "events":
+        return map_payload_arrays(filename, mapped_event_records)
+    raise PayloadException("Unknown record type \"%s\"" % (kind, ))
+
+
+def gather_clock_bytes(raw, offsets):
+    "Extract the 6-byte big-endian DOM clock at each offset in `raw`"
+    clkbytes = raw[offsets[:, None] + numpy.arange(6)].astype(numpy.int64)
+    shifts = numpy.arange(40, -1, -8, dtype=numpy.int64)
+    return (clkbytes << shifts).sum(axis=1)
+
+
+class SupernovaBatch(object):
+    """
+    Array-backed container for all the supernova scaler records in a file.
+    Since each record can hold a different number of scalers, the scalers
+    for all records are stored in a single flat array and record `idx`
+    uses `scaler_data[scaler_offsets[idx]:scaler_offsets[idx+1]]`.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, utimes, dom_ids, domclocks, scaler_offsets,
+                 scaler_data):
+        self.__utimes = utimes
+        self.__dom_ids = dom_ids
+        self.__domclocks = domclocks
+        self.__scaler_offsets = scaler_offsets
+        self.__scaler_data = scaler_data
+
+    def __len__(self):
+        return len(self.__utimes)
+
+    @classmethod
+    def from_arrays(cls, raw, offsets, lengths, types, utimes):
+        "Build a batch from the supernova payloads in a payload buffer"
+        keep = types == Supernova.TYPE_ID
+        body = offsets[keep] + Payload.ENVELOPE_LENGTH
+
+        if len(body) > 0:  # pylint: disable=len-as-condition
+            magic = gather_integers(raw, body + 10, ">u2")
+            bad = numpy.nonzero(magic != Supernova.MAGIC_NUMBER)[0]
+            if len(bad) > 0:  # pylint: disable=len-as-condition
+                raise PayloadException("Supernova magic number is %d, not %d"
+                                       % (magic[bad[0]],
+                                          Supernova.MAGIC_NUMBER))
+
+        # scalers follow the 18-byte record header
+        counts = lengths[keep].astype(numpy.int64) - \
+            (Payload.ENVELOPE_LENGTH + 18)
+        scaler_offsets = numpy.zeros(len(counts) + 1, dtype=numpy.int64)
+        numpy.cumsum(counts, out=scaler_offsets[1:])
+
+        total = int(scaler_offsets[-1])
+        positions = numpy.repeat(body + 18 - scaler_offsets[:-1], counts) + \
+            numpy.arange(total, dtype=numpy.int64)
+
+        return cls(utimes[keep], gather_integers(raw, body, ">i8"),
+                   gather_clock_bytes(raw, body + 12), scaler_offsets,
+                   raw[positions])
+
+    @property
+    def dom_ids(self):
+        "Array of DOM mainboard IDs"
+        return self.__dom_ids
+
+    @property
+    def domclocks(self):
+        "Array of unadjusted DOM clock times"
+        return self.__domclocks
+
+    @classmethod
+    def read(cls, filename):
+        "Read all the supernova records from a file"
+        return map_payload_arrays(filename, cls.from_arrays)
+
+    def scalers(self, idx):
+        "Return the array of scaler values for record `idx`"
+        return self.__scaler_data[self.__scaler_offsets[idx]:
+                                  self.__scaler_offsets[idx + 1]]
+
+    @property
+    def scaler_data(self):
+        "Flat array holding the scalers for every record"
+        return self.__scaler_data
+
+    @property
+    def scaler_offsets(self):
+        "Array of offsets into `scaler_data` for each record (plus the end)"
+        return self.__scaler_offsets
+
+    @property
+    def utimes(self):
+        "Array of payload times"
+        return self.__utimes
+
+
+class TimeCalibrationBatch(object):
+    "Array-backed container for all the time calibration records in a file"
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, utimes, dom_ids, dor_tx, dor_rx, dom_rx, dom_tx,
+                 dor_waveforms, dom_waveforms, sync_times):
+        self.__utimes = utimes
+        self.__dom_ids = dom_ids
+        self.__dor_tx = dor_tx
+        self.__dor_rx = dor_rx
+        self.__dom_rx = dom_rx
+        self.__dom_tx = dom_tx
+        self.__dor_waveforms = dor_waveforms
+        self.__dom_waveforms = dom_waveforms
+        self.__sync_times = sync_times
+
+    def __len__(self):
+        return len(self.__utimes)
+
+    @classmethod
+    def from_arrays(cls, raw, offsets, lengths, types, utimes):
+        "Build a batch from the time calibration payloads in a buffer"
+        keep = types == TimeCalibration.TYPE_ID
+
+        expected = TimeCalibration.LENGTH + Payload.ENVELOPE_LENGTH
+        bad = numpy.nonzero(lengths[keep] != expected)[0]
+        if len(bad) > 0:  # pylint: disable=len-as-condition
+            raise PayloadException("Expected %d data bytes, got %d" %
+                                   (TimeCalibration.LENGTH,
+                                    lengths[keep][bad[0]] -
+                                    Payload.ENVELOPE_LENGTH))
+
+        body = offsets[keep] + Payload.ENVELOPE_LENGTH
+
+        # waveforms are 64 little-endian 16-bit samples
+        wave_idx = numpy.arange(128)
+        dor_waves = raw[(body + 28)[:, None] + wave_idx].view("<u2")
+        dom_waves = raw[(body + 172)[:, None] + wave_idx].view("<u2")
+
+        return cls(utimes[keep], gather_integers(raw, body, ">i8"),
+                   gather_integers(raw, body + 12, "<i8"),
+                   gather_integers(raw, body + 20, "<i8"),
+                   gather_integers(raw, body + 156, "<i8"),
+                   gather_integers(raw, body + 164, "<i8"),
+                   dor_waves, dom_waves,
+                   gather_integers(raw, body + TimeCalibration.LENGTH - 8,
+                                   ">i8"))
+
+    @property
+    def dom_ids(self):
+        "Array of DOM mainboard IDs"
+        return self.__dom_ids
+
+    @property
+    def dom_rx(self):
+        "Array of DOM receive times"
+        return self.__dom_rx
+
+    @property
+    def dom_tx(self):
+        "Array of DOM transmit times"
+        return self.__dom_tx
+
+    @property
+    def dom_waveforms(self):
+        "2-dimensional array of DOM waveforms (one row per record)"
+        return self.__dom_waveforms
+
+    @property
+    def dor_rx(self):
+        "Array of DOR receive times"
+        return self.__dor_rx
+
+    @property
+    def dor_tx(self):
+        "Array of DOR transmit times"
+        return self.__dor_tx
+
+    @property
+    def dor_waveforms(self):
+        "2-dimensional array of DOR waveforms (one row per record)"
+        return self.__dor_waveforms
+
+    @classmethod
+    def read(cls, filename):
+        "Read all the time calibration records from a file"
+        return map_payload_arrays(filename, cls.from_arrays)
+
+    @property
+    def sync_times(self):
+        "Array of GPS sync times"
+        return self.__sync_times
+
+    @property
+    def utimes(self):
+        "Array of payload times"
+        return self.__utimes
+
+
+class PayloadReducer(object):
+    """
+    Base class for objects which summarize a stream of payloads for
+    `scan_files()`.  Subclasses must be picklable, since partial results
+    are computed in worker processes and merged in the parent.
+    """
+
+    def add(self, pay):
+        "Add a single payload to this summary"
+        raise NotImplementedError()
+
+    def merge(self, other):
+        "Merge the summary from another reducer of the same type"
+        raise NotImplementedError()
+
+    @property
+    def result(self):
+        "Return the final summary"
+        raise NotImplementedError()
+
+
+class TypeCounter(PayloadReducer):
+    "Count payloads by type"
+
+    def __init__(self):
+        self.__counts = {}
+
+    def add(self, pay):
+        if isinstance(pay, MonitorRecord):
+            type_id = Monitor.TYPE_ID
+        else:
+            type_id = pay.payload_type_id()
+
+        if type_id not in self.__counts:
+            self.__counts[type_id] = 1
+        else:
+            self.__counts[type_id] += 1
+
+    def merge(self, other):
+        for type_id, count in other.result.items():
+            if type_id not in self.__counts:
+                self.__counts[type_id] = count
+            else:
+                self.__counts[type_id] += count
+
+    @property
+    def result(self):
+        "Dictionary mapping payload type IDs to counts"
+        return self.__counts
+
+
+class DOMHitCounter(PayloadReducer):
+    "Count hits for each DOM"
+
+    def __init__(self):
+        self.__counts = {}
+
+    def add(self, pay):
+        if not isinstance(pay, (HitPayload, SimpleHit)):
+            return
+
+        if pay.mbid not in self.__counts:
+            self.__counts[pay.mbid] = 1
+        else:
+            self.__counts[pay.mbid] += 1
+
+    def merge(self, other):
+        for mbid, count in other.result.items():
+            if mbid not in self.__counts:
+                self.__counts[mbid] = count
+            else:
+                self.__counts[mbid] += count
+
+    @property
+    def result(self):
+        "Dictionary mapping mainboard IDs to hit counts"
+        return self.__counts
+
+
+class TimeHistogram(PayloadReducer):
+    "Histogram of payload times"
+
+    def __init__(self, bin_width=10000000000):
+        "Create a histogram with `bin_width` DAQ ticks per bin (default 1s)"
+        self.__bin_width = bin_width
+        self.__bins = {}
+
+    def add(self, pay):
+        tbin = pay.utime // self.__bin_width
+        if tbin not in self.__bins:
+            self.__bins[tbin] = 1
+        else:
+            self.__bins[tbin] += 1
+
+    @property
+    def bin_width(self):
+        "Number of DAQ ticks in each bin"
+        return self.__bin_width
+
+    def merge(self, other):
+        if other.bin_width != self.__bin_width:
+            raise PayloadException("Cannot merge histograms with bin widths"
+                                   " %d and %d" %
+                                   (self.__bin_width, other.bin_width))
+
+        for tbin, count in other.result.items():
+            if tbin not in self.__bins:
+                self.__bins[tbin] = count
+            else:
+                self.__bins[tbin] += count
+
+    @property
+    def result(self):
+        "Dictionary mapping bin start times to counts"
+        return dict((tbin * self.__bin_width, count)
+                    for tbin, count in self.__bins.items())
+
+
+# patterns used to find payload files in directories passed to scan_files()
+SCAN_PATTERNS = ("HitSpool-*.dat", "physics_*.dat")
+
+
+def list_payload_files(paths, patterns=SCAN_PATTERNS):
+    """
+    Expand a list of files and directories into a list of payload files.
+    Directory entries are only included if they match one of the patterns
+    (ignoring any compressed file suffix)
+    """
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+
+        for entry in sorted(os.listdir(path)):
+            name = entry
+            for sfx in COMPRESSED_SUFFIXES:
+                if name.endswith(sfx):
+                    name = name[:-len(sfx)]
+                    break
+
+            for pat in patterns:
+                if fnmatch.fnmatch(name, pat):
+                    fullpath = os.path.join(path, entry)
+                    if os.path.isfile(fullpath):
+                        files.append(fullpath)
+                    break
+
+    return files
+
+
+def scan_file(filename, reducer_factory):
+    """
+    Feed every payload in the file to a new reducer created by calling
+    `reducer_factory`, and return the reducer
+    """
+    reducer = reducer_factory()
+    with PayloadReader(filename) as rdr:
+        for pay in rdr:
+            reducer.add(pay)
+    return reducer
+
+
+def scan_files(paths, reducer_factory, processes=None,
+               patterns=SCAN_PATTERNS):
+    """
+    Scan a list of payload files (and/or directories of payload files)
+    across a pool of `processes` worker processes (default is one per
+    CPU).  Each file is summarized by a reducer created by calling
+    `reducer_factory` (which must be picklable, e.g. a PayloadReducer
+    subclass) and the partial results are merged into a single reducer.
+    """
+    files = list_payload_files(paths, patterns=patterns)
+
+    final = reducer_factory()
+    if processes == 1 or len(files) <= 1:
+        for fnm in files:
+            final.merge(scan_file(fnm, reducer_factory))
+        return final
+
+    if processes is None:
+        processes = min(multiprocessing.cpu_count(), len(files))
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = [pool.apply_async(scan_file, (fnm, reducer_factory))
+                   for fnm in files]
+        for res in results:
+            final.merge(res.get())
+    finally:
+        pool.close()
+        pool.join()
+
+    return final
+
+
+class SimpleHitWriter(object):
+    """
+    Pack SimpleHit records into a preallocated buffer and write them to
+    the output file in large chunks
+    """
+
+    FORMAT = ">2iq3iqh"
+    MAX_HITS = 65536
+
+    # NumPy structured array fields matching FORMAT
+    FIELDS = [("length", ">i4"), ("type", ">i4"), ("utime", ">i8"),
+              ("trig_type", ">i4"), ("config_id", ">i4"),
+              ("source_id", ">i4"), ("mbid", ">i8"), ("mode", ">i2")]
+
+    def __init__(self, out, max_hits=MAX_HITS):
+        self.__out = out
+        self.__buffer = bytearray(SimpleHit.MIN_LENGTH * max_hits)
+        self.__max_hits = max_hits
+        self.__num_hits = 0
+        self.__total = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def add(self, hit):
+        "Add a hit (or a SimpleHit) to the buffer"
+        struct.pack_into(self.FORMAT, self.__buffer,
+                         self.__num_hits * SimpleHit.MIN_LENGTH,
+                         SimpleHit.MIN_LENGTH, SimpleHit.TYPE_ID, hit.utime,
+                         hit.trigger_type, hit.config_id, hit.source_id,
+                         hit.mbid, hit.trigger_mode)
+        self.__num_hits += 1
+        if self.__num_hits >= self.__max_hits:
+            self.flush()
+
+    def flush(self):
+        "Write all buffered hits"
+        if self.__num_hits > 0:
+            self.__out.write(memoryview(self.__buffer)
+                             [:self.__num_hits * SimpleHit.MIN_LENGTH])
+            self.__total += self.__num_hits
+            self.__num_hits = 0
+
+    def close(self):
+        "Write all buffered hits and close the output file"
+        try:
+            self.flush()
+        finally:
+            self.__out.close()
+
+    @property
+    def total(self):
+        "Total number of hits written"
+        return self.__total + self.__num_hits
+
+
+def simple_hit_filename(filename):
+    """
+    Return the name of the SimpleHit file created from a HitSpool file
+    (e.g. 'HitSpool-123.dat.gz' becomes 'SimpleHit-123.dat')
+    """
+    name = os.path.basename(filename)
+    for sfx in COMPRESSED_SUFFIXES:
+        if name.endswith(sfx):
+            name = name[:-len(sfx)]
+            break
+
+    if name.startswith("HitSpool-"):
+        return "SimpleHit-" + name[9:]
+    return "SimpleHit-" + name
+
+
+def convert_mapped_file(filename, out, chunk_hits):
+    "Convert an uncompressed file using array operations on a mapped file"
+    total = 0
+    with MappedPayloadReader(filename) as rdr:
+        raw = rdr.raw_bytes
+        try:
+            for start in range(0, len(rdr), chunk_hits):
+                stop = start + chunk_hits
+                hits = mapped_hit_records(raw, rdr.offsets[start:stop],
+                                          rdr.lengths[start:stop],
+                                          rdr.types[start:stop],
+                                          rdr.utimes[start:stop])
+                if len(hits) == 0:  # pylint: disable=len-as-condition
+                    continue
+
+                recs = numpy.zeros(len(hits), dtype=SimpleHitWriter.FIELDS)
+                recs["length"] = SimpleHit.MIN_LENGTH
+                recs["type"] = SimpleHit.TYPE_ID
+                recs["utime"] = hits["utime"]
+                recs["trig_type"] = hits["trigger_type"]
+                recs["config_id"] = hits["config_id"]
+                recs["source_id"] = hits["source_id"]
+                recs["mbid"] = hits["mbid"]
+                recs["mode"] = hits["trigger_mode"]
+
+                out.write(recs.tobytes())
+                total += len(recs)
+        finally:
+            # release the mapped file before the reader is closed
+            del raw
+
+    return total
+
+
+def convert_to_simple_hits(filename, outname=None,
+                           chunk_hits=SimpleHitWriter.MAX_HITS):
+    """
+    Rewrite all the hits in a HitSpool file as trigger-friendly SimpleHits,
+    returning the number of hits written.  Uncompressed files are
+    converted with NumPy array operations on the mapped file, other files
+    are decoded in a single pass and packed into preallocated buffers.
+    """
+    if outname is None:
+        outname = simple_hit_filename(filename)
+
+    with open(outname, "wb") as out:
+        if numpy is not None and not is_compressed(filename):
+            return convert_mapped_file(filename, out, chunk_hits)
+
+        with SimpleHitWriter(out, max_hits=chunk_hits) as wrtr:
+            with PayloadReader(filename) as rdr:
+                for pay in rdr:
+                    if isinstance(pay, (HitPayload, SimpleHit)):
+                        wrtr.add(pay)
+            return wrtr.total
+
+
+def convert_files_to_simple_hits(paths, processes=None):
+    """
+    Convert HitSpool files (and/or directories of HitSpool files) to
+    SimpleHit files across a pool of `processes` worker processes (default
+    is one per CPU), returning a dictionary mapping each input file name
+    to the number of hits written
+    """
+    files = list_payload_files(paths, patterns=("HitSpool-*.dat", ))
+
+    if processes == 1 or len(files) <= 1:
+        return dict((fnm, convert_to_simple_hits(fnm)) for fnm in files)
+
+    if processes is None:
+        processes = min(multiprocessing.cpu_count(), len(files))
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        counts = pool.map(convert_to_simple_hits, files)
+    finally:
+        pool.close()
+        pool.join()
+
+    return dict(zip(files, counts))
+
+
+def read_file(filename, max_payloads, write_simple_hits=False,
+              start_tick=None, stop_tick=None):
     "Read a binary payload file and print a description of each payload"
     if write_simple_hits and filename.startswith("HitSpool-"):
-        out = open("SimpleHit-" + filename[9:], "w")
+        out = SimpleHitWriter(open(simple_hit_filename(filename), "wb"))
     else:
         out = None
 
     try:
         with PayloadReader(filename) as rdr:
-            for pay in rdr:
+            if start_tick is None and stop_tick is None:
+                payiter = rdr
+            else:
+                if start_tick is None:
+                    start_tick = 0
+                if stop_tick is None:
+                    stop_tick = 0x7fffffffffffffff
+                payiter = rdr.read_range(start_tick, stop_tick)
+
+            for pay in payiter:
                 if max_payloads is not None and rdr.nrec > max_payloads:
                     break
 
                 print(str(pay))
-                if out is not None:
-                    out.write(pay.simple_hit)
+                if out is not None and isinstance(pay, (HitPayload,
+                                                        SimpleHit)):
+                    out.add(pay)
     finally:
         if out is not None:
             out.close()
@@ -1325,23 +2893,61 @@ def main():
 
     parser.add_argument("-S", "--simple-hits", dest="write_simple_hits",
                         action="store_true", default=False,
-                        help="Rewrite hits to trigger-friendly SimpleHits")
+                        help=("Rewrite hits to trigger-friendly SimpleHits"
+                              " while dumping them"))
+    parser.add_argument("-H", "--convert-hits", dest="convert_hits",
+                        action="store_true", default=False,
+                        help=("Only rewrite hits to SimpleHits, without"
+                              " dumping them, converting files in"
+                              " parallel"))
     parser.add_argument("-n", "--max_payloads", type=int,
                         dest="max_payloads", default=None,
                         help="Maximum number of payloads to dump")
+    parser.add_argument("-s", "--start-tick", type=int,
+                        dest="start_tick", default=None,
+                        help="Only dump payloads at or after this DAQ time")
+    parser.add_argument("-e", "--stop-tick", type=int,
+                        dest="stop_tick", default=None,
+                        help="Only dump payloads at or before this DAQ time")
+    parser.add_argument("-C", "--count-types", dest="count_types",
+                        action="store_true", default=False,
+                        help="Print the number of payloads of each type")
+    parser.add_argument("-j", "--jobs", type=int, dest="jobs", default=None,
+                        help=("Number of processes used by --count-types"
+                              " and --convert-hits (default is one per CPU)"))
     parser.add_argument(dest="fileList", nargs="+")
 
     args = parser.parse_args()
 
+    if args.convert_hits:
+        counts = convert_files_to_simple_hits(args.fileList,
+                                              processes=args.jobs)
+        for fnm, count in sorted(counts.items()):
+            print("%s: wrote %d hits to %s" %
+                  (fnm, count, simple_hit_filename(fnm)))
+        return
+
+    if args.count_types:
+        counter = scan_files(args.fileList, TypeCounter, processes=args.jobs)
+        for type_id, count in sorted(counter.result.items()):
+            print("Type %d: %d" % (type_id, count))
+        return
+
     for fnm in args.fileList:
         if os.path.isfile(fnm):
-            read_file(fnm, args.max_payloads, args.write_simple_hits)
+            read_file(fnm, args.max_payloads, args.write_simple_hits,
+                      start_tick=args.start_tick, stop_tick=args.stop_tick)
             continue
 
         for entry in os.listdir(fnm):
+            if entry.endswith(PayloadIndex.SUFFIX):
+                continue
+
             path = os.path.join(fnm, entry)
             if os.path.isfile(path):
-                read_file(path, args.max_payloads, args.write_simple_hits)
+                read_file(path, args.max_payloads, args.write_simple_hits,
+                          start_tick=args.start_tick,
+                          stop_tick=args.stop_tick)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,776 @@
+#!/usr/bin/env python
+
+import bz2
+import gzip
+import io
+import os
+import random
+import shutil
+import struct
+import tempfile
+import unittest
+
+from payload import DOMHitCounter, DeltaCompressedHit, EventV5, \
+    MappedPayloadReader, PayloadException, PayloadIndex, PayloadReader, \
+    PrefetchingReader, SimpleHit, SimpleHitWriter, StopMessage, Supernova, \
+    SupernovaBatch, TimeCalibration, TimeCalibrationBatch, TimeHistogram, \
+    TypeCounter, bulk_delta_codec, \
+    convert_files_to_simple_hits, convert_to_simple_hits, delta_codec, \
+    decode_delta_waveforms, list_payload_files, lzma, numpy, scan_files, \
+    simple_hit_filename, to_records
+
+
+class DeltaEncoder(object):
+    "Delta-compress waveforms into the format read by `delta_codec`"
+
+    UP = {1: 2, 2: 3, 3: 6, 6: 11}
+    DOWN = {2: 1, 3: 2, 6: 3, 11: 6}
+    THRESHOLD = {1: 0, 2: 1, 3: 2, 6: 4, 11: 32}
+
+    def __init__(self):
+        self.__register = 0
+        self.__num_bits = 0
+
+    def __put(self, val, bpw):
+        self.__register |= (val & ((1 << bpw) - 1)) << self.__num_bits
+        self.__num_bits += bpw
+
+    def encode(self, values):
+        bpw = 3
+        last = 0
+        for val in values:
+            delta = val - last
+            last = val
+            while abs(delta) >= (1 << (bpw - 1)):
+                self.__put(1 << (bpw - 1), bpw)
+                bpw = self.UP[bpw]
+            self.__put(delta, bpw)
+            if abs(delta) < self.THRESHOLD[bpw]:
+                bpw = self.DOWN[bpw]
+
+    @property
+    def bytes(self):
+        nbytes = (self.__num_bits + 7) // 8
+        return bytes(bytearray((self.__register >> (8 * i)) & 0xff
+                               for i in range(nbytes)))
+
+
+def random_waveform(length, maxval=1023):
+    val = random.randint(0, maxval)
+    wave = []
+    for _ in range(length):
+        if random.random() < 0.1:
+            val = random.randint(0, maxval)
+        else:
+            val = max(0, min(maxval, val + random.randint(-3, 3)))
+        wave.append(val)
+    return wave
+
+
+def build_hit(mbid, utime, fadc=None, atwd=None, trigmask=0):
+    word0 = trigmask << 18
+    enc = DeltaEncoder()
+    if fadc is not None:
+        word0 |= 0x8000
+        enc.encode(fadc)
+    if atwd is not None:
+        word0 |= 0x4000 | ((len(atwd) - 1) << 12)
+        for chan in atwd:
+            enc.encode(chan)
+
+    data = struct.pack(">8xQ3HQ2I", utime, 1, 2, 0, utime * 2, word0, 0) + \
+        enc.bytes
+    return DeltaCompressedHit(mbid, data)
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class BulkDeltaCodecTest(unittest.TestCase):
+    def test_single_waveform(self):
+        wave = random_waveform(256)
+
+        enc = DeltaEncoder()
+        enc.encode(wave)
+
+        self.assertEqual(delta_codec(enc.bytes).decode(256), wave)
+
+        decoded = bulk_delta_codec(enc.bytes).decode(256)
+        self.assertEqual(decoded.dtype, numpy.int16)
+        self.assertEqual(decoded.tolist(), wave)
+
+    def test_consecutive_waveforms(self):
+        waves = [random_waveform(128) for _ in range(4)]
+
+        enc = DeltaEncoder()
+        for wave in waves:
+            enc.encode(wave)
+
+        ref = delta_codec(enc.bytes)
+        bulk = bulk_delta_codec(enc.bytes)
+        for wave in waves:
+            self.assertEqual(ref.decode(128), wave)
+            self.assertEqual(bulk.decode(128).tolist(), wave)
+
+    def test_truncated(self):
+        enc = DeltaEncoder()
+        enc.encode(random_waveform(64))
+
+        codec = bulk_delta_codec(enc.bytes[:4])
+        self.assertRaises(Exception, codec.decode, 64)
+
+    def test_batch(self):
+        hits = []
+        for idx in range(10):
+            fadc = random_waveform(256) if idx % 3 != 0 else None
+            if idx % 2 == 0:
+                atwd = [random_waveform(128)
+                        for _ in range(random.randint(1, 4))]
+            else:
+                atwd = None
+            hits.append(build_hit(0x123456789abc, 1000 + idx, fadc=fadc,
+                                  atwd=atwd))
+
+        results = decode_delta_waveforms(hits)
+        self.assertEqual(len(results), len(hits))
+
+        for hit, (fadc, atwd) in zip(hits, results):
+            if hit.has_fadc:
+                self.assertEqual(fadc.tolist(), hit.fadc)
+            else:
+                self.assertIsNone(fadc)
+
+            if hit.has_atwd:
+                self.assertEqual(len(atwd), hit.atwd_channels + 1)
+                for chan, vals in enumerate(atwd):
+                    self.assertEqual(vals.tolist(), hit.atwd(chan))
+            else:
+                self.assertIsNone(atwd)
+
+    def test_batch_truncated_hit(self):
+        full = build_hit(0x123456789abc, 1000, fadc=random_waveform(256),
+                         atwd=[random_waveform(128) for _ in range(4)])
+        short = DeltaCompressedHit(0x123456789abc, full.data_bytes[:-40])
+        after = build_hit(0x123456789abc, 1001, fadc=random_waveform(256),
+                          atwd=[random_waveform(128) for _ in range(4)])
+
+        self.assertRaises(PayloadException, decode_delta_waveforms,
+                          [short, after])
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class MappedPayloadReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmpdir, ignore_errors=True)
+
+    def __write_payloads(self, name, payloads, stop=False):
+        path = os.path.join(self.__tmpdir, name)
+        with open(path, "wb") as out:
+            for pay in payloads:
+                out.write(pay.bytes)
+            if stop:
+                out.write(StopMessage().bytes)
+        return path
+
+    def test_empty(self):
+        path = self.__write_payloads("empty.dat", [])
+        with MappedPayloadReader(path) as rdr:
+            self.assertEqual(len(rdr), 0)
+            self.assertEqual(list(rdr), [])
+
+    def test_compressed(self):
+        path = self.__write_payloads("foo.dat.gz", [])
+        self.assertRaises(PayloadException, MappedPayloadReader, path)
+
+    def test_index(self):
+        payloads = []
+        for idx in range(10):
+            if idx % 2 == 0:
+                payloads.append(build_hit(0x123456789abc, 1000 + idx,
+                                          fadc=random_waveform(256)))
+            else:
+                payloads.append(SimpleHit(1000 + idx, 2, 3, 12001,
+                                          0xfedcba987654))
+        path = self.__write_payloads("HitSpool-1.dat", payloads, stop=True)
+
+        with MappedPayloadReader(path) as rdr:
+            self.assertEqual(len(rdr), len(payloads))
+            self.assertEqual(rdr.utimes.tolist(),
+                             [1000 + idx for idx in range(10)])
+            self.assertEqual(rdr.types.tolist(),
+                             [3 if idx % 2 == 0 else 1
+                              for idx in range(10)])
+
+            offset = 0
+            for idx, pay in enumerate(payloads):
+                self.assertEqual(rdr.offsets[idx], offset)
+                self.assertEqual(rdr.lengths[idx], len(pay.bytes))
+                offset += len(pay.bytes)
+
+            self.assertEqual(rdr[4].fadc, payloads[4].fadc)
+            self.assertEqual(rdr[-1].bytes, payloads[-1].bytes)
+
+    def test_same_as_reader(self):
+        payloads = [build_hit(0x123456789abc, 1000 + idx,
+                              fadc=random_waveform(256))
+                    for idx in range(5)]
+        path = self.__write_payloads("HitSpool-2.dat", payloads)
+
+        with PayloadReader(path) as rdr:
+            expected = [str(pay) for pay in rdr]
+
+        with MappedPayloadReader(path) as rdr:
+            self.assertEqual([str(pay) for pay in rdr], expected)
+            self.assertEqual(rdr.nrec, len(expected))
+
+
+class PayloadIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmpdir, ignore_errors=True)
+
+    def __write_hits(self, name, times, compress=False):
+        path = os.path.join(self.__tmpdir, name)
+        if compress:
+            out = gzip.open(path, "wb")
+        else:
+            out = open(path, "wb")
+        try:
+            for utime in times:
+                if utime % 3 == 0:
+                    out.write(build_hit(0x123456789abc, utime,
+                                        fadc=random_waveform(16)).bytes)
+                else:
+                    out.write(SimpleHit(utime, 2, 3, 12001,
+                                        0xfedcba987654).bytes)
+        finally:
+            out.close()
+        return path
+
+    def __check_range(self, path, times, start, stop, interval):
+        expected = [utime for utime in times if start <= utime <= stop]
+        with PayloadReader(path) as rdr:
+            found = [pay.utime for pay in rdr.read_range(start, stop,
+                                                         interval=interval)]
+        self.assertEqual(found, expected)
+
+    def test_read_range(self):
+        times = [1000 + (idx // 2) * 10 for idx in range(500)]
+        path = self.__write_hits("HitSpool-1.dat", times)
+
+        for start, stop in ((0, 100), (0, 1500), (1005, 1005), (1010, 1010),
+                            (1200, 2200), (3000, 5000), (0, 10000)):
+            self.__check_range(path, times, start, stop, 7)
+
+        self.assertTrue(os.path.exists(path + PayloadIndex.SUFFIX))
+
+    def test_compressed(self):
+        times = [1000 + idx for idx in range(100)]
+        path = self.__write_hits("HitSpool-2.dat.gz", times, compress=True)
+
+        self.__check_range(path, times, 1050, 1060, 10)
+
+    def test_sidecar(self):
+        times = [1000 + idx for idx in range(100)]
+        path = self.__write_hits("HitSpool-3.dat", times)
+        idxpath = path + PayloadIndex.SUFFIX
+
+        with PayloadReader(path) as rdr:
+            self.assertEqual(len(rdr.index(interval=10)), 10)
+
+        index = PayloadIndex.read(idxpath)
+        self.assertIsNotNone(index)
+        self.assertEqual(index.interval, 10)
+        self.assertTrue(index.is_current(path))
+
+        # rewrite the file so the saved index is stale
+        times = [5000 + idx for idx in range(50)]
+        self.__write_hits("HitSpool-3.dat", times)
+        os.utime(path, (0, 0))
+        self.assertFalse(index.is_current(path))
+
+        self.__check_range(path, times, 5010, 5020, 10)
+        self.assertEqual(len(PayloadIndex.read(idxpath)), 5)
+
+    def test_corrupt_sidecar(self):
+        times = [1000 + idx for idx in range(100)]
+        path = self.__write_hits("HitSpool-4.dat", times)
+        with open(path + PayloadIndex.SUFFIX, "wb") as out:
+            out.write(b"garbage")
+
+        self.assertIsNone(PayloadIndex.read(path + PayloadIndex.SUFFIX))
+        self.__check_range(path, times, 1010, 1020, 10)
+
+
+def build_event(utime, uid, hits, triggers):
+    """
+    Build a V5 event from a list of (type, flags, channel, time offset,
+    data bytes) hit tuples and a list of (type, config ID, source ID,
+    start offset, end offset, hit indexes) trigger tuples
+    """
+    data = struct.pack(">IHIII", 1000, 2020, uid, 123456, 0)
+
+    data += struct.pack(">I", len(hits))
+    for typ, flags, chan, offset, hitdata in hits:
+        data += struct.pack(">HBBHI", 10 + len(hitdata), typ, flags, chan,
+                            offset) + hitdata
+
+    data += struct.pack(">I", len(triggers))
+    for typ, cfg, src, start, end, indexes in triggers:
+        data += struct.pack(">6i", typ, cfg, src, start, end, len(indexes))
+        data += struct.pack(">%dI" % len(indexes), *indexes)
+
+    return EventV5(utime, data)
+
+
+class EventV5Test(unittest.TestCase):
+    HITS = [(1, 0x3, 17, 10, b"abcdef"),
+            (0, 0x1, 22, 20, b""),
+            (1, 0x2, 47, 30, b"0123456789")]
+    TRIGGERS = [(0, 1000, 4000, 5, 50, [0, 2]),
+                (3, 1001, 6000, 0, 60, [])]
+
+    def test_lazy_decode(self):
+        evt = build_event(1000000, 17, self.HITS, self.TRIGGERS)
+
+        self.assertEqual(evt.uid, 17)
+        self.assertEqual(evt.run, 123456)
+        self.assertEqual(evt.stop_time, 1001000)
+        self.assertEqual(evt.hit_count, 3)
+        self.assertEqual(evt.trigger_count, 2)
+        self.assertEqual(str(evt), "EventV5[#17 [1000000-1001000] yr 2020"
+                         " run 123456 hitRecs*3 trigRecs*2]")
+
+        self.assertIsNone(evt.hit(-1))
+        self.assertIsNone(evt.hit(3))
+
+        hits = evt.hits
+        self.assertEqual(len(hits), 3)
+        for rec, (_, flags, chan, offset, hitdata) in zip(hits, self.HITS):
+            self.assertEqual(rec.channel_id, chan)
+            self.assertEqual(rec.flags, flags)
+            self.assertEqual(rec.timestamp, 1000000 + offset)
+            self.assertEqual(len(rec), 10 + len(hitdata))
+            self.assertFalse(hasattr(rec, "__dict__"))
+        self.assertEqual(evt.hit(1).channel_id, 22)
+
+        trigs = evt.triggers
+        self.assertEqual(len(trigs), 2)
+        for rec, (typ, cfg, src, start, end, indexes) in \
+          zip(trigs, self.TRIGGERS):
+            self.assertEqual(rec.trigger_type, typ)
+            self.assertEqual(rec.config_id, cfg)
+            self.assertEqual(rec.source_id, src)
+            self.assertEqual(rec.start_time, 1000000 + start)
+            self.assertEqual(rec.end_time, 1000000 + end)
+            self.assertEqual(list(rec.hit_indexes), indexes)
+            self.assertEqual(rec.hit_count, len(indexes))
+            self.assertFalse(hasattr(rec, "__dict__"))
+
+    def test_triggers_first(self):
+        evt = build_event(5000, 1, self.HITS, self.TRIGGERS)
+
+        self.assertEqual(evt.triggers[0].source_name, "inIceTrigger")
+        self.assertEqual(evt.hits[2].channel_id, 47)
+
+    def test_bad_hit_record(self):
+        evt = build_event(5000, 1, [(7, 0, 1, 0, b"")], [])
+
+        # header fields are still available
+        self.assertEqual(evt.uid, 1)
+        self.assertEqual(evt.trigger_count, 0)
+        self.assertRaises(PayloadException, lambda: evt.hits)
+
+
+class PrefetchingReaderTest(unittest.TestCase):
+    DATA = bytes(bytearray(idx % 251 for idx in range(10000)))
+
+    def test_read(self):
+        with PrefetchingReader(io.BytesIO(self.DATA), block_size=64,
+                               max_blocks=2) as rdr:
+            pieces = []
+            while True:
+                piece = rdr.read(random.randint(1, 200))
+                if len(piece) == 0:  # pylint: disable=len-as-condition
+                    break
+                pieces.append(piece)
+            self.assertEqual(b"".join(pieces), self.DATA)
+            self.assertEqual(rdr.tell(), len(self.DATA))
+
+    def test_read_all(self):
+        with PrefetchingReader(io.BytesIO(self.DATA), block_size=100) as rdr:
+            self.assertEqual(rdr.read(10), self.DATA[:10])
+            self.assertEqual(rdr.read(), self.DATA[10:])
+
+    def test_seek(self):
+        with PrefetchingReader(io.BytesIO(self.DATA), block_size=100,
+                               max_blocks=2) as rdr:
+            self.assertEqual(rdr.read(10), self.DATA[:10])
+
+            # seek within the current block
+            rdr.seek(50)
+            self.assertEqual(rdr.read(10), self.DATA[50:60])
+
+            # seek past the queued blocks
+            rdr.seek(5000)
+            self.assertEqual(rdr.tell(), 5000)
+            self.assertEqual(rdr.read(300), self.DATA[5000:5300])
+
+            # seek backward
+            rdr.seek(-4000, os.SEEK_CUR)
+            self.assertEqual(rdr.read(20), self.DATA[1300:1320])
+
+    def test_error(self):
+        class BrokenFile(object):
+            def read(self, _):
+                raise IOError("Broken")
+
+            def close(self):
+                pass
+
+        rdr = PrefetchingReader(BrokenFile())
+        try:
+            self.assertRaises(IOError, rdr.read, 10)
+        finally:
+            rdr.close()
+
+
+class CompressedReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+        self.__payloads = [SimpleHit(1000 + idx, 2, 3, 12001, 0x1234 + idx)
+                           for idx in range(1000)]
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmpdir, ignore_errors=True)
+
+    def __check(self, name, opener):
+        path = os.path.join(self.__tmpdir, name)
+        out = opener(path, "wb")
+        try:
+            for pay in self.__payloads:
+                out.write(pay.bytes)
+        finally:
+            out.close()
+
+        expected = [pay.bytes for pay in self.__payloads]
+        for prefetch in (False, True):
+            with PayloadReader(path, prefetch=prefetch) as rdr:
+                self.assertEqual([pay.bytes for pay in rdr], expected)
+
+    def test_gzip(self):
+        self.__check("physics_1.dat.gz", gzip.open)
+
+    def test_bzip2(self):
+        self.__check("physics_2.dat.bz2", bz2.BZ2File)
+
+    @unittest.skipIf(lzma is None, "lzma is not installed")
+    def test_xz(self):
+        self.__check("physics_3.dat.xz", lzma.open)
+
+
+class SimpleHitTest(unittest.TestCase):
+    TRIGMASKS = (0x0, 0x1, 0x2, 0x4, 0x10, 0x1000, 0x1013)
+
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+
+        self.__hits = []
+        for idx in range(50):
+            if idx % 5 == 4:
+                self.__hits.append(SimpleHit(1000 + idx, 2, 3, 12001,
+                                             0x200 + idx))
+            else:
+                trigmask = self.TRIGMASKS[idx % len(self.TRIGMASKS)]
+                self.__hits.append(build_hit(0x100 + idx, 1000 + idx,
+                                             fadc=random_waveform(8),
+                                             trigmask=trigmask))
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmpdir, ignore_errors=True)
+
+    def __expected(self):
+        data = b""
+        for hit in self.__hits:
+            if isinstance(hit, SimpleHit):
+                data += hit.bytes
+            else:
+                data += hit.simple_hit
+        return data
+
+    def __write(self, name, compress=False):
+        path = os.path.join(self.__tmpdir, name)
+        if compress:
+            out = gzip.open(path, "wb")
+        else:
+            out = open(path, "wb")
+        try:
+            for hit in self.__hits:
+                out.write(hit.bytes)
+        finally:
+            out.close()
+        return path
+
+    def __convert(self, path, chunk_hits):
+        outpath = os.path.join(self.__tmpdir, simple_hit_filename(path))
+        count = convert_to_simple_hits(path, outname=outpath,
+                                       chunk_hits=chunk_hits)
+        self.assertEqual(count, len(self.__hits))
+        with open(outpath, "rb") as fin:
+            self.assertEqual(fin.read(), self.__expected())
+
+    def test_filename(self):
+        self.assertEqual(simple_hit_filename("/a/b/HitSpool-123.dat.gz"),
+                         "SimpleHit-123.dat")
+
+    def test_trigger_mode(self):
+        expected = (0, 2, 2, 1, 3, 4, 4)
+        for trigmask, mode in zip(self.TRIGMASKS, expected):
+            hit = build_hit(1, 2, trigmask=trigmask)
+            self.assertEqual(hit.trigger_mode, mode)
+
+    def test_writer(self):
+        buf = io.BytesIO()
+        with SimpleHitWriter(buf, max_hits=7) as wrtr:
+            for hit in self.__hits:
+                wrtr.add(hit)
+        self.assertEqual(wrtr.total, len(self.__hits))
+        self.assertEqual(buf.getvalue(), self.__expected())
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_convert_mapped(self):
+        path = self.__write("HitSpool-1.dat")
+        self.__convert(path, 7)
+
+    def test_convert_compressed(self):
+        path = self.__write("HitSpool-2.dat.gz", compress=True)
+        self.__convert(path, 7)
+
+    def test_convert_parallel(self):
+        paths = [self.__write("HitSpool-%d.dat" % num) for num in range(3)]
+
+        curdir = os.getcwd()
+        os.chdir(self.__tmpdir)
+        try:
+            counts = convert_files_to_simple_hits([self.__tmpdir, ],
+                                                  processes=2)
+        finally:
+            os.chdir(curdir)
+
+        self.assertEqual(sorted(counts.keys()), sorted(paths))
+        for path in paths:
+            self.assertEqual(counts[path], len(self.__hits))
+            outpath = os.path.join(self.__tmpdir, simple_hit_filename(path))
+            with open(outpath, "rb") as fin:
+                self.assertEqual(fin.read(), self.__expected())
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class ToRecordsTest(unittest.TestCase):
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmpdir, ignore_errors=True)
+
+    def __write(self, name, payloads):
+        path = os.path.join(self.__tmpdir, name)
+        if name.endswith(".gz"):
+            out = gzip.open(path, "wb")
+        else:
+            out = open(path, "wb")
+        try:
+            for pay in payloads:
+                out.write(pay.bytes)
+        finally:
+            out.close()
+        return path
+
+    def test_hits(self):
+        hits = []
+        for idx in range(20):
+            if idx % 3 == 0:
+                hits.append(SimpleHit(1000 + idx, 2, 3, 12001 + idx,
+                                      0x200 + idx))
+            else:
+                hits.append(build_hit(0x100 + idx, 1000 + idx,
+                                      trigmask=(0x4, 0x10)[idx % 2]))
+
+        for name in ("HitSpool-1.dat", "HitSpool-1.dat.gz"):
+            recs = to_records(self.__write(name, hits), "hits")
+            self.assertEqual(len(recs), len(hits))
+            for rec, hit in zip(recs, hits):
+                self.assertEqual(rec["utime"], hit.utime)
+                self.assertEqual(rec["mbid"], hit.mbid)
+                self.assertEqual(rec["trigger_type"], hit.trigger_type)
+                self.assertEqual(rec["config_id"], hit.config_id)
+                self.assertEqual(rec["source_id"], hit.source_id)
+                self.assertEqual(rec["trigger_mode"], hit.trigger_mode)
+
+    def test_events(self):
+        events = []
+        for idx in range(10):
+            hits = [(1, 0, chan, chan * 10, b"x" * (idx % 4))
+                    for chan in range(idx)]
+            trigs = [(0, 1000, 4000, 0, 10, list(range(idx)))
+                     for _ in range(idx % 3)]
+            events.append(build_event(100000 * idx, idx + 1, hits, trigs))
+
+        for name in ("physics_1.dat", "physics_1.dat.gz"):
+            recs = to_records(self.__write(name, events), "events")
+            self.assertEqual(len(recs), len(events))
+            for rec, evt in zip(recs, events):
+                self.assertEqual(rec["uid"], evt.uid)
+                self.assertEqual(rec["run"], evt.run)
+                self.assertEqual(rec["subrun"], evt.subrun)
+                self.assertEqual(rec["year"], evt.year)
+                self.assertEqual(rec["start_time"], evt.start_time)
+                self.assertEqual(rec["stop_time"], evt.stop_time)
+                self.assertEqual(rec["hit_count"], evt.hit_count)
+                self.assertEqual(rec["trigger_count"], evt.trigger_count)
+
+    def test_bad_kind(self):
+        path = self.__write("physics_2.dat", [])
+        self.assertRaises(PayloadException, to_records, path, "foo")
+
+
+def build_tcal(utime, dom_id, dor_tx, dor_rx, dom_rx, dom_tx, sync_time):
+    dor_wave = struct.pack("<64H", *range(64))
+    dom_wave = struct.pack("<64H", *range(100, 164))
+    data = struct.pack(">Q", dom_id) + \
+        struct.pack("<HHQQ", 314, 1, dor_tx, dor_rx) + dor_wave + \
+        struct.pack("<QQ", dom_rx, dom_tx) + dom_wave + \
+        struct.pack("<B12sc", 1, b"123456789012", b" ") + \
+        struct.pack(">Q", sync_time)
+    return TimeCalibration(utime, data)
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class BatchDecoderTest(unittest.TestCase):
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmpdir, ignore_errors=True)
+
+    def __write(self, name, payloads):
+        path = os.path.join(self.__tmpdir, name)
+        if name.endswith(".gz"):
+            out = gzip.open(path, "wb")
+        else:
+            out = open(path, "wb")
+        try:
+            for pay in payloads:
+                out.write(pay.bytes)
+        finally:
+            out.close()
+        return path
+
+    def test_supernova(self):
+        recs = []
+        for idx in range(12):
+            scalers = [(idx + num) % 16 for num in range(idx * 3)]
+            recs.append((1000 + idx, 0x1000 + idx, 0x123456789a + idx,
+                         scalers))
+        payloads = [Supernova(utime, dom_id, clock, scalers)
+                    for utime, dom_id, clock, scalers in recs]
+
+        for name in ("sn_1.dat", "sn_1.dat.gz"):
+            batch = SupernovaBatch.read(self.__write(name, payloads))
+            self.assertEqual(len(batch), len(recs))
+            for idx, (utime, dom_id, clock, scalers) in enumerate(recs):
+                self.assertEqual(batch.utimes[idx], utime)
+                self.assertEqual(batch.dom_ids[idx], dom_id)
+                self.assertEqual(batch.domclocks[idx], clock)
+                self.assertEqual(batch.domclocks[idx],
+                                 payloads[idx].domclock)
+                self.assertEqual(batch.scalers(idx).tolist(), scalers)
+
+    def test_bad_supernova(self):
+        pay = Supernova(1000, 0x1000, 0x123456789a, [1, 2, 3])
+        data = bytearray(pay.bytes)
+        data[27] = 0
+        path = os.path.join(self.__tmpdir, "sn_2.dat")
+        with open(path, "wb") as out:
+            out.write(data)
+
+        self.assertRaises(PayloadException, SupernovaBatch.read, path)
+
+    def test_tcal(self):
+        payloads = [build_tcal(1000 + idx, 0x1000 + idx, 10 + idx, 20 + idx,
+                               30 + idx, 40 + idx, 50 + idx)
+                    for idx in range(7)]
+
+        for name in ("tcal_1.dat", "tcal_1.dat.gz"):
+            batch = TimeCalibrationBatch.read(self.__write(name, payloads))
+            self.assertEqual(len(batch), len(payloads))
+            for idx, pay in enumerate(payloads):
+                self.assertEqual(batch.utimes[idx], pay.utime)
+                self.assertEqual(batch.dom_ids[idx], pay.dom_id)
+                self.assertEqual(batch.dor_tx[idx], pay.dor_tx)
+                self.assertEqual(batch.dor_rx[idx], pay.dor_rx)
+                self.assertEqual(batch.dom_rx[idx], pay.dom_rx)
+                self.assertEqual(batch.dom_tx[idx], pay.dom_tx)
+                self.assertEqual(batch.sync_times[idx], 50 + idx)
+                self.assertEqual(batch.dor_waveforms[idx].tolist(),
+                                 list(range(64)))
+                self.assertEqual(batch.dom_waveforms[idx].tolist(),
+                                 list(range(100, 164)))
+
+
+class ScanFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+
+        self.__expected_types = {}
+        self.__expected_doms = {}
+        for num in range(4):
+            path = os.path.join(self.__tmpdir, "HitSpool-%d.dat" % num)
+            with open(path, "wb") as out:
+                for idx in range(20):
+                    mbid = 0x100 + (idx % 5)
+                    if idx % 4 == 0:
+                        pay = build_hit(mbid, idx * 1000,
+                                        fadc=random_waveform(16))
+                    else:
+                        pay = SimpleHit(idx * 1000, 2, 3, 12001, mbid)
+                    out.write(pay.bytes)
+
+                    type_id = pay.payload_type_id()
+                    self.__expected_types[type_id] = \
+                      self.__expected_types.get(type_id, 0) + 1
+                    self.__expected_doms[mbid] = \
+                      self.__expected_doms.get(mbid, 0) + 1
+
+        # this file should be ignored when scanning the directory
+        with open(os.path.join(self.__tmpdir, "other.dat"), "wb") as out:
+            out.write(b"garbage")
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmpdir, ignore_errors=True)
+
+    def test_list_files(self):
+        files = list_payload_files([self.__tmpdir, ])
+        self.assertEqual([os.path.basename(fnm) for fnm in files],
+                         ["HitSpool-%d.dat" % num for num in range(4)])
+
+    def test_serial(self):
+        counter = scan_files([self.__tmpdir, ], TypeCounter, processes=1)
+        self.assertEqual(counter.result, self.__expected_types)
+
+    def test_parallel(self):
+        counter = scan_files([self.__tmpdir, ], TypeCounter, processes=2)
+        self.assertEqual(counter.result, self.__expected_types)
+
+        counter = scan_files([self.__tmpdir, ], DOMHitCounter, processes=3)
+        self.assertEqual(counter.result, self.__expected_doms)
+
+        hist = scan_files([self.__tmpdir, ], TimeHistogram, processes=2)
+        self.assertEqual(hist.result, {0: 80})
+
+
+if __name__ == "__main__":
+    unittest.main()